@@ -0,0 +1,94 @@
+"""
+Chat History Compaction
+Replaces older turns with a rolling scenario-state summary so long
+scenarios don't replay every earlier raw_response JSON
+
+The last KEEP_EXCHANGES officer/subject exchanges stay verbatim. Everything
+before them is folded, in order, into one compact state object prepended
+to the first kept officer message. Custody, Miranda, force, medical and
+escalation facts aren't summarized here: the current ones go with every
+officer message (scenario_state.py).
+"""
+
+import json
+import os
+
+from json_stream import decode_json
+
+KEEP_EXCHANGES = int(os.environ.get('CHAT_KEEP_EXCHANGES', 3))
+
+# Officer lines kept (truncated) from the summarized turns, most recent last
+MAX_EARLIER_LINES = 6
+EARLIER_LINE_CHARS = 100
+
+
+def new_state():
+    return {
+        'turns_summarized': 0,
+        'subject_mood': None,
+        'evidence_visible': [],
+        'evidence_collected': [],
+        'additional_subjects': [],
+        'earlier_officer_lines': [],
+    }
+
+
+def _add_unique(items, new_items):
+    for item in new_items or []:
+        if item and item not in items:
+            items.append(item)
+
+
+def update_state(state, officer_line, reply):
+    """Fold one summarized exchange (officer text, decoded reply) into state."""
+    state['turns_summarized'] += 1
+
+    if officer_line:
+        line = officer_line.removeprefix('OFFICER: ')
+        if len(line) > EARLIER_LINE_CHARS:
+            line = line[:EARLIER_LINE_CHARS].rsplit(' ', 1)[0] + '...'
+        state['earlier_officer_lines'] = (state['earlier_officer_lines'] + [line])[-MAX_EARLIER_LINES:]
+
+    if reply.get('subject_mood'):
+        state['subject_mood'] = reply['subject_mood']
+
+    _add_unique(state['evidence_visible'], reply.get('evidence_visible'))
+    _add_unique(state['evidence_collected'], reply.get('evidence_collected'))
+    if reply.get('additional_subjects'):
+        state['additional_subjects'] = reply['additional_subjects']
+
+    return state
+
+
+def _exchange_starts(history):
+    """Indexes of the user messages that open each officer/subject exchange."""
+    return [i for i, msg in enumerate(history) if msg['role'] == 'user']
+
+
+def compact_history(history, keep=KEEP_EXCHANGES):
+    """Claude messages with all but the last `keep` exchanges replaced by a state summary."""
+    starts = _exchange_starts(history)
+    if len(starts) <= keep or keep < 1:
+        return list(history)
+
+    cut = starts[-keep]
+    state = new_state()
+    officer_line = None
+    for msg in history[:cut]:
+        if msg['role'] == 'user':
+            officer_line = msg['content']
+        else:
+            update_state(state, officer_line, decode_json(msg['content']))
+            officer_line = None
+
+    # Drop empty fields so the summary stays small
+    summary = {k: v for k, v in state.items() if v not in (None, [], False)}
+    first = history[cut]
+    return [
+        {
+            'role': 'user',
+            'content': (f"SCENARIO STATE SO FAR (earlier turns summarized):\n"
+                        f"{json.dumps(summary, separators=(',', ':'))}\n\n{first['content']}")
+        },
+        *history[cut + 1:],
+    ]
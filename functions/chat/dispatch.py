@@ -0,0 +1,266 @@
+"""
+Dispatch Simulator
+Answers the officer's [RADIOS] traffic from the Phoenix PD code table and
+per-scenario facts, so the model no longer has to know the codes or write
+dispatch returns
+
+The code table is docs/PHOENIX_PD_RADIO_CODES.md. Record checks come back
+with the scenario's facts: a felony warrant on traffic_warrant, a suspended
+license on traffic_suspended, a stolen plate on vehicle_theft, and clean
+returns otherwise. Emergency traffic (10-33, 906, 999, 998) is broadcast to
+all units at the scenario location. Requests for backup, fire/EMS, a tow or
+an attempt to locate are only sent when not cancelled in the same clause
+("no backup needed", "cancel fire"), and Code 4 or 10-22 stands down backup
+and medical. A 3-digit call type is only read in code position ("a 415F",
+"with a 901", "requesting 907"), never as a street number ("415 E Main"). The answer is a pure function of the
+message and scenario, so earlier turns get the same answer each time they
+are replayed. Traffic this table can't answer (a plain-language question to
+dispatch) is left to the model.
+"""
+
+import re
+
+from scenario_state import officer_parts
+
+TEN_CODES = {
+    '10-1': 'Signal Weak',
+    '10-4': 'Affirmative (OK)',
+    '10-6': 'Busy',
+    '10-7': 'Going Off Duty/Out of Service',
+    '10-8': 'In Service',
+    '10-9': 'Say Again',
+    '10-12': 'Stand-By (Stop)',
+    '10-17': 'Enroute',
+    '10-20': 'Location',
+    '10-21': 'Call by Phone',
+    '10-22': 'Disregard/Take No Further Action',
+    '10-23': 'Arrived on Scene',
+    '10-25': 'Report to (Meet)',
+    '10-27': 'Driver License/Permit',
+    '10-28': 'Ownership/Registration Information',
+    '10-29': 'Records Check/Warrant Information',
+    '10-31': 'Pick Up Papers',
+    '10-33': 'Help Me Quick',
+    '10-42': 'Prisoner in Custody/Booking',
+    '10-44': 'Does Not Conform with Rules and Regulations',
+    '10-50': 'Switching to Channel',
+    '10-51': 'Felony Warrant Outstanding',
+    '10-52': 'Misdemeanor Warrant Outstanding',
+    '10-60': 'Female Officer Needed',
+    '10-70': 'PR Contact',
+    '10-76': 'Notify Owner of Vehicle Recovery',
+    '10-91': 'Assist Stranded Motorist',
+    '10-92': 'Wagon Wanted',
+}
+
+SIGNAL_CODES = {
+    '3': 'Emergency - Use Red Lights & Siren',
+    '4': 'No Further Assistance Needed',
+    '5': 'Stake Out - Other Units Stay Away',
+    '6': 'Out for Investigation',
+}
+
+CALL_TYPES = {
+    '101': 'Woman in the Car', '102': 'Woman out of the Car',
+    '210': 'Strong Armed Robbery', '211': 'Armed Robbery', '236': 'Threat', '239': 'Fight',
+    '240': 'Assault', '245': 'Aggravated Assault', '250': 'Harassment',
+    '260': 'Sexual Abuse - Adult', '261': 'Sexual Assault', '301': 'Prostitution',
+    '311': 'Indecent Exposure', '312': 'Child Neglect', '315': 'Forgery', '315I': 'Identity Theft',
+    '318': 'Theft by Fraud', '390': 'Drunk (Disturbing)', '390D': 'Drunk Driver',
+    '415': 'Criminal Damage', '415F': 'Domestic Violence', '417G': 'Subject with a Gun',
+    '417K': 'Subject with a Knife', '451': 'Homicide', '459': 'Burglary', '487': 'Theft',
+    '488': 'Recovered Property', '491': 'Kidnapping', '503': 'City Ordinance Offense',
+    '508': 'Traffic Control', '510': 'Speeding/Racing', '511': 'Vehicle Stop',
+    '585': 'Traffic Hazard', '601': 'Missing Person', '647': 'Suspicious Person',
+    '651': 'Loose Animals', '707': 'Bomb Threat', '901': 'Cutting/Stabbing', '901G': 'Shooting',
+    '901H': 'Dead Body', '901O': 'Overdose', '901U': 'Suicide',
+    '906': 'Officer Needs Assistance', '907': 'Backup Requested', '911H': '9-1-1 Hang-Up',
+    '915': 'Arson', '917': 'Abandoned Vehicle', '918': 'Mentally Ill Subject',
+    '927': 'Unknown Trouble', '928': 'Found Property', '961': 'Accident - No Injuries',
+    '962': 'Accident - Injuries', '963': 'Accident - Fatality',
+    '998': 'Officer Involved Shooting', '999': 'Officer Needs Help Urgently',
+}
+
+DEFAULT_FACTS = {
+    'license': 'valid Arizona DL',
+    'warrants': 'negative for warrants',
+    'priors': None,
+    'vehicle': '2014 Honda Accord, silver, registered to the driver, no wants',
+}
+
+# What a records check returns in each scenario; anything unlisted is DEFAULT_FACTS
+SCENARIO_FACTS = {
+    'dui': {'vehicle': '2012 Chevrolet Silverado, gray, registered to the driver, no wants',
+            'priors': 'one prior DUI arrest in 2019'},
+    'traffic_warrant': {'warrants': 'shows 10-51 for failure to appear on felony drug charges, Maricopa County'},
+    'traffic_drugs': {'priors': 'one prior arrest for possession of marijuana for sale in 2020'},
+    'traffic_suspended': {'license': 'suspended Arizona DL for failure to pay fines'},
+    'domestic': {'priors': 'two prior domestic violence calls at the address, one DV arrest in 2021'},
+    'domestic_weapons': {'priors': 'one prior DV conviction in 2019, active order of protection naming the victim'},
+    'assault': {'priors': 'one prior arrest for assault in 2020'},
+    'disturbance': {'priors': 'one prior arrest for disorderly conduct'},
+    'shoplifting': {'priors': 'two prior shoplifting convictions'},
+    'vehicle_theft': {'vehicle': '2019 Kia Optima, white, reported stolen out of Phoenix two days ago'},
+    'loitering': {'priors': 'trespass notice on file for this business, issued last month'},
+    'harassment': {'priors': 'active order of protection naming the complainant, served 30 days ago'},
+    'stalking': {'priors': 'active order of protection naming the complainant, served 30 days ago'},
+}
+
+DEFAULT_UNIT = 'Unit 23'
+DEFAULT_LOCATION = 'your location'
+
+TEN_CODE = re.compile(r"\b10-\d{1,2}\b")
+SIGNAL_CODE = re.compile(r"\bcode\s+([3-6])\b", re.I)
+# A call type opens the traffic or a clause, or follows "a", "with", "requesting"...;
+# a number followed by a street name is an address
+CALL_TYPE = re.compile(
+    r"(?:^|[,:;!.]\s*|\b(?i:a|an|with|on a|for a|of a|possible|code|copy|requesting|request|need|needs|send|show)\s+)"
+    r"(\d{3}[A-Z]?)(?![\w/-])"
+    r"(?!\s+(?:[NSEW]\.?\s+|(?:North|South|East|West)\s+)?(?:(?!Unit\b)[A-Z][a-z]|\d+(?:st|nd|rd|th)\b))")
+UNIT = re.compile(r"\b(unit\s+\d[\w-]*|\d{1,2}-[A-Z][a-z]+-\d{1,3})\b", re.I)
+SUBJECT = re.compile(r"\b(?:on|for)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){1,3})")
+PLATE = re.compile(r"\bplate\s+([A-Z0-9]{2,4}-?[A-Z0-9]{2,4})\b", re.I)
+
+BACKUP = re.compile(r"\b(907|second unit|another unit|additional units?|backup|back-up|cover unit)\b", re.I)
+MEDICAL = re.compile(r"\b(fire|ems|medical|ambulance|paramedics|rescue)\b", re.I)
+TOW = re.compile(r"\btow\b", re.I)
+LOCATE = re.compile(r"\b(attempt to locate|atl|broadcast)\b", re.I)
+CUSTODY = re.compile(r"\b(in custody|one custody)\b", re.I)
+
+RADIO_CLAUSE = re.compile(r"[,;.!?]\s*|\s+(?:and|but)\s+", re.I)
+CANCEL = re.compile(r"n't\b|\b(no|not|cancel\w*|disregard|negative|hold off|stand down|belay)\b", re.I)
+
+
+def radio_codes(radio):
+    """{code: meaning} for every table code in the radio text, in order."""
+    codes = {}
+    for code in TEN_CODE.findall(radio):
+        if code in TEN_CODES:
+            codes[code] = TEN_CODES[code]
+    for code in SIGNAL_CODE.findall(radio):
+        codes[f"Code {code}"] = SIGNAL_CODES[code]
+    for code in CALL_TYPE.findall(radio):
+        if code in CALL_TYPES:
+            codes[code] = CALL_TYPES[code]
+    return codes
+
+
+def requested(pattern, radio):
+    """Whether pattern is asked for in a clause that doesn't cancel it ("no backup needed")."""
+    return any(pattern.search(clause) and not CANCEL.search(clause) for clause in RADIO_CLAUSE.split(radio))
+
+
+def cancelled(pattern, radio):
+    """Whether pattern is called off in some clause ("cancel fire")."""
+    return any(pattern.search(clause) and CANCEL.search(clause) for clause in RADIO_CLAUSE.split(radio))
+
+
+def _records(codes, radio, facts, unit):
+    """10-27 / 10-28 / 10-29 returns."""
+    name = SUBJECT.search(radio)
+    subject = f" for {name.group(1)}" if name else ""
+    replies = []
+
+    if '10-27' in codes and '10-29' in codes:
+        replies.append(f"{unit}, your 10-27 shows {facts['license']}. 10-29 {facts['warrants']}.")
+    elif '10-27' in codes:
+        replies.append(f"{unit}, 10-27{subject} shows {facts['license']}.")
+    elif '10-29' in codes:
+        replies.append(f"{unit}, 10-29{subject} {facts['warrants']}.")
+    if '10-29' in codes and facts['priors']:
+        replies.append(f"Record shows {facts['priors']}.")
+
+    if '10-28' in codes:
+        plate = PLATE.search(radio)
+        on_plate = f" on {plate.group(1).upper()}" if plate else ""
+        replies.append(f"{unit}, 10-28{on_plate} shows {facts['vehicle']}.")
+    return replies
+
+
+def radio_reply(radio, scenario='dui', location=None):
+    """Dispatch's answer to one piece of radio traffic, or None if the table can't answer it."""
+    codes = radio_codes(radio)
+    facts = {**DEFAULT_FACTS, **SCENARIO_FACTS.get(scenario, {})}
+    unit_match = UNIT.search(radio)
+    unit = unit_match.group(1) if unit_match else DEFAULT_UNIT
+    unit = unit[0].upper() + unit[1:]
+    if not location or location == 'Unknown':
+        location = DEFAULT_LOCATION
+
+    if '999' in codes:
+        return f"999! 999! All units respond to {location}! {unit} needs help urgently!"
+    if '998' in codes:
+        return (f"998, Officer Involved Shooting at {location}. Sending supervisors, FIT and medical. "
+                f"All units stand by for further instructions.")
+    if '10-33' in codes or '906' in codes:
+        code = '10-33' if '10-33' in codes else '906'
+        return f"All units, {code} at {location}! {unit} needs immediate assistance!"
+
+    replies = _records(codes, radio, facts, unit)
+
+    # Code 4 / 10-22 stands down any backup or medical asked for in the same traffic
+    stand_down = 'Code 4' in codes or '10-22' in codes
+    if requested(BACKUP, radio) and not stand_down:
+        urgency = " code 3" if 'Code 3' in codes else ""
+        replies.append(f"10-4, showing a second unit enroute{urgency}.")
+    elif cancelled(BACKUP, radio) and not stand_down:
+        replies.append("10-4, cancelling the second unit.")
+    if requested(MEDICAL, radio) and not stand_down:
+        replies.append(f"10-4, fire and medical enroute to {location}.")
+    elif cancelled(MEDICAL, radio) and not stand_down:
+        replies.append("10-4, cancelling fire and medical.")
+    if '10-42' in codes or CUSTODY.search(radio):
+        replies.append("10-4, one in custody. Do you need transport?")
+    if '10-92' in codes:
+        replies.append("10-4, wagon enroute.")
+    if requested(TOW, radio):
+        replies.append("10-4, tow requested.")
+    if requested(LOCATE, radio):
+        replies.append("10-4, broadcasting an attempt to locate to all units.")
+    if '10-23' in codes:
+        replies.append(f"10-4, {unit} on scene.")
+    if '10-8' in codes:
+        replies.append(f"10-4, {unit} back in service.")
+    if '10-20' in codes and not replies:
+        replies.append(f"{unit}, showing you at {location}.")
+    if '10-22' in codes:
+        replies.append(f"10-4, {unit}, disregard. Cancelling additional units.")
+    elif 'Code 4' in codes:
+        replies.append("10-4, Code 4. No further units.")
+
+    return " ".join(replies) or None
+
+
+def radio_traffic(officer_message, scenario='dui', location=None):
+    """(dispatch reply or None, {code: meaning}) for an officer message; codes is None without [RADIOS]."""
+    radio = officer_parts(officer_message.removeprefix('OFFICER: '))['radios']
+    if not radio:
+        return None, None
+
+    reply = radio_reply(radio, scenario, location)
+    codes = radio_codes(radio)
+    if reply:
+        # Codes in the return itself (10-51), not dispatch's own 10-4
+        codes.update((code, meaning) for code, meaning in radio_codes(reply).items() if code != '10-4')
+    return reply, codes
+
+
+def dispatch_line(reply, codes):
+    """Text added after an officer message that used the radio, so everyone on scene hears dispatch."""
+    meanings = "; ".join(f"{code} = {meaning}" for code, meaning in codes.items())
+    glossary = f" [{meanings}]" if meanings else ""
+    if reply:
+        return f"DISPATCH: {reply}{glossary}"
+    return f"DISPATCH (no system answer - write dispatch_response){glossary}"
+
+
+def with_dispatch(content, scenario='dui', location=None):
+    """(content with its DISPATCH line, dispatch reply or None) for an 'OFFICER: ...' message.
+
+    Sessions store the officer's text as sent, so replayed turns are annotated
+    again each request rather than carrying the line in storage.
+    """
+    reply, codes = radio_traffic(content, scenario, location)
+    if codes is None:
+        return content, None
+    return f"{content}\n\n{dispatch_line(reply, codes)}", reply
@@ -0,0 +1,176 @@
+"""
+Help Answer Cache
+Reuses training-help answers for repeated questions on the same scenario
+
+Entries are keyed by scenario + a hash of the legal reference text + the
+normalized question. A miss on the exact key falls back to the closest
+cached question in the same scenario by word-set (Jaccard) similarity, so
+"Do I need to Mirandize him?" can reuse "do I need miranda here". Words that
+flip the legal answer (with/without, not/no/can't, before/after) are kept
+and must match exactly, so "...without consent?" never reuses the answer
+to "...with consent?". TTL and LRU bound the cache; each lookup logs its outcome and the running hit rate.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 6 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_SIMILARITY = 0.7
+
+STOPWORDS = {
+    'a', 'an', 'the', 'i', 'me', 'my', 'we', 'you', 'he', 'she', 'him', 'her', 'his', 'they', 'them',
+    'it', 'this', 'that', 'these', 'those', 'here', 'there', 'now', 'right', 'just', 'so',
+    'do', 'does', 'did', 'is', 'are', 'was', 'were', 'be', 'am', 'can', 'could', 'should', 'would',
+    'will', 'shall', 'may', 'might', 'must', 'have', 'has', 'had',
+    'to', 'of', 'in', 'on', 'at', 'for', 'about', 'or', 'and', 'if', 'what', 'how', 'when',
+    'ok', 'okay', 'please', 'yet', 'still', 'any', 'some',
+}
+
+# Words that flip the answer; two questions are only near-duplicates if these match
+POLARITY = {'with', 'without', 'not', 'before', 'after', 'unless', 'except', 'only'}
+NEGATIONS = re.compile(r"\b(can't|won't|cannot|cant|no|never|nor)\b|n't\b")
+
+# Trainee spellings of the same concept
+SYNONYMS = {
+    'mirandize': 'miranda', 'mirandized': 'miranda', 'mirandizing': 'miranda', 'rights': 'miranda',
+    'vehicle': 'car', 'truck': 'car', 'auto': 'car',
+    'domestic': 'dv', 'cuff': 'arrest', 'handcuff': 'arrest', 'detain': 'detention',
+    'required': 'mandatory', 'mandated': 'mandatory', 'need': 'mandatory',
+}
+
+
+def _stem(word):
+    """Crude suffix stripping - enough to match search/searching, arrest/arrested."""
+    for suffix in ('izing', 'ize', 'ing', 'ed', 'es', 's'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def normalize_question(question):
+    """Sorted content words of a question, e.g. 'Can I search the car?' -> ('car', 'search')."""
+    words = re.findall(r"[a-z0-9]+", NEGATIONS.sub(' not', question.lower()))
+    return tuple(sorted({_stem(SYNONYMS.get(w, w)) for w in words if w not in STOPWORDS}))
+
+
+def polarity(words):
+    """The answer-flipping words of a normalized question; near-hits need these to match."""
+    return set(words) & POLARITY
+
+
+def legal_context_hash(legal_context):
+    return hashlib.sha256((legal_context or '').encode()).hexdigest()[:16]
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b)
+
+
+class HelpCache:
+    """TTL + LRU answer cache with near-duplicate lookup within a scenario."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, similarity=DEFAULT_SIMILARITY):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+
+        self.entries = OrderedDict()    # (scope, words) -> (stored_at, answer); LRU first
+        self.scopes = {}                # scope -> set of words tuples, for near-duplicate scans
+        self.lock = threading.Lock()
+        self.stats = {'hit': 0, 'near_hit': 0, 'miss': 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            ttl=int(os.environ.get('HELP_CACHE_TTL', DEFAULT_TTL)),
+            max_entries=int(os.environ.get('HELP_CACHE_MAX', DEFAULT_MAX_ENTRIES)),
+            similarity=float(os.environ.get('HELP_CACHE_SIMILARITY', DEFAULT_SIMILARITY)),
+        )
+
+    def get(self, question, scenario, legal_context):
+        """Cached answer for the question, or None."""
+        scope = (scenario, legal_context_hash(legal_context))
+        words = normalize_question(question)
+        start = time.perf_counter()
+
+        with self.lock:
+            result, answer = 'miss', None
+            if words:
+                answer = self._lookup((scope, words))
+                if answer is not None:
+                    result = 'hit'
+                else:
+                    best, best_score = None, 0.0
+                    for candidate in self.scopes.get(scope, ()):
+                        if polarity(candidate) != polarity(words):
+                            continue
+                        score = jaccard(words, candidate)
+                        if score > best_score:
+                            best, best_score = candidate, score
+                    if best is not None and best_score >= self.similarity:
+                        answer = self._lookup((scope, best))
+                        if answer is not None:
+                            result = 'near_hit'
+
+            self.stats[result] += 1
+            self._log(result, scenario, words, time.perf_counter() - start)
+
+        return answer
+
+    def put(self, question, scenario, legal_context, answer):
+        scope = (scenario, legal_context_hash(legal_context))
+        words = normalize_question(question)
+        if not words:
+            return
+
+        with self.lock:
+            key = (scope, words)
+            self.entries[key] = (time.time(), answer)
+            self.entries.move_to_end(key)
+            self.scopes.setdefault(scope, set()).add(words)
+
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def _lookup(self, key):
+        """Answer for an exact key, dropping it if expired. Caller holds the lock."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def _remove(self, key):
+        del self.entries[key]
+        scope, words = key
+        self.scopes[scope].discard(words)
+        if not self.scopes[scope]:
+            del self.scopes[scope]
+
+    def hit_rate(self):
+        total = sum(self.stats.values())
+        return (self.stats['hit'] + self.stats['near_hit']) / total if total else 0.0
+
+    def _log(self, result, scenario, words, elapsed):
+        print(json.dumps({
+            'event': 'help_cache',
+            'result': result,
+            'scenario': scenario,
+            'question_words': ' '.join(words),
+            'lookup_ms': round(elapsed * 1000, 3),
+            'entries': len(self.entries),
+            'hit_rate': round(self.hit_rate(), 3),
+            **self.stats,
+        }))
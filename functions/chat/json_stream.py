@@ -0,0 +1,374 @@
+"""
+Incremental JSON Decoder
+Consumes a streamed JSON object chunk by chunk, reports top-level fields as
+they close, and repairs truncated output (max_tokens) without rescanning
+"""
+
+import json
+import re
+
+_MISSING = object()
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_WHITESPACE = ' \t\r\n'
+_CLOSERS = {'{': '}', '[': ']'}
+
+# Inside a string only quotes and backslashes matter, so plain runs are copied in one go
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class JsonStreamDecoder:
+    """Single-pass decoder for one top-level JSON object.
+
+    Each character is examined once (runs of plain string text are copied
+    in bulk). Only the value currently being read is buffered; it is handed
+    to json.loads once when it closes, so total work stays linear in the
+    response length however it is chunked.
+
+        decoder = JsonStreamDecoder()
+        for chunk in stream:
+            for key, value in decoder.feed(chunk):
+                ...                       # top-level field just closed
+            decoder.take_partial()        # (key, new text) of an open string field
+        fields = decoder.close()          # everything, with truncation repaired
+
+    Text before the first '{' and after the closing '}' is ignored.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.complete = False     # closing '}' seen
+        self.repaired = False     # close() had to finish a truncated object
+        self.error = None         # first syntax error; decoding stops there
+
+        self._phase = 'start'     # start, key, in_key, colon, value, in_value, after_value, done, error
+        self._key = None
+        self._chars = []          # raw text pieces of the current key or value
+        self._kind = None         # 'string', 'container' or 'scalar' while in_value
+        self._stack = []          # open containers inside the current value
+        self._in_string = False
+        self._escape = None       # None, '' after a backslash, or the \u digits so far
+        self._escape_at = 0       # index in _chars where the pending escape started
+        self._decoded = []        # decoded text pieces of a top-level string value
+        self._taken = 0           # pieces of _decoded already returned by take_partial()
+        self._safe = None         # (len(_chars), stack) of the last point a container can be cut
+
+    def take_partial(self):
+        """(key, text decoded since the last call) while a top-level string value is streaming."""
+        if self._phase != 'in_value' or self._kind != 'string':
+            return None
+        end = len(self._decoded)
+        if end > self._taken and _is_high_surrogate(self._decoded[-1]):
+            end -= 1    # hold back until the low half arrives
+        new = ''.join(self._decoded[self._taken:end])
+        self._taken = end
+        return self._key, new
+
+    def feed(self, chunk: str) -> list:
+        """Consume a chunk; return [(key, value)] for top-level fields it closed."""
+        closed = []
+        i, n = 0, len(chunk)
+        while i < n and self._phase not in ('done', 'error'):
+            if (self._phase == 'in_value' and self._escape is None
+                    and (self._kind == 'string' or self._in_string)):
+                m = _STRING_SPECIAL.search(chunk, i)
+                end = m.start() if m else n
+                if end > i:
+                    run = chunk[i:end]
+                    self._chars.append(run)
+                    if self._kind == 'string':
+                        self._decoded.append(run)
+                    i = end
+                    continue
+
+            self._step(chunk[i], closed)
+            i += 1
+        return closed
+
+    def close(self) -> dict:
+        """Finish decoding and return all fields, repairing a truncated tail."""
+        if self._phase == 'in_value':
+            value = self._repair()
+            if value is not _MISSING:
+                self.fields[self._key] = value
+            self._phase = 'done'
+            self.repaired = True
+        elif self._phase in ('key', 'in_key', 'colon', 'value', 'after_value'):
+            # Cut off between fields, or inside a key whose value never started
+            self._phase = 'done'
+            self.repaired = True
+        return self.fields
+
+    # -- state machine -------------------------------------------------------
+
+    def _fail(self, message: str):
+        self.error = message
+        self._phase = 'error'
+
+    def _step(self, ch: str, closed: list):
+        phase = self._phase
+
+        if phase == 'in_value':
+            self._value_char(ch, closed)
+
+        elif phase == 'start':
+            if ch == '{':
+                self._phase = 'key'
+
+        elif phase == 'key':
+            if ch == '"':
+                self._phase = 'in_key'
+                self._chars = []
+                self._escape = None
+            elif ch == '}':
+                self._finish()    # also tolerates a trailing comma
+            elif ch not in _WHITESPACE:
+                self._fail(f"expected a key, got {ch!r}")
+
+        elif phase == 'in_key':
+            if self._escape is not None:
+                self._escape = None
+            elif ch == '\\':
+                self._escape = ''
+            elif ch == '"':
+                self._key = json.loads('"' + ''.join(self._chars) + '"')
+                self._phase = 'colon'
+                return
+            self._chars.append(ch)
+
+        elif phase == 'colon':
+            if ch == ':':
+                self._phase = 'value'
+            elif ch not in _WHITESPACE:
+                self._fail(f"expected ':' after {self._key!r}, got {ch!r}")
+
+        elif phase == 'value':
+            if ch in _WHITESPACE:
+                return
+            self._start_value(ch)
+
+        elif phase == 'after_value':
+            if ch == ',':
+                self._phase = 'key'
+            elif ch == '}':
+                self._finish()
+            elif ch not in _WHITESPACE:
+                self._fail(f"expected ',' or '}}' after {self._key!r}, got {ch!r}")
+
+    def _start_value(self, ch: str):
+        self._phase = 'in_value'
+        self._chars = [ch]
+        self._stack = []
+        self._in_string = False
+        self._escape = None
+        self._safe = None
+
+        if ch == '"':
+            self._kind = 'string'
+            self._decoded = []
+            self._taken = 0
+        elif ch in _CLOSERS:
+            self._kind = 'container'
+            self._stack.append(ch)
+            self._safe = (1, (ch,))
+        else:
+            self._kind = 'scalar'
+
+    def _value_char(self, ch: str, closed: list):
+        if self._kind == 'string':
+            self._string_char(ch, closed)
+        elif self._kind == 'container':
+            self._container_char(ch, closed)
+        elif ch == ',' or ch == '}' or ch in _WHITESPACE:
+            # Scalars end at the first delimiter, which belongs to the object
+            self._close_value(closed)
+            self._step(ch, closed)
+        else:
+            self._chars.append(ch)
+
+    def _string_char(self, ch: str, closed: list):
+        self._chars.append(ch)
+
+        if self._escape is not None:
+            if self._escape == '' and ch != 'u':
+                self._decoded.append(_ESCAPES.get(ch, ch))
+                self._escape = None
+            elif self._escape == '':
+                self._escape = 'u'
+            else:
+                self._escape += ch
+                if len(self._escape) == 5:
+                    try:
+                        code = int(self._escape[1:], 16)
+                    except ValueError:
+                        code = None
+                    if code is not None and 0xDC00 <= code <= 0xDFFF and len(self._decoded) > self._taken \
+                            and _is_high_surrogate(self._decoded[-1]):
+                        # Low half of a surrogate pair (emoji): join with the high half
+                        high = ord(self._decoded.pop())
+                        code = 0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00)
+                    if code is not None:
+                        self._decoded.append(chr(code))
+                    self._escape = None
+        elif ch == '\\':
+            self._escape = ''
+            self._escape_at = len(self._chars) - 1
+        elif ch == '"':
+            self._close_value(closed)
+        else:
+            self._decoded.append(ch)
+
+    def _container_char(self, ch: str, closed: list):
+        self._chars.append(ch)
+
+        if self._in_string:
+            if self._escape is not None:
+                self._escape = None
+            elif ch == '\\':
+                self._escape = ''
+                self._escape_at = len(self._chars) - 1
+            elif ch == '"':
+                self._in_string = False
+            return
+
+        if ch == '"':
+            self._in_string = True
+        elif ch in _CLOSERS:
+            self._stack.append(ch)
+            self._safe = (len(self._chars), tuple(self._stack))
+        elif ch == '}' or ch == ']':
+            self._stack.pop()
+            if not self._stack:
+                self._close_value(closed)
+            else:
+                self._safe = (len(self._chars), tuple(self._stack))
+        elif ch == ',':
+            self._safe = (len(self._chars) - 1, tuple(self._stack))
+
+    def _close_value(self, closed: list):
+        """A top-level value just ended; decode it once."""
+        self._phase = 'after_value'
+        try:
+            value = json.loads(''.join(self._chars))
+        except json.JSONDecodeError as e:
+            if self._kind != 'string':
+                self.error = f"bad value for {self._key!r}: {e}"
+                return
+            value = ''.join(self._decoded)    # invalid escape; keep the lenient decode
+
+        self.fields[self._key] = value
+        closed.append((self._key, value))
+
+    def _finish(self):
+        self._phase = 'done'
+        self.complete = True
+
+    # -- truncation repair ---------------------------------------------------
+
+    def _repair(self):
+        """Best-effort value for a top-level value cut off mid-way."""
+        if self._kind == 'string':
+            return ''.join(self._decoded)
+
+        text = ''.join(self._chars)
+        if self._kind == 'scalar':
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError:
+                return _MISSING
+
+        # Container: first just close the open string and containers...
+        if self._in_string:
+            if self._escape is not None:
+                text = ''.join(self._chars[:self._escape_at])
+            text += '"'
+        try:
+            return json.loads(text + _closing(self._stack))
+        except json.JSONDecodeError:
+            pass
+
+        # ...then fall back to the last complete element
+        if self._safe:
+            cut, stack = self._safe
+            try:
+                return json.loads(''.join(self._chars[:cut]) + _closing(stack))
+            except json.JSONDecodeError:
+                pass
+        return _MISSING
+
+
+_raw_decoder = json.JSONDecoder()
+_skip_ws = json.decoder.WHITESPACE.match
+# A complete key and its colon, and what may follow a complete value
+_KEY = re.compile(r'"((?:[^"\\\x00-\x1f]|\\.)*)"[ \t\n\r]*:[ \t\n\r]*')
+_DELIMITER = re.compile(r'[ \t\n\r]*([,}]?)[ \t\n\r]*')
+
+
+def _is_high_surrogate(piece: str) -> bool:
+    return len(piece) == 1 and 0xD800 <= ord(piece) <= 0xDBFF
+
+
+def _closing(stack) -> str:
+    return ''.join(_CLOSERS[c] for c in reversed(stack))
+
+
+def _complete_fields(text: str, start: int):
+    """(fields, index) for the top-level fields the C decoder can read whole.
+
+    Stops at the first field it can't (cut off, or not strict JSON) and
+    returns that field's start, or None when the object closed. A field
+    counts only once the ',' or '}' after it (or the end of the text) is
+    seen, so a number cut off mid-way is left for the repair.
+    """
+    fields = {}
+    i = _skip_ws(text, start + 1).end()
+    n = len(text)
+    while i < n:
+        key_match = _KEY.match(text, i)
+        if key_match is None:
+            return fields, (None if text[i] == '}' else i)
+        key = key_match.group(1)
+        if '\\' in key:
+            key = json.loads('"' + key + '"')
+        try:
+            value, end = _raw_decoder.raw_decode(text, key_match.end())
+        except json.JSONDecodeError:
+            return fields, i
+        delimiter = _DELIMITER.match(text, end)
+        if delimiter.end() < n and not delimiter.group(1):
+            return fields, i
+        fields[key] = value
+        if delimiter.group(1) == '}':
+            return fields, None
+        i = delimiter.end()
+    return fields, n
+
+
+def decode_json(text: str) -> dict:
+    """Decode a complete (or truncated) reply in one call; {} if no object was found.
+
+    Well-formed objects (trailing text allowed) go straight through the C
+    decoder. Otherwise the fields before the damage are still read by the C
+    decoder, and only the rest goes through the single-pass decoder with
+    repair, so a reply cut off in its last field costs little more than a
+    complete one.
+    """
+    start = text.find('{')
+    if start == -1:
+        return {}
+    try:
+        value, _ = _raw_decoder.raw_decode(text, start)
+        if isinstance(value, dict):
+            return value
+    except json.JSONDecodeError:
+        pass
+
+    fields, rest = _complete_fields(text, start)
+    if rest is None:
+        return fields
+
+    decoder = JsonStreamDecoder()
+    decoder.feed('{')
+    decoder.feed(text[rest:])
+    fields.update(decoder.close())
+    return fields
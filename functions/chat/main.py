@@ -5,19 +5,68 @@ Handles scenario chat with Claude API
 Optimizations:
 - Module-level constants for scenario data (no recreation per request)
 - Haiku model for chat (faster, cheaper), Sonnet for debrief
-- Reduced max_tokens for chat responses
+- Model and max_tokens routed by difficulty, transcript length and truncation rate (routing.py);
+  a truncated reply is retried once with a larger budget
 - JSON prefilling for reliable output
 - Temperature setting for natural responses
+- Prompt caching: static chat instructions are a cache_control prefix
+- Per-(scenario, difficulty) prompt blocks precomputed at cold start; client fields go in a small suffix
+- Optional SSE streaming for chat (stream: true) so subject_response renders as it generates
+- Single-pass JSON decoding (json_stream.py) that repairs replies cut off at max_tokens
+- Server-side chat sessions (sessions.py): later turns send only session_id + message
+- History compaction (compaction.py): only the last few exchanges are replayed verbatim
+- Help answer cache (help_cache.py) with near-duplicate question matching
+- Statute snippets from the pipeline's BM25 index (statute_search.py) in scenario blocks and help prompts
+- Async ASGI entry point (chat_async) on a shared AsyncAnthropic client for concurrent trainees
+- Per-request phase timings, TTFT and token usage logged as one line (telemetry.py)
+- Custody, Miranda, force, medical aid, escalation and time pressure derived by rule
+  (scenario_state.py); the model writes only the narrative fields
+- Radio traffic answered locally from the code table and scenario facts (dispatch.py);
+  the model sees only dispatch's answer, not the code reference
 """
 
 import json
-import re
+import time
 import functions_framework
-from anthropic import Anthropic
+import functions_framework.aio
+from anthropic import Anthropic, AsyncAnthropic
+from flask import Response, stream_with_context
+from starlette.responses import Response as AsgiResponse, StreamingResponse
+
+from compaction import compact_history
+from dispatch import with_dispatch
+from help_cache import HelpCache
+from json_stream import JsonStreamDecoder, decode_json
+from routing import Router
+from scenario_state import replay_state
+from sessions import open_session_store, new_session_id
+from statute_search import open_statute_index
+import telemetry
 
 # Initialize client once at module level
 client = Anthropic()
 
+# Async client for the ASGI entry point; its connection pool is shared by
+# every concurrent request on the instance
+async_client = AsyncAnthropic()
+
+# Conversation state per chat session (in-memory unless CHAT_SESSION_DB is set)
+sessions = open_session_store()
+
+# Answers to training-help questions, reused across trainees on the same scenario
+help_cache = HelpCache.from_env()
+
+# Model / max_tokens choice per call, with per-route truncation history
+router = Router()
+
+# Parsed-statute search index from the pipeline (None if it hasn't been built)
+statute_index = open_statute_index()
+SCENARIO_STATUTES_K = 2
+HELP_STATUTES_K = 3
+
+# Request fields a session remembers, so later turns can omit them
+SESSION_SETTINGS = ('training_mode', 'scenario', 'difficulty', 'scenario_config', 'difficulty_modifier')
+
 # CORS headers as constant
 CORS_HEADERS = {
     'Access-Control-Allow-Origin': '*',
@@ -25,6 +74,34 @@ CORS_HEADERS = {
     'Access-Control-Allow-Headers': 'Content-Type',
 }
 
+# Server-Sent Events headers for the streaming chat path
+SSE_HEADERS = {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+}
+
+# Replies are prefilled so Claude continues a JSON object
+CHAT_PREFILL = '{'
+DEBRIEF_PREFILL = '{"overall_score":'
+
+# Debrief fields used when the reply can't be parsed (or was cut short)
+DEBRIEF_FALLBACK = {
+    'overall_score': 0,
+    'scenario_score': 0,
+    'scenario_summary': 'Unable to parse response.',
+    'scenario_analysis': [],
+    'scenario_strengths': [],
+    'scenario_improvements': ['Complete the scenario with more interactions'],
+    'report_score': 0,
+    'report_summary': 'Report not evaluated.',
+    'report_analysis': [],
+    'recommendations': 'Try the scenario again.'
+}
+
+# Empty values for debrief fields a truncated reply never reached
+DEBRIEF_DEFAULTS = {key: type(value)() for key, value in DEBRIEF_FALLBACK.items()}
+
 # Scenario prompts as module-level constant (not recreated per request)
 SCENARIO_PROMPTS = {
     # Traffic
@@ -301,28 +378,9 @@ Based on violations, note potential real-world consequences:
 Respond with valid JSON only:"""
 
 
-def get_scenario_prompt(scenario_type, difficulty, scenario_config, difficulty_modifier):
-    """Generate scenario-specific prompt based on type and difficulty."""
-    scenario_info = SCENARIO_PROMPTS.get(scenario_type, SCENARIO_PROMPTS['dui'])
-    difficulty_behavior = DIFFICULTY_BEHAVIORS.get(difficulty, DIFFICULTY_BEHAVIORS['medium'])
-
-    return f"""You are an AI training system for law enforcement officers, simulating a realistic scenario.
-
-CURRENT SCENARIO:
-- Type: {scenario_config.get('title', 'Unknown')}
-- Location: {scenario_config.get('location', 'Unknown')}
-- Situation: {scenario_info['situation']}
-- Subject: {scenario_info['subject']}
-
-DIFFICULTY LEVEL: {difficulty.upper()}
-{difficulty_modifier}
-
-YOUR ROLE - Play the SUBJECT:
-- Base behavior: {scenario_info['behavior']}
-- Adjusted for difficulty: {difficulty_behavior}
-- Respond realistically with short, natural dialogue
-- React to officer actions appropriately
-- Never break character or acknowledge you're an AI
+# Scenario-independent instructions. Sent first as its own system block with
+# cache_control so every chat turn reuses the cached prefix.
+CHAT_INSTRUCTIONS = """You are an AI training system for law enforcement officers, simulating a realistic scenario.
 
 OFFICER INPUT FORMAT:
 The officer's input may include multiple parts:
@@ -332,6 +390,9 @@ The officer's input may include multiple parts:
 
 React appropriately to ALL parts of their input.
 
+SCENARIO STATE:
+Custody, Miranda, use of force, medical aid, escalation and time pressure are tracked by the system from the officer's input. The current state comes in a SCENARIO STATE line before the officer's message. Keep the scene consistent with it and use it for hints and evaluation (e.g. a custody_violation means statements will be suppressed). Do not output these fields.
+
 AUTONOMOUS BACKUP OFFICER:
 A competent backup officer (Officer Martinez) is ALWAYS on scene and acts autonomously following standard police procedures. The backup officer takes initiative without needing to be commanded.
 
@@ -387,160 +448,34 @@ When backup receives a direct command from primary officer:
 
 The backup officer is YOUR PARTNER - they handle their responsibilities autonomously AND follow any specific directions you give them.
 
-PHOENIX PD RADIO CODES - COMPLETE REFERENCE:
-This is the LANGUAGE everyone uses. Dispatcher, backup officer, and primary officer ALL understand these codes.
-
-TEN CODES:
-- 10-1: Signal Weak
-- 10-4: Affirmative (OK)
-- 10-6: Busy
-- 10-7: Going Off Duty/Out of Service
-- 10-8: In Service
-- 10-9: Say Again
-- 10-12: Stand-By (Stop)
-- 10-17: Enroute
-- 10-20: Location
-- 10-21: Call by Phone
-- 10-22: Disregard/Take No Further Action
-- 10-23: Arrived on Scene
-- 10-25: Report to (Meet)
-- 10-27: Driver License/Permit - Dispatch runs DL check
-- 10-28: Ownership/Registration Information - Dispatch runs vehicle registration
-- 10-29: Records Check/Warrant Information - Dispatch checks warrants and criminal history
-- 10-31: Pick Up Papers
-- 10-33: Help Me Quick
-- 10-42: Prisoner in Custody/Booking
-- 10-44: Does Not Conform with Rules and Regulations
-- 10-50: Switching to Channel
-- 10-51: Felony Warrant Outstanding
-- 10-52: Misdemeanor Warrant Outstanding
-- 10-60: Female Officer Needed
-- 10-70: PR Contact
-- 10-76: Notify Owner of Vehicle Recovery
-- 10-91: Assist Stranded Motorist
-- 10-92: Wagon Wanted
-
-SIGNAL CODES:
-- 3: Emergency - Use Red Lights & Siren
-- 4: No Further Assistance Needed
-- 5: Stake Out - Other Units Stay Away
-- 6: Out for Investigation
-
-RADIO CODES (CALL TYPES):
-- 101/102: Woman in/out of Car
-- 210: Strong Armed Robbery
-- 211: Armed Robbery
-- 236: Threat
-- 239: Fight
-- 240: Assault
-- 245: Aggravated Assault
-- 250: Harassment
-- 260: Sexual Abuse - Adult
-- 261: Sexual Assault
-- 301: Prostitution
-- 311: Indecent Exposure
-- 312: Child Neglect
-- 315: Forgery
-- 315I: Identity Theft
-- 318: Theft by Fraud
-- 390: Drunk (Disturbing)
-- 390D: Drunk Driver
-- 415: Criminal Damage
-- 415F: Domestic Violence
-- 417G: Subject with a Gun
-- 417K: Subject with a Knife
-- 451: Homicide
-- 459: Burglary
-- 487: Theft
-- 488: Recovered Property
-- 491: Kidnapping
-- 503: City Ordinance Offense
-- 508: Traffic Control
-- 510: Speeding/Racing
-- 511: Vehicle Stop
-- 585: Traffic Hazard
-- 601: Missing Person
-- 647: Suspicious Person
-- 651: Loose Animals
-- 707: Bomb Threat
-- 901: Cutting/Stabbing
-- 901G: Shooting
-- 901H: Dead Body
-- 901O: Overdose
-- 901U: Suicide
-- 906: Officer Needs Assistance
-- 907: Backup Requested
-- 911H: 9-1-1 Hang-Up
-- 915: Arson
-- 917: Abandoned Vehicle
-- 918: Mentally Ill Subject
-- 927: Unknown Trouble
-- 928: Found Property
-- 961: Accident - No Injuries
-- 962: Accident - Injuries
-- 963: Accident - Fatality
-- 998: Officer Involved Shooting
-- 999: Officer Needs Help Urgently
-
-CRITICAL - DISPATCHER RESPONSES:
-When officer uses ANY radio code, generate appropriate dispatch_response:
-
-10-27 (Driver License): "Unit [#], 10-27 shows valid/suspended/revoked Arizona DL for [name], DOB [date]"
-10-28 (Registration): "Unit [#], 10-28 shows [year/make/model] registered to [name] at [address]"
-10-29 (Warrants/Records): "Unit [#], 10-29 [shows warrant/negative for warrants]. [Prior arrests if relevant]"
-10-27/10-29 (Combined): "Unit [#], your 10-27 shows valid Arizona DL. 10-29 negative for warrants" OR "10-29 shows 10-51 for [charge]"
-10-23 (Arrived): Dispatch acknowledges "10-4, Unit [#] on scene [time]"
-10-8 (In Service): "10-4, Unit [#] back in service"
-10-33 (Help Quick): Dispatch sends additional units immediately
-906 (Needs Assistance): "All units, 906 at [location], Unit [#] needs assistance"
-907 (Backup): "10-4, showing backup enroute"
-999 (Officer Help Urgent): "999! 999! All units respond to [location]! Unit [#] needs help!"
-998 (OIS): "998, Officer Involved Shooting at [location]. Sending supervisors and FIT."
-4 (Code 4): Dispatch acknowledges "10-4"
-
-BACKUP OFFICER CODE UNDERSTANDING:
-Backup officer HEARS all radio traffic and responds accordingly:
-- 10-27/10-29: Backup hears dispatch response, adjusts tactics if warrant/suspended DL
-- 10-33/906/999: Backup increases alert level, moves to better position
-- 4 (Code 4): Backup relaxes slightly but stays ready
-- 907 (Backup Requested): Additional backup units arrive (mention in backup_report if relevant)
-
-Match dispatch responses to scenario (warrant scenario = warrant found, suspended license scenario = suspended DL, etc.)
+RADIO TRAFFIC:
+Dispatch is simulated by the system. When the officer radios, a DISPATCH line after their message gives dispatch's answer (license, registration and warrant returns, backup, emergency traffic) and what each code used means. Everyone on scene hears it: the subject and backup react to it (a warrant return, a 10-33, Code 4). Leave dispatch_response null unless the DISPATCH line says there is no system answer; then write dispatch's reply yourself.
 
 RESPONSE FORMAT - Return valid JSON only:
-{{
+{
   "subject_response": "What the subject says (realistic dialogue)",
   "subject_mood": "calm" | "nervous" | "agitated" | "hostile" | "defeated",
   "subject_action": "Brief body language/actions",
-  "dispatch_response": "Dispatch radio response if officer radioed, or null if no radio traffic",
+  "dispatch_response": "Dispatch reply only when the DISPATCH line has no system answer, else null",
   "backup_report": "AUTONOMOUS backup officer report - what Officer Martinez discovered/observed while conducting their investigation (generate this automatically every 1-2 turns when backup is actively investigating additional subjects, witnesses, or conducting scene work). Null only if backup has nothing new to report.",
   "supervisor_notification": "Supervisor responds if critical incident occurred (OIS, use of force, pursuit, serious injury). Format: 'Sergeant [name]: [questions about incident]' or null",
-  "force_used": {{"type": "none" | "verbal" | "hands" | "taser" | "firearm", "justified": true/false, "threat_level": "none" | "passive" | "active" | "aggravated" | "deadly", "articulation_required": true/false}},
   "evidence_visible": ["item1", "item2"] or [],
   "evidence_collected": ["item1"] or [],
-  "medical_status": {{"subject_condition": "normal" | "injured" | "critical" | "overdose" | "seizure", "aid_rendered": true/false, "required": true/false}},
-  "custody_status": {{"in_custody": true/false, "miranda_required": true/false, "miranda_read": true/false, "interrogation_occurred": true/false, "violation": "reason" or null}},
-  "escalation_level": 1-5,
-  "time_pressure": {{"urgency": "low" | "medium" | "high" | "critical", "consequence_if_delay": "what happens if officer waits"}},
+  "subject_condition": "normal" | "injured" | "critical" | "overdose" | "seizure",
   "additional_subjects": ["description of bystanders, crowds, other people present"] or [],
   "hint": "Training hint or null",
   "new_observations": [],
-  "evaluation": {{"action_taken": "", "legal_basis": null, "assessment": "correct", "note": ""}},
+  "evaluation": {"action_taken": "", "legal_basis": null, "assessment": "correct", "note": ""},
   "scenario_complete": false,
   "end_scenario_reason": null
-}}
+}
 
 NEW FEATURE GUIDELINES:
 
 1. USE OF FORCE:
-   - Track any force: verbal commands, hands-on, taser, firearm
-   - Verbal commands to uncooperative subject = "verbal" force
-   - Physical contact = "hands" force
-   - Taser deployment = "taser" force
-   - Shooting = "firearm" force
-   - Justified if: reasonable fear of harm, subject actively resistant/aggressive, proportional to threat
-   - NOT justified if: subject unarmed and compliant, excessive force, no articulated threat
-   - If officer shoots unarmed compliant person → justified: false, CRITICAL INCIDENT
+   - Show the subject's physical reaction to any force the officer uses
+   - Describe threats plainly in subject_action (weapon drawn, swings at officer, pulls away, goes limp)
+   - If officer shoots unarmed compliant person → CRITICAL INCIDENT
 
 2. EVIDENCE TRACKING:
    - evidence_visible: Items visible at scene (weapon, drugs, blood, broken items, documents)
@@ -551,31 +486,17 @@ NEW FEATURE GUIDELINES:
    - Random chance (5-10%) subject has medical issue
    - Overdose scenarios: subject collapses, blue lips, not breathing
    - Injured: bleeding, broken bones, needs medical attention
-   - If subject needs medical aid and officer doesn't render → violation, liability
-   - Officer must call fire/EMS and/or administer aid (Narcan, CPR, first aid)
-
-4. MIRANDA RIGHTS:
-   - in_custody: true when handcuffed, detained and not free to leave, in police vehicle
-   - miranda_required: true when in custody AND asking questions
-   - miranda_read: true only if officer specifically reads Miranda
-   - interrogation_occurred: true if officer asks questions while subject in custody
-   - violation: If interrogation while in custody without Miranda → statements suppressed
-
-5. ESCALATION & TIME PRESSURE:
-   - Start escalation_level: 1-2
-   - Each turn, situation may escalate if officer delays or uses wrong approach
-   - Level 1-2: Calm, manageable
-   - Level 3: Getting tense, subject more agitated
-   - Level 4: Critical, about to turn violent or someone about to get hurt
-   - Level 5: Violence occurring, life-threatening
-   - time_pressure urgency increases if officer taking too long to act
-
-6. SUPERVISOR NOTIFICATION:
+   - Set subject_condition to match; the condition worsens while the officer doesn't call fire/EMS or administer aid (Narcan, CPR, first aid)
+
+4. ESCALATION:
+   - Each turn, the subject may become more agitated or hostile if the officer delays or uses the wrong approach
+
+5. SUPERVISOR NOTIFICATION:
    Required for: Officer-involved shooting, use of force (taser/firearm), serious injury, pursuit, death
    Format: "Sergeant Davis: Unit 23, shots fired reported at your 20. What's your status? Subject condition? Weapon recovered? Any officer injuries?"
    Supervisor asks probing questions about the incident
 
-7. ADDITIONAL SUBJECTS / CHAOS:
+6. ADDITIONAL SUBJECTS / CHAOS:
    - Include bystanders filming, crowd gathering, other people present
    - Domestic scenarios: children present, neighbors watching
    - Traffic stops: passengers in vehicle, cars driving by
@@ -590,7 +511,7 @@ CRITICAL: Always generate backup_report when:
 - Traffic stops: Backup observing occupants or assisting with arrest
 - Any scenario with additional subjects or witnesses
 - PRIMARY OFFICER GIVES BACKUP A DIRECT COMMAND in their [SAYS] - backup executes and reports immediately
-- OFFICER USES RADIO CODES - backup hears the codes and dispatch response, may adjust tactics
+- OFFICER USES THE RADIO - backup hears the DISPATCH line and may adjust tactics
 
 DETECTING NATURAL COMMANDS:
 Parse the officer's [SAYS] content for phrases directed at backup officer:
@@ -601,12 +522,8 @@ Parse the officer's [SAYS] content for phrases directed at backup officer:
 
 When you detect a command, generate backup_report showing backup completed the task.
 
-BACKUP OFFICER RADIO CODE RESPONSES:
-When primary officer radios codes, backup officer HEARS dispatch response and may react in backup_report:
-- 10-29 shows 10-51 (felony warrant): "Officer Martinez: *heard dispatch traffic about felony warrant* Moving to better cover position, hand near weapon"
-- 10-29 shows 10-52 (misdemeanor warrant): "Officer Martinez: Heard the warrant return. Standing by to assist with arrest"
-- 10-33/906/999 (officer needs help): "Officer Martinez: Heard your 10-33! Moving up to provide immediate support"
-- 4 (Code 4): "Officer Martinez: 10-4, Code 4. Scene is secure"
+BACKUP OFFICER RADIO TRAFFIC:
+Backup hears every DISPATCH line and may react in backup_report, e.g. a felony warrant return: "Officer Martinez: *heard the 10-51* Moving to better cover position, hand near weapon"
 
 Format backup reports like: "Officer Martinez: [what they did] - [what they found/heard]. [Key details]. [Any evidence or observations]."
 
@@ -627,54 +544,162 @@ LEGAL FRAMEWORK (Arizona):
 - SFSTs are voluntary but refusal can be noted"""
 
 
+def build_scenario_block(scenario_type, difficulty):
+    """Static system block for one (scenario, difficulty) pair."""
+    scenario_info = SCENARIO_PROMPTS[scenario_type]
+    difficulty_behavior = DIFFICULTY_BEHAVIORS[difficulty]
+
+    text = f"""CURRENT SCENARIO:
+- Situation: {scenario_info['situation']}
+- Subject: {scenario_info['subject']}
+
+DIFFICULTY LEVEL: {difficulty.upper()}
+
+YOUR ROLE - Play the SUBJECT:
+- Base behavior: {scenario_info['behavior']}
+- Adjusted for difficulty: {difficulty_behavior}
+- Respond realistically with short, natural dialogue
+- React to officer actions appropriately
+- Never break character or acknowledge you're an AI"""
+
+    # Statutes matching the scenario, looked up once here rather than per request
+    if statute_index is not None:
+        statutes = statute_index.search(f"{scenario_info['situation']} {scenario_info['subject']}",
+                                        SCENARIO_STATUTES_K)
+        if statutes:
+            text += "\n\nRELEVANT ARIZONA STATUTES (for evaluation and hints):\n" + "\n\n".join(statutes)
+
+    # Second cache breakpoint: instructions + this block are byte-identical
+    # for every request in the same scenario and difficulty
+    return {'type': 'text', 'text': text, 'cache_control': {'type': 'ephemeral'}}
+
+
+INSTRUCTIONS_BLOCK = {'type': 'text', 'text': CHAT_INSTRUCTIONS, 'cache_control': {'type': 'ephemeral'}}
+
+# Every (scenario, difficulty) block, built once at cold start
+SCENARIO_BLOCKS = {
+    (scenario_type, difficulty): build_scenario_block(scenario_type, difficulty)
+    for scenario_type in SCENARIO_PROMPTS
+    for difficulty in VALID_DIFFICULTIES
+}
+
+
+def get_scenario_prompt(scenario_type, difficulty, scenario_config, difficulty_modifier):
+    """Generate scenario-specific prompt based on type and difficulty.
+
+    Returns system blocks: the cached static instructions, the precomputed
+    (scenario, difficulty) block, then a small suffix with the fields the
+    client sends (title, location, difficulty modifier).
+    """
+    scenario_block = SCENARIO_BLOCKS.get((scenario_type, difficulty)) or SCENARIO_BLOCKS[('dui', 'medium')]
+
+    details = f"""SCENARIO DETAILS:
+- Type: {scenario_config.get('title', 'Unknown')}
+- Location: {scenario_config.get('location', 'Unknown')}"""
+    if difficulty_modifier:
+        details += f"\n\nDIFFICULTY NOTES:\n{difficulty_modifier}"
+
+    return [INSTRUCTIONS_BLOCK, scenario_block, {'type': 'text', 'text': details}]
+
+
+def log_usage(action, response):
+    """Add token usage to the request trace; outside a request, log it as a structured line."""
+    trace = telemetry.current_trace()
+    if trace is not None:
+        trace.record_usage(response)
+        return
+
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+
+    print(json.dumps({
+        'event': 'claude_usage',
+        'action': action,
+        'model': getattr(response, 'model', None),
+        'input_tokens': getattr(usage, 'input_tokens', 0),
+        'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0,
+        'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+        'output_tokens': getattr(usage, 'output_tokens', 0),
+    }))
+
+
+def call_model(route, params):
+    """messages.create on the routed model; a truncated reply is retried once with a larger budget."""
+    with telemetry.span('model_call'):
+        start = time.perf_counter()
+        response = client.messages.create(**params)
+        truncated = router.record(route, response, time.perf_counter() - start)
+    log_usage(route['action'], response)
+
+    retried = router.should_retry(route, truncated, 1)
+    if retried:
+        with telemetry.span('model_retry'):
+            start = time.perf_counter()
+            response = client.messages.create(**{**params, 'max_tokens': route['retry_max_tokens']})
+            router.record(route, response, time.perf_counter() - start, attempt=2)
+        log_usage(route['action'], response)
+
+    telemetry.annotate(route=route['name'], retried=retried)
+    return response
+
+
 @functions_framework.http
 def chat(request):
     """Handle chat requests."""
     if request.method == 'OPTIONS':
         return ('', 204, CORS_HEADERS)
 
+    trace = telemetry.start_trace()
     try:
-        data = request.get_json()
+        with telemetry.span('decode_request'):
+            data = request.get_json()
         if not data:
-            return (json.dumps({'error': 'No JSON data provided'}), 400, CORS_HEADERS)
-
-        action = data.get('action', 'chat')
-
-        if action == 'chat':
-            return handle_chat(data)
-        elif action == 'debrief':
-            return handle_debrief(data)
-        elif action == 'help':
-            return handle_help(data)
+            result = (json.dumps({'error': 'No JSON data provided'}), 400, CORS_HEADERS)
         else:
-            return (json.dumps({'error': 'Invalid action'}), 400, CORS_HEADERS)
+            result = route_request(data)
 
     except Exception as e:
-        return (json.dumps({'error': str(e)}), 500, CORS_HEADERS)
-
+        result = (json.dumps({'error': str(e)}), 500, CORS_HEADERS)
+        finish_trace(trace, result, e)
+        return result
+
+    finish_trace(trace, result)
+    return result
+
+
+def route_request(data):
+    action = data.get('action', 'chat')
+    telemetry.annotate(action=action)
+
+    if action == 'chat':
+        if data.get('stream'):
+            return handle_chat_stream(data)
+        return handle_chat(data)
+    elif action == 'debrief':
+        return handle_debrief(data)
+    elif action == 'help':
+        return handle_help(data)
+    else:
+        return (json.dumps({'error': 'Invalid action'}), 400, CORS_HEADERS)
+
+
+def finish_trace(trace, result, error=None):
+    """Log the request trace, unless a stream generator is still running and will."""
+    if trace.streaming:
+        return
+    status = result[1] if isinstance(result, tuple) else result.status_code
+    trace.finish(status, error)
+
+
+def chat_history(messages, officer_message=''):
+    """Claude messages for a client transcript - only the essential data."""
+    # The client appends the new officer message to its transcript before
+    # sending it separately; keep it out of the history
+    if officer_message and messages and messages[-1].get('role') == 'officer' \
+            and messages[-1].get('content') == officer_message:
+        messages = messages[:-1]
 
-def handle_chat(data):
-    """Process a chat message."""
-    messages = data.get('messages', [])
-    officer_message = data.get('message', '')
-    training_mode = data.get('training_mode', True)
-    scenario_type = data.get('scenario', 'dui')
-    difficulty = data.get('difficulty', 'medium')
-    scenario_config = data.get('scenario_config', {'title': 'Unknown', 'location': 'Unknown'})
-    difficulty_modifier = data.get('difficulty_modifier', '')
-
-    # Validate difficulty
-    if difficulty not in VALID_DIFFICULTIES:
-        difficulty = 'medium'
-
-    # Validate scenario_type
-    if scenario_type not in SCENARIO_PROMPTS:
-        scenario_type = 'dui'
-
-    # Generate dynamic prompt based on scenario and difficulty
-    system_prompt = get_scenario_prompt(scenario_type, difficulty, scenario_config, difficulty_modifier)
-
-    # Build conversation for Claude - only include essential data
     claude_messages = []
     for msg in messages:
         if msg['role'] == 'officer':
@@ -692,71 +717,164 @@ def handle_chat(data):
                     'scenario_complete': False
                 }))
             })
+    return claude_messages
+
+
+def load_chat_session(data):
+    """(session_id, session) for a chat request; session is None if it expired.
+
+    A request carrying `messages` (re)starts the session from the client's
+    transcript; one with only `session_id` + `message` continues the stored one.
+    """
+    session_id = data.get('session_id')
+    with telemetry.span('load_session'):
+        if session_id and 'messages' not in data:
+            return session_id, sessions.get(session_id)
 
-    # Add new officer message
+        return session_id or new_session_id(), {
+            'settings': {key: data[key] for key in SESSION_SETTINGS if key in data},
+            'history': chat_history(data.get('messages', []), data.get('message', '')),
+        }
+
+
+def save_chat_turn(session_id, session, officer_message, response_text):
+    """Append the officer message and Claude's reply to the stored conversation."""
+    turn = []
     if officer_message:
+        turn.append({'role': 'user', 'content': f"OFFICER: {officer_message}"})
+    turn.append({'role': 'assistant', 'content': response_text})
+    with telemetry.span('save_session'):
+        sessions.put(session_id, {**session, 'history': session['history'] + turn})
+
+
+def session_expired():
+    return (json.dumps({'error': 'session_expired'}), 409, CORS_HEADERS)
+
+
+def build_chat_request(data, session):
+    """Messages API parameters for a chat turn, plus the training_mode flag, route,
+    scenario state (after the officer's message, before the reply) and dispatch's
+    answer to the officer's radio traffic, if any.
+
+    Scenario settings come from the request, falling back to the ones the
+    session was started with.
+    """
+    settings = {**session['settings'], **{k: data[k] for k in SESSION_SETTINGS if k in data}}
+    officer_message = data.get('message', '')
+    training_mode = settings.get('training_mode', True)
+    scenario_type = settings.get('scenario', 'dui')
+    difficulty = settings.get('difficulty', 'medium')
+    scenario_config = settings.get('scenario_config', {'title': 'Unknown', 'location': 'Unknown'})
+    difficulty_modifier = settings.get('difficulty_modifier', '')
+
+    # Validate difficulty
+    if difficulty not in VALID_DIFFICULTIES:
+        difficulty = 'medium'
+
+    # Validate scenario_type
+    if scenario_type not in SCENARIO_PROMPTS:
+        scenario_type = 'dui'
+
+    telemetry.annotate(scenario=scenario_type, difficulty=difficulty)
+
+    # Exchanges so far, counting this one
+    exchanges = sum(1 for msg in session['history'] if msg['role'] == 'user') + 1
+    route = router.route('chat', difficulty, exchanges)
+
+    # Generate dynamic prompt based on scenario and difficulty
+    with telemetry.span('build_prompt'):
+        system_prompt = get_scenario_prompt(scenario_type, difficulty, scenario_config, difficulty_modifier)
+
+    # Custody / Miranda / force state replayed from the transcript, then this message
+    with telemetry.span('scenario_state'):
+        state = replay_state(session['history'])
+        if officer_message:
+            state.officer_turn(officer_message)
+
+    # Radio traffic is answered from the code table; each officer turn gets its DISPATCH line
+    location = scenario_config.get('location')
+    with telemetry.span('dispatch'):
+        history = [
+            {**msg, 'content': with_dispatch(msg['content'], scenario_type, location)[0]}
+            if msg['role'] == 'user' else msg
+            for msg in session['history']
+        ]
+        officer_content, dispatch_response = with_dispatch(f"OFFICER: {officer_message}", scenario_type, location)
+
+    with telemetry.span('assemble_messages'):
+        # Older turns are folded into a scenario-state summary
+        claude_messages = compact_history(history)
+
+        # Add new officer message, with the current state ahead of it
+        if officer_message:
+            claude_messages.append({
+                'role': 'user',
+                'content': f"{state.prompt_line()}\n\n{officer_content}"
+            })
+
+        # Add prefill to ensure JSON output
         claude_messages.append({
-            'role': 'user',
-            'content': f"OFFICER: {officer_message}"
+            'role': 'assistant',
+            'content': CHAT_PREFILL
         })
 
-    # Use Haiku for faster, cheaper chat responses
-    # Add prefill to ensure JSON output
-    claude_messages.append({
-        'role': 'assistant',
-        'content': '{'
-    })
-
-    response = client.messages.create(
-        model='claude-3-5-haiku-20241022',  # Haiku is 10x faster/cheaper for chat
-        max_tokens=512,  # Reduced from 1024 - responses are short
-        temperature=0.7,  # Slightly higher for more natural roleplay
-        system=system_prompt,
-        messages=claude_messages
-    )
+    params = {
+        'model': route['model'],  # Haiku unless a long expert scenario
+        'max_tokens': route['max_tokens'],
+        'temperature': 0.7,  # Slightly higher for more natural roleplay
+        'system': system_prompt,
+        'messages': claude_messages
+    }
+    return params, training_mode, route, state, dispatch_response
 
-    # Reconstruct full JSON (we prefilled with '{')
-    response_text = '{' + response.content[0].text
 
-    try:
-        parsed = json.loads(response_text)
-    except json.JSONDecodeError:
-        # Try to fix common JSON issues
-        try:
-            # Sometimes response has trailing text after JSON
-            json_match = re.search(r'\{[\s\S]*\}', response_text)
-            if json_match:
-                parsed = json.loads(json_match.group(0))
-            else:
-                raise ValueError("No JSON found")
-        except:
-            parsed = {
-                'subject_response': response_text,
-                'subject_mood': 'nervous',
-                'subject_action': '',
-                'hint': None,
-                'evaluation': None,
-                'scenario_complete': False
-            }
+def shape_chat_result(response_text, training_mode, state, dispatch_response=None, parsed=None):
+    """Turn the full reply text (prefill included) into the chat result the client expects.
+
+    parsed is the reply already decoded while streaming; otherwise the text is decoded here.
+    """
+    # Tolerates trailing text and repairs a reply cut off at max_tokens
+    if parsed is None:
+        with telemetry.span('repair_json'):
+            parsed = decode_json(response_text)
+
+    with telemetry.span('shape_result'):
+        return chat_result(parsed, response_text, training_mode, state, dispatch_response)
+
+
+def chat_result(parsed, response_text, training_mode, state, dispatch_response=None):
+    """The result fields the client expects, from a decoded reply.
+
+    The reply is applied to the scenario state, which supplies force,
+    medical, custody, escalation and time-pressure fields. A locally answered
+    dispatch_response takes the place of the model's.
+    """
+    if 'subject_response' not in parsed:
+        parsed = {
+            'subject_response': response_text,
+            'subject_mood': 'nervous',
+            'subject_action': '',
+            'hint': None,
+            'evaluation': None,
+            'scenario_complete': False
+        }
 
     # Only include hint if in training mode
     if not training_mode:
         parsed['hint'] = None
 
-    result = {
+    state.subject_turn(parsed)
+
+    return {
         'subject_response': parsed.get('subject_response', ''),
         'subject_mood': parsed.get('subject_mood', 'nervous'),
         'subject_action': parsed.get('subject_action', ''),
-        'dispatch_response': parsed.get('dispatch_response'),
+        'dispatch_response': dispatch_response or parsed.get('dispatch_response'),
         'backup_report': parsed.get('backup_report'),
         'supervisor_notification': parsed.get('supervisor_notification'),
-        'force_used': parsed.get('force_used', {'type': 'none', 'justified': True, 'threat_level': 'none', 'articulation_required': False}),
         'evidence_visible': parsed.get('evidence_visible', []),
         'evidence_collected': parsed.get('evidence_collected', []),
-        'medical_status': parsed.get('medical_status', {'subject_condition': 'normal', 'aid_rendered': False, 'required': False}),
-        'custody_status': parsed.get('custody_status', {'in_custody': False, 'miranda_required': False, 'miranda_read': False, 'interrogation_occurred': False, 'violation': None}),
-        'escalation_level': parsed.get('escalation_level', 1),
-        'time_pressure': parsed.get('time_pressure', {'urgency': 'low', 'consequence_if_delay': None}),
+        **state.fields(),
         'additional_subjects': parsed.get('additional_subjects', []),
         'hint': parsed.get('hint'),
         'new_observations': parsed.get('new_observations', []),
@@ -765,93 +883,212 @@ def handle_chat(data):
         'raw_response': response_text
     }
 
+
+def finish_chat(data, session_id, session, training_mode, state, dispatch_response, response_text,
+                parsed=None):
+    """Store the turn and build the chat result (shared by every chat path)."""
+    save_chat_turn(session_id, session, data.get('message', ''), response_text)
+
+    result = shape_chat_result(response_text, training_mode, state, dispatch_response, parsed)
+    result['session_id'] = session_id
+    return result
+
+
+def handle_chat(data):
+    """Process a chat message."""
+    session_id, session = load_chat_session(data)
+    if session is None:
+        return session_expired()
+    params, training_mode, route, state, dispatch_response = build_chat_request(data, session)
+
+    response = call_model(route, params)
+
+    # Reconstruct full JSON (we prefilled with '{')
+    response_text = CHAT_PREFILL + response.content[0].text
+    result = finish_chat(data, session_id, session, training_mode, state, dispatch_response, response_text)
     return (json.dumps(result), 200, CORS_HEADERS)
 
 
-def handle_debrief(data):
-    """Generate scenario debrief."""
+def sse_event(event, payload):
+    """One Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+class ChatStreamEvents:
+    """Turns streamed reply text into SSE frames (shared by the sync and async stream paths)."""
+
+    def __init__(self, training_mode, dispatch_response=None):
+        self.training_mode = training_mode
+        self.dispatch_response = dispatch_response
+        self.decoder = JsonStreamDecoder()
+        self.decoder.feed(CHAT_PREFILL)
+        self.chunks = [CHAT_PREFILL]
+        self.sent = 0
+
+    @property
+    def response_text(self):
+        return ''.join(self.chunks)
+
+    def decoded(self):
+        """Every field of the streamed reply, repaired like decode_json() would.
+
+        The decoder has already seen every chunk, so the text isn't decoded again.
+        """
+        return self.decoder.close()
+
+    def feed(self, chunk):
+        """SSE frames for one streamed text chunk."""
+        self.chunks.append(chunk)
+        frames = []
+
+        for name, value in self.decoder.feed(chunk):
+            if name == 'subject_response':
+                rest = value[self.sent:] if isinstance(value, str) else ''
+                if rest:
+                    frames.append(sse_event('subject_response', {'delta': rest}))
+            elif name == 'dispatch_response' and self.dispatch_response:
+                continue
+            elif name != 'hint' or self.training_mode:
+                frames.append(sse_event('field', {'name': name, 'value': value}))
+
+        partial = self.decoder.take_partial()
+        if partial and partial[0] == 'subject_response' and partial[1]:
+            frames.append(sse_event('subject_response', {'delta': partial[1]}))
+            self.sent += len(partial[1])
+
+        return frames
+
+
+def handle_chat_stream(data):
+    """Process a chat message as an SSE stream.
+
+    Events, in order:
+      subject_response  {"delta": "..."} as the spoken line is generated
+      field             {"name": ..., "value": ...} for each other top-level field as it closes;
+                        a locally answered dispatch_response comes first, before the model call
+      result            the same object the non-streaming path returns
+      error             {"error": "..."} if the call fails mid-stream
+
+    An expired session is answered with a plain 409 before any streaming.
+    """
+    session_id, session = load_chat_session(data)
+    if session is None:
+        return session_expired()
+    params, training_mode, route, state, dispatch_response = build_chat_request(data, session)
+
+    # Text already sent can't be taken back, so a truncated stream is not retried;
+    # it still counts toward the route's truncation rate
+    # The generator outlives this call; it logs the trace when the stream ends
+    trace = telemetry.current_trace() or telemetry.start_trace('chat')
+    trace.streaming = True
+    trace.annotate(route=route['name'], retried=False)
+
+    def generate():
+        events = ChatStreamEvents(training_mode, dispatch_response)
+        if dispatch_response:
+            yield sse_event('field', {'name': 'dispatch_response', 'value': dispatch_response})
+
+        try:
+            with trace.span('model_call'):
+                start = time.perf_counter()
+                with client.messages.stream(**params) as stream:
+                    for chunk in stream.text_stream:
+                        trace.first_token()
+                        yield from events.feed(chunk)
+
+                    final = stream.get_final_message()
+                router.record(route, final, time.perf_counter() - start)
+            log_usage('chat', final)
+
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+            trace.finish(200, e)
+            return
+
+        result = finish_chat(data, session_id, session, training_mode, state, dispatch_response,
+                             events.response_text, events.decoded())
+        yield sse_event('result', result)
+        trace.finish(200)
+
+    return Response(stream_with_context(generate()), status=200,
+                    headers={**CORS_HEADERS, **SSE_HEADERS})
+
+
+def build_debrief_request(data):
+    """Messages API parameters and route for a scenario debrief."""
     messages = data.get('messages', [])
 
     # Format conversation for debrief - more concise
-    conversation_parts = []
-    for msg in messages:
-        if msg['role'] == 'system':
-            conversation_parts.append(f"[SCENARIO] {msg['content']}")
-        elif msg['role'] == 'officer':
-            conversation_parts.append(f"OFFICER: {msg['content']}")
-        elif msg['role'] == 'subject':
-            conversation_parts.append(f"SUBJECT: {msg['content']}")
+    with telemetry.span('assemble_messages'):
+        conversation_parts = []
+        for msg in messages:
+            if msg['role'] == 'system':
+                conversation_parts.append(f"[SCENARIO] {msg['content']}")
+            elif msg['role'] == 'officer':
+                conversation_parts.append(f"OFFICER: {msg['content']}")
+            elif msg['role'] == 'subject':
+                conversation_parts.append(f"SUBJECT: {msg['content']}")
+
+        conversation_text = "\n".join(conversation_parts)
 
-    conversation_text = "\n".join(conversation_parts)
+    # Sonnet for debrief (more complex analysis needed); budget grows with the transcript
+    route = router.route('debrief', exchanges=sum(1 for msg in messages if msg['role'] == 'officer'))
 
-    # Use Sonnet for debrief (more complex analysis needed)
     # Prefill JSON for reliable output
-    response = client.messages.create(
-        model='claude-sonnet-4-20250514',
-        max_tokens=1536,  # Reduced from 2048
-        temperature=0.3,  # Lower for more consistent scoring
-        messages=[
+    params = {
+        'model': route['model'],
+        'max_tokens': route['max_tokens'],
+        'temperature': 0.3,  # Lower for more consistent scoring
+        'messages': [
             {
                 'role': 'user',
                 'content': DEBRIEF_PROMPT.format(conversation=conversation_text)
             },
             {
                 'role': 'assistant',
-                'content': '{"overall_score":'
+                'content': DEBRIEF_PREFILL
             }
         ]
-    )
+    }
+    return params, route
 
-    # Reconstruct JSON with prefill
-    response_text = '{"overall_score":' + response.content[0].text
 
-    # Try to parse JSON
-    parsed = None
-    try:
-        parsed = json.loads(response_text)
-    except json.JSONDecodeError:
-        pass
-
-    # Try extracting from markdown code block
-    if not parsed:
-        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response_text)
-        if json_match:
-            try:
-                parsed = json.loads(json_match.group(1))
-            except json.JSONDecodeError:
-                pass
-
-    # Try finding JSON object in text
-    if not parsed:
-        json_match = re.search(r'\{[\s\S]*\}', response_text)
-        if json_match:
-            try:
-                parsed = json.loads(json_match.group(0))
-            except json.JSONDecodeError:
-                pass
+def shape_debrief_result(response):
+    # Reconstruct JSON with prefill
+    response_text = DEBRIEF_PREFILL + response.content[0].text
 
-    # Fallback
-    if not parsed:
-        parsed = {
-            'overall_score': 0,
-            'scenario_score': 0,
-            'scenario_summary': 'Unable to parse response.',
-            'scenario_analysis': [],
-            'scenario_strengths': [],
-            'scenario_improvements': ['Complete the scenario with more interactions'],
-            'report_score': 0,
-            'report_summary': 'Report not evaluated.',
-            'report_analysis': [],
-            'recommendations': 'Try the scenario again.'
-        }
+    # Single pass; a debrief cut off at max_tokens keeps the sections it finished,
+    # and only an unreadable one gets the "unable to parse" debrief
+    with telemetry.span('repair_json'):
+        decoded = decode_json(response_text)
+        parsed = {**DEBRIEF_DEFAULTS, **decoded} if decoded else DEBRIEF_FALLBACK
 
     return (json.dumps(parsed), 200, CORS_HEADERS)
 
 
-def handle_help(data):
-    """Handle training help questions."""
+def handle_debrief(data):
+    """Generate scenario debrief."""
+    params, route = build_debrief_request(data)
+    response = call_model(route, params)
+    return shape_debrief_result(response)
+
+
+def cached_help(data):
+    """Response for a help question answered earlier on the same scenario, or None."""
+    telemetry.annotate(scenario=data.get('scenario', 'unknown'))
+
+    # Repeated questions on the same scenario reuse an earlier answer
+    with telemetry.span('help_cache'):
+        cached_answer = help_cache.get(data.get('question', ''), data.get('scenario', 'unknown'),
+                                       data.get('legal_context', ''))
+    if cached_answer is not None:
+        return (json.dumps({'answer': cached_answer}), 200, CORS_HEADERS)
+    return None
+
+
+def build_help_request(data):
+    """Messages API parameters and route for a training help question."""
     question = data.get('question', '')
-    scenario = data.get('scenario', 'unknown')
     scenario_title = data.get('scenario_title', 'Unknown Scenario')
     scenario_context = data.get('scenario_context', '')
     legal_context = data.get('legal_context', '')
@@ -870,7 +1107,15 @@ def handle_help(data):
                 convo_parts.append(f"Subject: {msg.get('content', '')[:100]}")
         convo_summary = "\n".join(convo_parts)
 
-    help_prompt = f"""You are a law enforcement training assistant helping an officer-in-training during a scenario.
+    # Statutes for the question from the local index, after whatever the client sent
+    if statute_index is not None:
+        with telemetry.span('retrieve_statutes'):
+            statutes = statute_index.search(f"{question} {scenario_title}", HELP_STATUTES_K)
+        if statutes:
+            legal_context = "\n\n".join(([legal_context] if legal_context else []) + statutes)
+
+    with telemetry.span('build_prompt'):
+        help_prompt = f"""You are a law enforcement training assistant helping an officer-in-training during a scenario.
 
 CURRENT SCENARIO: {scenario_title}
 SCENARIO CONTEXT: {scenario_context}
@@ -894,23 +1139,202 @@ Provide a helpful, concise answer (2-4 sentences max). Focus on:
 
 Be direct and tactical. This is training, so give them guidance without doing the scenario for them."""
 
+    route = router.route('help')
+    params = {
+        'model': route['model'],
+        'max_tokens': route['max_tokens'],
+        'temperature': 0.5,
+        'messages': [
+            {
+                'role': 'user',
+                'content': help_prompt
+            }
+        ]
+    }
+    return params, route
+
+
+def shape_help_result(data, response):
+    answer = response.content[0].text
+    help_cache.put(data.get('question', ''), data.get('scenario', 'unknown'),
+                   data.get('legal_context', ''), answer)
+    return (json.dumps({'answer': answer}), 200, CORS_HEADERS)
+
+
+def help_fallback():
+    return (json.dumps({
+        'answer': f'Consider your legal authority for this scenario and prioritize officer safety. What specific aspect do you need help with?'
+    }), 200, CORS_HEADERS)
+
+
+def handle_help(data):
+    """Handle training help questions."""
+    cached = cached_help(data)
+    if cached is not None:
+        return cached
+
+    try:
+        params, route = build_help_request(data)
+        response = call_model(route, params)
+        return shape_help_result(data, response)
+
+    except Exception as e:
+        telemetry.annotate(fallback=f"{type(e).__name__}: {e}")
+        return help_fallback()
+
+
+# ---------------------------------------------------------------------------
+# ASGI entry point
+#
+# Same request/response contract as chat(), but model calls are awaited on
+# one shared AsyncAnthropic client (one connection pool per instance), so a
+# single instance serves many trainees while their replies generate instead
+# of holding a worker thread per call. Run with:
+#   functions-framework --target chat_async --asgi
+# Session and help-cache lookups stay synchronous: they are in-process dict
+# operations (or a local SQLite row) and return in microseconds.
+# ---------------------------------------------------------------------------
+
+def asgi_response(result):
+    """Starlette response for a (body, status, headers) handler result."""
+    body, status, headers = result
+    return AsgiResponse(body, status_code=status, headers=headers)
+
+
+@functions_framework.aio.http
+async def chat_async(request):
+    """Handle chat requests without blocking on Claude."""
+    if request.method == 'OPTIONS':
+        return asgi_response(('', 204, CORS_HEADERS))
+
+    trace = telemetry.start_trace()
+    try:
+        with telemetry.span('decode_request'):
+            try:
+                data = await request.json()
+            except ValueError:
+                data = None
+        if not data:
+            response = asgi_response((json.dumps({'error': 'No JSON data provided'}), 400, CORS_HEADERS))
+        else:
+            response = await route_request_async(data)
+
+    except Exception as e:
+        response = asgi_response((json.dumps({'error': str(e)}), 500, CORS_HEADERS))
+        finish_trace(trace, response, e)
+        return response
+
+    finish_trace(trace, response)
+    return response
+
+
+async def call_model_async(route, params):
+    """call_model() on the async client."""
+    with telemetry.span('model_call'):
+        start = time.perf_counter()
+        response = await async_client.messages.create(**params)
+        truncated = router.record(route, response, time.perf_counter() - start)
+    log_usage(route['action'], response)
+
+    retried = router.should_retry(route, truncated, 1)
+    if retried:
+        with telemetry.span('model_retry'):
+            start = time.perf_counter()
+            response = await async_client.messages.create(**{**params, 'max_tokens': route['retry_max_tokens']})
+            router.record(route, response, time.perf_counter() - start, attempt=2)
+        log_usage(route['action'], response)
+
+    telemetry.annotate(route=route['name'], retried=retried)
+    return response
+
+
+async def route_request_async(data):
+    action = data.get('action', 'chat')
+    telemetry.annotate(action=action)
+
+    if action == 'chat':
+        if data.get('stream'):
+            return await handle_chat_stream_async(data)
+        return asgi_response(await handle_chat_async(data))
+    elif action == 'debrief':
+        return asgi_response(await handle_debrief_async(data))
+    elif action == 'help':
+        return asgi_response(await handle_help_async(data))
+    else:
+        return asgi_response((json.dumps({'error': 'Invalid action'}), 400, CORS_HEADERS))
+
+
+async def handle_chat_async(data):
+    session_id, session = load_chat_session(data)
+    if session is None:
+        return session_expired()
+    params, training_mode, route, state, dispatch_response = build_chat_request(data, session)
+
+    response = await call_model_async(route, params)
+
+    response_text = CHAT_PREFILL + response.content[0].text
+    result = finish_chat(data, session_id, session, training_mode, state, dispatch_response, response_text)
+    return (json.dumps(result), 200, CORS_HEADERS)
+
+
+async def handle_chat_stream_async(data):
+    """Same events as handle_chat_stream()."""
+    session_id, session = load_chat_session(data)
+    if session is None:
+        return asgi_response(session_expired())
+    params, training_mode, route, state, dispatch_response = build_chat_request(data, session)
+
+    trace = telemetry.current_trace() or telemetry.start_trace('chat')
+    trace.streaming = True
+    trace.annotate(route=route['name'], retried=False)
+
+    async def generate():
+        events = ChatStreamEvents(training_mode, dispatch_response)
+        if dispatch_response:
+            yield sse_event('field', {'name': 'dispatch_response', 'value': dispatch_response})
+
+        try:
+            with trace.span('model_call'):
+                start = time.perf_counter()
+                async with async_client.messages.stream(**params) as stream:
+                    async for chunk in stream.text_stream:
+                        trace.first_token()
+                        for frame in events.feed(chunk):
+                            yield frame
+
+                    final = await stream.get_final_message()
+                router.record(route, final, time.perf_counter() - start)
+            log_usage('chat', final)
+
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+            trace.finish(200, e)
+            return
+
+        result = finish_chat(data, session_id, session, training_mode, state, dispatch_response,
+                             events.response_text, events.decoded())
+        yield sse_event('result', result)
+        trace.finish(200)
+
+    return StreamingResponse(generate(), status_code=200, headers={**CORS_HEADERS, **SSE_HEADERS})
+
+
+async def handle_debrief_async(data):
+    params, route = build_debrief_request(data)
+    response = await call_model_async(route, params)
+    return shape_debrief_result(response)
+
+
+async def handle_help_async(data):
+    cached = cached_help(data)
+    if cached is not None:
+        return cached
+
     try:
-        response = client.messages.create(
-            model='claude-3-5-haiku-20241022',
-            max_tokens=300,
-            temperature=0.5,
-            messages=[
-                {
-                    'role': 'user',
-                    'content': help_prompt
-                }
-            ]
-        )
-
-        answer = response.content[0].text
-        return (json.dumps({'answer': answer}), 200, CORS_HEADERS)
+        params, route = build_help_request(data)
+        response = await call_model_async(route, params)
+        return shape_help_result(data, response)
 
     except Exception as e:
-        return (json.dumps({
-            'answer': f'Consider your legal authority for this scenario and prioritize officer safety. What specific aspect do you need help with?'
-        }), 200, CORS_HEADERS)
+        telemetry.annotate(fallback=f"{type(e).__name__}: {e}")
+        return help_fallback()
@@ -0,0 +1,152 @@
+"""
+Model Routing
+Picks the model and max_tokens for each Claude call and tracks how each route performs
+
+Routes are keyed by action, model and difficulty (chat) or transcript length
+(debrief). The budget starts from a per-difficulty / per-length table, grows
+for long transcripts, and grows again while the route's recent truncation rate
+(stop_reason == "max_tokens" over the last TRUNCATION_WINDOW calls) is above
+TRUNCATION_THRESHOLD. A truncated non-streaming reply is retried once with
+a larger budget.
+
+Every call logs a "model_route" line (route, model, budget, attempt,
+stop_reason, latency, tokens, estimated cost) so the tables here can be tuned
+from real traffic - see scripts/report_routes.py.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+
+HAIKU = 'claude-3-5-haiku-20241022'
+SONNET = 'claude-sonnet-4-20250514'
+
+# USD per million tokens
+PRICES = {
+    HAIKU: {'input': 0.80, 'output': 4.00, 'cache_read': 0.08, 'cache_write': 1.00},
+    SONNET: {'input': 3.00, 'output': 15.00, 'cache_read': 0.30, 'cache_write': 3.75},
+}
+
+# Chat replies grow with difficulty (more subjects, evidence, evaluation detail)
+CHAT_TOKENS = {'trainee': 448, 'easy': 448, 'medium': 512, 'hard': 640, 'expert': 768}
+CHAT_LONG_EXCHANGES = 8        # transcripts this long carry more state per reply
+CHAT_LONG_EXTRA = 128
+CHAT_MAX_TOKENS = 1024
+CHAT_RETRY_MAX_TOKENS = 1536
+
+# Expert scenarios this long move to Sonnet (0 disables)
+CHAT_SONNET_AFTER = int(os.environ.get('CHAT_ROUTE_SONNET_AFTER', 12))
+
+# Debrief budget by number of officer turns evaluated
+DEBRIEF_TOKENS = [(4, 1024), (15, 1536), (None, 2048)]
+DEBRIEF_MAX_TOKENS = 3072
+DEBRIEF_RETRY_MAX_TOKENS = 4096
+
+HELP_TOKENS = 300
+HELP_RETRY_MAX_TOKENS = 600
+
+TRUNCATION_WINDOW = 50
+TRUNCATION_THRESHOLD = float(os.environ.get('CHAT_ROUTE_TRUNCATION_THRESHOLD', 0.05))
+TRUNCATION_STEP = 128
+
+
+def cost_usd(model, usage):
+    """Estimated cost of one call from its usage block."""
+    prices = PRICES.get(model)
+    if prices is None or usage is None:
+        return 0.0
+    return (
+        (getattr(usage, 'input_tokens', 0) or 0) * prices['input']
+        + (getattr(usage, 'output_tokens', 0) or 0) * prices['output']
+        + (getattr(usage, 'cache_read_input_tokens', 0) or 0) * prices['cache_read']
+        + (getattr(usage, 'cache_creation_input_tokens', 0) or 0) * prices['cache_write']
+    ) / 1e6
+
+
+def debrief_tokens(exchanges):
+    for limit, tokens in DEBRIEF_TOKENS:
+        if limit is None or exchanges <= limit:
+            return tokens
+
+
+class Router:
+    """Routing tables plus per-route truncation history, shared by all requests on an instance."""
+
+    def __init__(self, truncation_window=TRUNCATION_WINDOW, truncation_threshold=TRUNCATION_THRESHOLD):
+        self.truncation_threshold = truncation_threshold
+        self.truncation_window = truncation_window
+        self.recent = {}        # route name -> deque of truncated flags
+        self.lock = threading.Lock()
+
+    def truncation_rate(self, name):
+        with self.lock:
+            recent = self.recent.get(name)
+            return sum(recent) / len(recent) if recent else 0.0
+
+    def _adjusted(self, name, tokens, cap):
+        """Budget raised one step per threshold the recent truncation rate exceeds."""
+        if self.truncation_threshold > 0:
+            steps = int(self.truncation_rate(name) / self.truncation_threshold)
+            tokens += min(steps, 4) * TRUNCATION_STEP
+        return min(tokens, cap)
+
+    def route(self, action, difficulty=None, exchanges=0):
+        """{'name', 'action', 'model', 'max_tokens', 'retry_max_tokens'} for a call."""
+        if action == 'chat':
+            model = SONNET if (CHAT_SONNET_AFTER and difficulty == 'expert'
+                               and exchanges >= CHAT_SONNET_AFTER) else HAIKU
+            name = f"chat:{'sonnet' if model == SONNET else 'haiku'}:{difficulty}"
+            tokens = CHAT_TOKENS.get(difficulty, CHAT_TOKENS['medium'])
+            if exchanges >= CHAT_LONG_EXCHANGES:
+                tokens += CHAT_LONG_EXTRA
+            max_tokens = self._adjusted(name, tokens, CHAT_MAX_TOKENS)
+            retry_cap = CHAT_RETRY_MAX_TOKENS
+        elif action == 'debrief':
+            model = SONNET
+            tokens = debrief_tokens(exchanges)
+            name = f"debrief:sonnet:{tokens}"
+            max_tokens = self._adjusted(name, tokens, DEBRIEF_MAX_TOKENS)
+            retry_cap = DEBRIEF_RETRY_MAX_TOKENS
+        else:
+            model = HAIKU
+            name = f"{action}:haiku"
+            max_tokens = self._adjusted(name, HELP_TOKENS, HELP_RETRY_MAX_TOKENS)
+            retry_cap = HELP_RETRY_MAX_TOKENS
+
+        return {
+            'name': name,
+            'action': action,
+            'model': model,
+            'max_tokens': max_tokens,
+            'retry_max_tokens': min(max_tokens * 2, retry_cap),
+        }
+
+    def record(self, route, response, seconds, attempt=1):
+        """Note one call's outcome and log it; returns True if the reply was truncated."""
+        truncated = getattr(response, 'stop_reason', None) == 'max_tokens'
+        # Retries use a different budget; only first attempts say whether the route's is right
+        if attempt == 1:
+            with self.lock:
+                recent = self.recent.setdefault(route['name'], deque(maxlen=self.truncation_window))
+                recent.append(truncated)
+
+        usage = getattr(response, 'usage', None)
+        model = getattr(response, 'model', None) or route['model']
+        print(json.dumps({
+            'event': 'model_route',
+            'route': route['name'],
+            'model': model,
+            'max_tokens': route['max_tokens'] if attempt == 1 else route['retry_max_tokens'],
+            'attempt': attempt,
+            'stop_reason': getattr(response, 'stop_reason', None),
+            'latency_ms': round(seconds * 1000, 1),
+            'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+            'output_tokens': getattr(usage, 'output_tokens', 0) or 0,
+            'cost_usd': round(cost_usd(model, usage), 6),
+            'truncation_rate': round(self.truncation_rate(route['name']), 3),
+        }))
+        return truncated
+
+    def should_retry(self, route, truncated, attempt):
+        return truncated and attempt == 1 and route['retry_max_tokens'] > route['max_tokens']
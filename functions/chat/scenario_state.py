@@ -0,0 +1,317 @@
+"""
+Scenario State Engine
+Custody, Miranda, use of force, medical aid, escalation and time pressure
+derived by rule from the officer's input and the subject's replies
+
+The model only writes the narrative of a turn (dialogue, mood, actions,
+subject_condition). The bookkeeping fields the client shows are worked out
+here from the officer's [SAYS]/[DOES] text and the previous state, so they
+are consistent turn to turn and cost no output tokens. Nothing is stored:
+the state is replayed from the session history on every turn.
+
+Rules, in brief:
+- Custody starts with an arrest, handcuffs or placement in a patrol car and
+  ends with a release. A Terry stop ("you're being detained") is not custody.
+- Miranda is required from the moment of custody. It counts as read when the
+  officer says the warning ("right to remain silent", "anything you say can
+  be used against you") or [DOES] read / advise the rights, in a clause that
+  is neither negated ("I haven't read you Miranda") nor a question.
+- Interrogation is a question (or "tell me what/why...") the officer says
+  while the subject is in custody. Booking and officer-safety questions are
+  excluded by their shape ("what's your date of birth?", "do you have any
+  weapons on you?"), as are questions to backup or dispatch. A question that
+  only mentions a weapon or an injury ("where did you hide the weapon?") is
+  interrogation. Interrogation in custody without Miranda is a violation.
+- Force is the highest level in the officer's [DOES] text (emphatic verbal
+  commands count once the subject is hostile or non-compliant). It is justified when it does
+  not exceed the threat the subject last showed.
+- Escalation follows the subject's mood and threat and the force used.
+  A subject who stays agitated or hostile escalates one level per turn, up
+  to 4. Time pressure follows untreated injuries, escalation and long stalls.
+"""
+
+import json
+import re
+
+from json_stream import decode_json
+
+THREAT_LEVELS = ('none', 'passive', 'active', 'aggravated', 'deadly')
+FORCE_TYPES = ('none', 'verbal', 'hands', 'taser', 'firearm')
+
+# Most force each threat level justifies
+MAX_FORCE = {'none': 'verbal', 'passive': 'hands', 'active': 'taser', 'aggravated': 'taser', 'deadly': 'firearm'}
+
+MOOD_ESCALATION = {'calm': 1, 'defeated': 1, 'nervous': 1, 'agitated': 2, 'hostile': 3}
+THREAT_ESCALATION = {'active': 3, 'aggravated': 4, 'deadly': 5}
+FORCE_ESCALATION = {'taser': 4, 'firearm': 5}
+STALL_ESCALATION_CAP = 4
+
+UNSTABLE_CONDITIONS = {'critical', 'overdose', 'seizure'}
+CONDITIONS = UNSTABLE_CONDITIONS | {'normal', 'injured'}
+STALL_EXCHANGES = 8
+
+DELAY_CONSEQUENCES = {
+    'unstable': "Subject may die without immediate aid (Narcan, CPR, EMS)",
+    'injured': "Subject's injuries worsen without first aid or EMS",
+    'violent': "Someone is about to be seriously hurt",
+    'tense': "Subject is likely to turn violent or flee",
+    'stalled': "Scene is dragging on; subject may leave or evidence may be lost",
+}
+
+NEGATED = re.compile(r"\b(not|n't|never|no longer)\s+(\w+\s+)?$", re.I)
+
+PART = re.compile(r"\[(SAYS?|DOES|DO|RADIOS?)\]:?\s*")
+
+ARREST = re.compile(
+    r"\b(under arrest|placing you under|place[sd]? (him|her|them|the \w+) under|arrest(s|ed|ing)? (him|her|them|the \w+)"
+    r"|handcuff\w*|cuff(s|ed|ing)? (him|her|them|the \w+)|in (handcuffs|cuffs)"
+    r"|(place[sd]?|put|puts|seat[sd]?) (him|her|them|the \w+) in the (back of the )?(patrol|police|squad) (car|vehicle|unit))\b",
+    re.I)
+RELEASE = re.compile(r"\b(free to (go|leave)|you can go|releas(e|es|ed|ing) (him|her|them|the \w+|you)|(remove|take)s? (off )?the (hand)?cuffs|uncuff\w*)\b", re.I)
+MIRANDA_WARNING = re.compile(r"\b(right to remain silent|anything you say (can|will|may)( and will)? be used against you)\b", re.I)
+MIRANDA_READ = re.compile(r"\b(mirandiz\w*|(reads?|reading|recites?|reciting|advises?|advising)\b[^.?!]{0,30}\b(miranda|rights))\b", re.I)
+CLAUSE = re.compile(r"(?<=[.;!?,])\s+|\s+but\s+", re.I)
+CLAUSE_NEGATION = re.compile(r"n't\b|\b(not|never|no longer|forget|skip\w*|without|instead of)\b", re.I)
+
+QUESTION_STARTS = re.compile(r"\b(tell me (what|why|how|where|who|about)|explain (what|why|how))\b", re.I)
+FILLER = re.compile(r"^((okay|ok|alright|all right|so|and|now|sir|ma'am|hey)\b[,\s]*)+", re.I)
+# Booking and officer-safety questions, matched against the whole sentence
+NOT_INTERROGATION = re.compile(
+    r"((what('s| is)|can i (get|have)|give me|tell me|state) your (full |first |last )?(name|date of birth|dob|address|phone number)"
+    r"|where do you live|how do you spell (that|your (first |last )?name)"
+    r"|(do|did) you (have|got) (any )?(weapons?|guns?|knives|knife|needles?|anything (sharp|on you|that (can|could|will) (hurt|poke|stick|cut) me))"
+    r"|is there anything( sharp| dangerous)?( on you| in your pockets)?( that (can|could|will) (hurt|poke|stick|cut) me)?"
+    r"|are you (hurt|injured|ok(ay)?|alright|all right)|(is|are) (anyone|anybody) (else )?(hurt|injured)"
+    r"|do you need (medical( attention)?|an ambulance|a medic|a doctor)"
+    r"|do you understand( (these|your|each of these|the))?( rights)?( as i('ve| have) (read|explained) them( to you)?)?"
+    r"|will you (take|submit to|consent to) (a |the )?(breath|blood|breathalyzer) test"
+    r"|(do|did) you understand (implied consent|the admin per se( admonition)?))"
+    r"( (on|in) (you|your person|your pockets|the car|your vehicle))?( right now| today)?( sir| ma'am)?\s*[?.!]*", re.I)
+ADDRESSED_TO_OTHERS = re.compile(r"^\s*(martinez|officer martinez|backup|dispatch|sarge|sergeant)\b", re.I)
+
+FIREARM = re.compile(r"\b(shoots?|shooting|shot at|discharges?|pulls? the trigger|fires? (at|a round|rounds|\d+ rounds?|my (weapon|gun|firearm|pistol|rifle)))\b", re.I)
+INTERMEDIATE = re.compile(r"\b(tases?|tased|tasing|tazes?|tazed|tazing|drive[- ]stun\w*"
+                          r"|(deploys?|fires?|uses?|sprays?|discharges?) (the |my )?(taser|oc|o\.c\.|pepper spray|oc spray)"
+                          r"|baton strikes?|strikes? (him|her|them) with (the|my) baton)\b", re.I)
+HANDS = re.compile(r"\b(physical control|takedown|take (him|her|them) (down|to the ground)|takes? \w+ to the ground"
+                   r"|tackles?|grabs? (him|her|them|his|her|their)|restrains?|pins? (him|her|them)|wrist lock|arm bar"
+                   r"|control hold|pushes (him|her|them)|shoves?|punch(es)?|kicks? (him|her|them)|wrestles?)\b", re.I)
+COMMANDS = re.compile(r"\b(get (down|on the ground|back)|show me your hands|hands (up|behind)|put your hands|drop (it|the|your)"
+                      r"|don't move|stop resisting|stop right there|back up)\b", re.I)
+
+THREATS = (
+    ('deadly', re.compile(r"\b(stabs?|slashes|shoots?|fires (at|a|the)"
+                          r"|(points?|aims?|raises?|draws?|pulls? out|brandish\w*|swings?|lunges? with|charges? with|waves?"
+                          r"|holds?|holding|grabs?|reaches for)\b[^.]{0,40}\b(gun|pistol|handgun|firearm|rifle|shotgun|knife|blade|machete))\b", re.I)),
+    ('aggravated', re.compile(r"\b(punch\w*|swings? at|hits? (the officer|you|officer)|strikes?|kicks?|headbutt\w*|chok\w*|lunges?"
+                              r"|charges?|attacks?|tackles?|bites?|throws? \w+ at|reach\w* (for|toward) (his|her|their|the) waistband)\b", re.I)),
+    ('active', re.compile(r"\b(pulls? (his|her|their )?(arm )?away|jerks? away|runs?|flees?|fleeing|takes? off|bolts?|struggl\w*"
+                          r"|resists?|resisting|fights?|pushes|shoves?|braces?|tenses? up|twists? away|breaks? free)\b", re.I)),
+    ('passive', re.compile(r"\b(refuses?|refusing|won't (comply|move|get out|step out)|ignores?|goes? limp|dead weight"
+                           r"|sits? down|locks? (his|her|their) arms|doesn't comply|non-?compliant)\b", re.I)),
+)
+
+AID = re.compile(r"\b(narcan|naloxone|cpr|first aid|tourniquet|(apply|applies|applying) pressure|chest seal|recovery position"
+                 r"|(call|calls|request|requests|radio|radios|get|gets|start|starts)( \w+)? (fire|ems|medical|paramedics|an ambulance|medics?))\b", re.I)
+
+
+def officer_parts(message):
+    """{'says': ..., 'does': ..., 'radios': ...} from a tagged officer message; untagged text counts as speech."""
+    parts = {'says': '', 'does': '', 'radios': ''}
+    pieces = PART.split(message)
+    if pieces[0].strip():
+        parts['says'] = pieces[0].strip()
+    for tag, text in zip(pieces[1::2], pieces[2::2]):
+        key = {'SAY': 'says', 'SAYS': 'says', 'DO': 'does', 'DOES': 'does'}.get(tag.upper(), 'radios')
+        text = text.strip().strip('"')
+        parts[key] = f"{parts[key]} {text}".strip()
+    return parts
+
+
+def advises_miranda(parts):
+    """Whether the officer gives the Miranda warning this turn.
+
+    The warning itself counts when spoken; reading or advising the rights
+    counts as an action. A negated clause ("I haven't read you Miranda yet",
+    "forget Miranda") or a question ("want me to read you your rights?") does not.
+    """
+    for text, pattern in ((parts['says'], MIRANDA_WARNING), (parts['does'], MIRANDA_READ)):
+        for clause in CLAUSE.split(text):
+            if clause.rstrip().endswith('?') or CLAUSE_NEGATION.search(clause):
+                continue
+            if pattern.search(clause):
+                return True
+    return False
+
+
+def affirmed(pattern, text):
+    """Whether pattern matches text other than right after a negation ("you're not under arrest")."""
+    return any(not NEGATED.search(text[max(0, m.start() - 20):m.start()]) for m in pattern.finditer(text))
+
+
+def interrogates(says):
+    """Whether speech contains a question that counts as interrogation."""
+    for sentence in re.split(r"(?<=[.?!])\s+", says):
+        if not (sentence.rstrip().endswith('?') or QUESTION_STARTS.search(sentence)):
+            continue
+        if ADDRESSED_TO_OTHERS.search(sentence) or NOT_INTERROGATION.fullmatch(FILLER.sub('', sentence.strip())):
+            continue
+        return True
+    return False
+
+
+def threat_level(reply):
+    """Threat the subject shows in a reply's action and dialogue."""
+    text = f"{reply.get('subject_action') or ''} {reply.get('subject_response') or ''}"
+    for level, pattern in THREATS:
+        if pattern.search(text):
+            return level
+    return 'passive' if reply.get('subject_mood') == 'hostile' else 'none'
+
+
+def force_type(parts, non_compliant):
+    """Highest force in the officer's actions this turn."""
+    if FIREARM.search(parts['does']):
+        return 'firearm'
+    if INTERMEDIATE.search(parts['does']):
+        return 'taser'
+    if HANDS.search(parts['does']):
+        return 'hands'
+    if non_compliant and COMMANDS.search(parts['says']):
+        return 'verbal'
+    return 'none'
+
+
+class ScenarioState:
+    """Rule-derived scenario state, advanced one officer message / subject reply at a time."""
+
+    def __init__(self):
+        self.exchanges = 0
+        self.in_custody = False
+        self.miranda_read = False
+        self.miranda_required = False
+        self.interrogation_occurred = False
+        self.violation = None
+        self.threat = 'none'
+        self.mood = None
+        self.force = {'type': 'none', 'justified': True, 'threat_level': 'none', 'articulation_required': False}
+        self.force_history = []
+        self.condition = 'normal'
+        self.aid_rendered = False
+        self.aid_this_turn = False
+        self.escalation = 1
+        self.complete = False
+
+    def officer_turn(self, message):
+        """Apply one officer message (before the subject replies)."""
+        parts = officer_parts(message.removeprefix('OFFICER: '))
+        action = f"{parts['says']} {parts['does']}"
+        self.exchanges += 1
+
+        if affirmed(RELEASE, action):
+            self.in_custody = False
+        if affirmed(ARREST, action):
+            self.in_custody = True
+            # Any questioning from here on needs Miranda first
+            self.miranda_required = True
+        if advises_miranda(parts):
+            self.miranda_read = True
+
+        if self.in_custody and interrogates(parts['says']):
+            self.interrogation_occurred = True
+            if not self.miranda_read and not self.violation:
+                self.violation = "Custodial interrogation without Miranda - statements will be suppressed"
+
+        kind = force_type(parts, self.threat != 'none' or self.mood == 'hostile')
+        self.force = {
+            'type': kind,
+            'justified': FORCE_TYPES.index(kind) <= FORCE_TYPES.index(MAX_FORCE[self.threat]),
+            'threat_level': self.threat,
+            'articulation_required': kind in ('hands', 'taser', 'firearm'),
+        }
+        if kind != 'none':
+            self.force_history.append({'type': kind, 'justified': self.force['justified']})
+
+        self.aid_this_turn = bool(AID.search(f"{action} {parts['radios']}"))
+        if self.aid_this_turn and self.condition != 'normal':
+            self.aid_rendered = True
+
+    def subject_turn(self, reply):
+        """Apply one decoded subject reply."""
+        condition = reply.get('subject_condition') or (reply.get('medical_status') or {}).get('subject_condition')
+        if condition in CONDITIONS and condition != self.condition:
+            # A new or worse condition needs aid again, unless it was given this turn
+            self.aid_rendered = self.aid_this_turn and condition != 'normal'
+            self.condition = condition
+
+        previous = self.escalation
+        self.mood = reply.get('subject_mood') or self.mood
+        self.threat = threat_level(reply)
+
+        level = max(MOOD_ESCALATION.get(self.mood, 1),
+                    THREAT_ESCALATION.get(self.threat, 1),
+                    FORCE_ESCALATION.get(self.force['type'], 1))
+        if self.mood in ('agitated', 'hostile') and previous >= level:
+            level = max(level, min(previous + 1, STALL_ESCALATION_CAP))
+        self.escalation = level
+        self.complete = self.complete or bool(reply.get('scenario_complete'))
+
+    def time_pressure(self):
+        untreated = not self.aid_rendered
+        if (self.condition in UNSTABLE_CONDITIONS and untreated) or self.escalation >= 5:
+            reason = 'unstable' if self.condition in UNSTABLE_CONDITIONS and untreated else 'violent'
+            return {'urgency': 'critical', 'consequence_if_delay': DELAY_CONSEQUENCES[reason]}
+        if (self.condition == 'injured' and untreated) or self.escalation == 4:
+            reason = 'injured' if self.condition == 'injured' and untreated else 'violent'
+            return {'urgency': 'high', 'consequence_if_delay': DELAY_CONSEQUENCES[reason]}
+        if self.escalation == 3:
+            return {'urgency': 'medium', 'consequence_if_delay': DELAY_CONSEQUENCES['tense']}
+        if self.exchanges >= STALL_EXCHANGES and not self.in_custody and not self.complete:
+            return {'urgency': 'medium', 'consequence_if_delay': DELAY_CONSEQUENCES['stalled']}
+        return {'urgency': 'low', 'consequence_if_delay': None}
+
+    def fields(self):
+        """The bookkeeping fields of a chat result, in the shape the client reads."""
+        return {
+            'force_used': dict(self.force),
+            'medical_status': {'subject_condition': self.condition, 'aid_rendered': self.aid_rendered,
+                               'required': self.condition != 'normal'},
+            'custody_status': {'in_custody': self.in_custody, 'miranda_required': self.miranda_required,
+                               'miranda_read': self.miranda_read, 'interrogation_occurred': self.interrogation_occurred,
+                               'violation': self.violation},
+            'escalation_level': self.escalation,
+            'time_pressure': self.time_pressure(),
+        }
+
+    def summary(self):
+        """Compact facts for the model (empty fields dropped)."""
+        summary = {
+            'escalation_level': self.escalation,
+            'subject_condition': self.condition,
+            'aid_rendered': self.aid_rendered and self.condition != 'normal',
+            'in_custody': self.in_custody,
+            'miranda_required': self.miranda_required,
+            'miranda_read': self.miranda_read,
+            'interrogation_occurred': self.interrogation_occurred,
+            'custody_violation': self.violation,
+            'force_used': list(self.force_history),
+        }
+        return {k: v for k, v in summary.items() if v not in (None, [], False)}
+
+    def prompt_line(self):
+        """State line placed before the officer's message in the request."""
+        line = {**self.summary(), 'force_this_turn': self.force['type']}
+        if self.force['type'] != 'none':
+            line['force_justified'] = self.force['justified']
+        return f"SCENARIO STATE (tracked by the system): {json.dumps(line, separators=(',', ':'))}"
+
+
+def replay_state(history):
+    """ScenarioState after a session's Claude messages (OFFICER: lines and raw replies)."""
+    state = ScenarioState()
+    for msg in history:
+        if msg['role'] == 'user':
+            state.officer_turn(msg['content'])
+        else:
+            state.subject_turn(decode_json(msg['content']))
+    return state
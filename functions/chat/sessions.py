@@ -0,0 +1,133 @@
+"""
+Chat Session Store
+Server-side conversation state keyed by session id, so the browser only
+sends the new officer message each turn
+
+Backends:
+- In-memory (default): per-instance OrderedDict with TTL + LRU eviction
+- SQLite (CHAT_SESSION_DB=/path/to/sessions.db): survives restarts and is
+  shared by workers on the same host
+
+Sessions are a cache, not a record: an instance that doesn't have the id
+answers 409 session_expired and the client resends its full transcript.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 30 * 60          # seconds since last use
+DEFAULT_MAX_SESSIONS = 500
+
+
+def new_session_id():
+    return secrets.token_urlsafe(16)
+
+
+class MemorySessionStore:
+    """Sessions in an OrderedDict, least recently used first."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_sessions=DEFAULT_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()    # id -> (last_used, session)
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        """The session, or None if unknown or idle past the TTL."""
+        now = time.time()
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+            if now - entry[0] > self.ttl:
+                del self.sessions[session_id]
+                return None
+            self.sessions[session_id] = (now, entry[1])
+            self.sessions.move_to_end(session_id)
+            return entry[1]
+
+    def put(self, session_id, session):
+        now = time.time()
+        with self.lock:
+            self.sessions[session_id] = (now, session)
+            self.sessions.move_to_end(session_id)
+
+            # Expired entries sit at the front, followed by the least recently used
+            while self.sessions:
+                oldest_id, (last_used, _) = next(iter(self.sessions.items()))
+                if len(self.sessions) <= self.max_sessions and now - last_used <= self.ttl:
+                    break
+                del self.sessions[oldest_id]
+
+    def delete(self, session_id):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+class SqliteSessionStore:
+    """Sessions as JSON rows in a local SQLite file, same TTL/LRU rules."""
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_sessions=DEFAULT_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY, data TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+
+    def get(self, session_id):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM sessions WHERE id = ? AND last_used >= ?",
+                (session_id, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE sessions SET last_used = ? WHERE id = ?", (now, session_id))
+        return json.loads(row[0])
+
+    def put(self, session_id, session):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, last_used) VALUES (?, ?, ?)",
+                (session_id, json.dumps(session), now)
+            )
+            self.conn.execute("DELETE FROM sessions WHERE last_used < ?", (now - self.ttl,))
+            self.conn.execute(
+                "DELETE FROM sessions WHERE id NOT IN "
+                "(SELECT id FROM sessions ORDER BY last_used DESC LIMIT ?)",
+                (self.max_sessions,)
+            )
+
+    def delete(self, session_id):
+        with self.lock:
+            self.conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def open_session_store():
+    """Store configured by CHAT_SESSION_DB / CHAT_SESSION_TTL / CHAT_SESSION_MAX."""
+    ttl = int(os.environ.get('CHAT_SESSION_TTL', DEFAULT_TTL))
+    max_sessions = int(os.environ.get('CHAT_SESSION_MAX', DEFAULT_MAX_SESSIONS))
+
+    path = os.environ.get('CHAT_SESSION_DB')
+    if path:
+        return SqliteSessionStore(path, ttl, max_sessions)
+    return MemorySessionStore(ttl, max_sessions)
@@ -0,0 +1,88 @@
+"""
+Statute Search
+Read-only BM25 lookups in the statute index built by the pipeline
+(src/statute_index.py)
+
+The index is opened once at cold start, immutable and memory-mapped, so a
+search is one FTS5 MATCH over pages already in the page cache. Sections cited
+in the query (e.g. "13-3883") are returned first, then the best BM25 matches
+on the remaining words, dropping any that score under half the best match.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+
+from help_cache import STOPWORDS
+
+DEFAULT_INDEX = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'statute_index.db')
+DEFAULT_K = 3
+MMAP_BYTES = 64 * 1024 * 1024
+MAX_QUERY_TERMS = 16
+MIN_RELATIVE_SCORE = 0.5      # drop matches scoring under half the best one
+
+# Words in nearly every scenario or statute; they match everything and rank nothing
+QUERY_STOPWORDS = STOPWORDS | {
+    'with',
+    'officer', 'officers', 'police', 'subject', 'person', 'adult', 'male', 'female', 'man', 'woman',
+    'years', 'old', 'arizona', 'ars', 'statute', 'law', 'legal',
+}
+
+# section, title, summary, elements, definitions, authority, mandatory, related, snippet
+BM25_WEIGHTS = (2.0, 4.0, 2.0, 1.5, 1.0, 1.5, 1.5, 0.5, 0.0)
+
+CITATION = re.compile(r"\b(\d{1,2}-\d{3,4}(?:\.\d{1,2})?)\b")
+
+
+class StatuteIndex:
+    """Shared read-only connection to the statute index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+        self.conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+        self.conn.execute("PRAGMA query_only = 1")
+        self.lock = threading.Lock()
+        self.meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+
+    def __len__(self):
+        return int(self.meta.get('statutes', 0))
+
+    def search(self, text, k=DEFAULT_K):
+        """Up to k statute snippets relevant to the text, most relevant first."""
+        cited = CITATION.findall(text)
+        words = []
+        for word in re.findall(r"[a-z]{3,}", text.lower()):
+            if word not in QUERY_STOPWORDS and word not in words:
+                words.append(word)
+        words = words[:MAX_QUERY_TERMS]
+
+        snippets = []
+        with self.lock:
+            for section in cited:
+                row = self.conn.execute("SELECT snippet FROM statutes WHERE section = ?", (section,)).fetchone()
+                if row and row[0] not in snippets:
+                    snippets.append(row[0])
+
+            if words and len(snippets) < k:
+                rows = self.conn.execute(
+                    f"SELECT snippet, bm25(statutes, {', '.join(map(str, BM25_WEIGHTS))}) AS score "
+                    f"FROM statutes WHERE statutes MATCH ? ORDER BY score LIMIT ?",
+                    (' OR '.join(f'"{w}"' for w in words), k + len(snippets))
+                ).fetchall()
+                # bm25() is negative; more negative is more relevant
+                if rows:
+                    cutoff = rows[0][1] * MIN_RELATIVE_SCORE
+                    snippets.extend(snippet for snippet, score in rows
+                                    if score <= cutoff and snippet not in snippets)
+
+        return snippets[:k]
+
+
+def open_statute_index(path=None):
+    """Index at STATUTE_INDEX (default: statute_index.db beside this file), or None if not built."""
+    path = path or os.environ.get('STATUTE_INDEX', DEFAULT_INDEX)
+    if not os.path.exists(path):
+        return None
+    return StatuteIndex(path)
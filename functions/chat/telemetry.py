@@ -0,0 +1,168 @@
+"""
+Request Telemetry
+Per-request phase timings and token accounting for the chat function
+
+Each request gets a RequestTrace. Phases are timed with span(name) - nested
+spans form a tree under the request - and the finished trace is logged as one
+JSON line (event "chat_request") with:
+- action, scenario, difficulty, status, stream
+- total_ms and per-phase ms (decode_request, load_session, build_prompt,
+  assemble_messages, model_call, repair_json, shape_result, save_session)
+- ttft_ms for streamed model calls
+- model and input / output / cache read / cache write tokens from response.usage
+
+Set CHAT_TRACE_SPANS=1 to include the span tree in the log line. If
+opentelemetry-api is installed the tree is also exported as OpenTelemetry
+spans (a no-op until a tracer provider is configured).
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    from opentelemetry import trace as otel_trace
+    TRACER = otel_trace.get_tracer('blueshield.chat')
+except ImportError:
+    otel_trace = None
+    TRACER = None
+
+LOG_SPANS = os.environ.get('CHAT_TRACE_SPANS', '') == '1'
+
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens')
+
+_current = ContextVar('chat_request_trace', default=None)
+
+
+class RequestTrace:
+    """Timings, attributes and token usage for one request."""
+
+    def __init__(self, action=None):
+        self.wall_start = time.time_ns()
+        self.start = time.perf_counter_ns()
+        self.fields = {'action': action, 'scenario': None, 'difficulty': None}
+        self.spans = []          # [name, parent index, start ns, end ns], in start order
+        self.open = []           # indexes of spans not yet ended
+        self.usage = dict.fromkeys(USAGE_FIELDS, 0)
+        self.model = None
+        self.model_calls = 0
+        self.ttft = None
+        self.streaming = False   # the stream generator finishes the trace, not the entry point
+
+    @contextmanager
+    def span(self, name):
+        index = len(self.spans)
+        self.spans.append([name, self.open[-1] if self.open else None, time.perf_counter_ns(), None])
+        self.open.append(index)
+        try:
+            yield
+        finally:
+            self.spans[index][3] = time.perf_counter_ns()
+            self.open.remove(index)
+
+    def annotate(self, **fields):
+        self.fields.update(fields)
+
+    def first_token(self):
+        """Mark the first streamed text from the model (once)."""
+        if self.ttft is None:
+            self.ttft = time.perf_counter_ns() - self.start
+
+    def record_usage(self, response):
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+        self.model = getattr(response, 'model', None)
+        self.model_calls += 1
+        for field in USAGE_FIELDS:
+            self.usage[field] += getattr(usage, field, 0) or 0
+
+    def phases(self):
+        """Milliseconds per phase name, summed over repeats."""
+        phases = {}
+        for name, _, start, end in self.spans:
+            if end is not None:
+                phases[name] = phases.get(name, 0.0) + (end - start) / 1e6
+        return {name: round(ms, 3) for name, ms in phases.items()}
+
+    def finish(self, status, error=None):
+        end = time.perf_counter_ns()
+        record = {
+            'event': 'chat_request',
+            **self.fields,
+            'status': status,
+            'stream': self.streaming,
+            'total_ms': round((end - self.start) / 1e6, 3),
+            'phases': self.phases(),
+            'ttft_ms': round(self.ttft / 1e6, 3) if self.ttft is not None else None,
+            'model': self.model,
+            'model_calls': self.model_calls,
+            **self.usage,
+        }
+        if error is not None:
+            record['error'] = f"{type(error).__name__}: {error}"
+        if LOG_SPANS:
+            record['spans'] = [
+                {'name': name, 'parent': parent,
+                 'start_ms': round((start - self.start) / 1e6, 3),
+                 'duration_ms': round(((end if span_end is None else span_end) - start) / 1e6, 3)}
+                for name, parent, start, span_end in self.spans
+            ]
+        print(json.dumps(record))
+
+        if TRACER is not None:
+            self._export(end, status, error)
+
+    def _export(self, end, status, error):
+        """Replay the finished tree as OpenTelemetry spans with the recorded times."""
+        def wall(ns):
+            return self.wall_start + (ns - self.start)
+
+        attributes = {f"chat.{k}": v for k, v in self.fields.items() if v is not None}
+        attributes.update({f"chat.usage.{k}": v for k, v in self.usage.items()})
+        attributes['http.status_code'] = status
+        if self.ttft is not None:
+            attributes['chat.ttft_ms'] = self.ttft / 1e6
+
+        root = TRACER.start_span('chat_request', start_time=wall(self.start), attributes=attributes)
+        if error is not None:
+            root.record_exception(error)
+
+        otel_spans = []
+        for name, parent, start, span_end in self.spans:
+            parent_span = root if parent is None else otel_spans[parent]
+            span = TRACER.start_span(name, context=otel_trace.set_span_in_context(parent_span),
+                                     start_time=wall(start))
+            otel_spans.append(span)
+            span.end(end_time=wall(end if span_end is None else span_end))
+        root.end(end_time=wall(end))
+
+
+def start_trace(action=None):
+    """New trace for the request being handled in this context."""
+    trace = RequestTrace(action)
+    _current.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Time a phase of the current request (no-op outside a request)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+def annotate(**fields):
+    trace = _current.get()
+    if trace is not None:
+        trace.annotate(**fields)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: statute page extraction
+
+Compares the original full-tree html.parser extraction (raw_html inline)
+with the current extract_section path on saved section pages. Runs offline
+on the abridged pages in fixtures/pages (two with a multi-class
+"first statuteText" container) unless given other pages.
+
+    python bench_extract.py                  # fixtures/pages
+    python bench_extract.py --fetch          # save priority pages to ../data/pages and use them
+    python bench_extract.py --pages DIR --repeat 20
+"""
+
+import argparse
+import json
+import sys
+import os
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bs4 import BeautifulSoup
+
+from fetcher import Fetcher
+from scraper import (extract_section, store_raw_html, section_url, PRIORITY_SECTIONS,
+                     HTML_PARSER, RAW_HTML_MODES)
+
+
+DEFAULT_PAGES = os.path.join(os.path.dirname(__file__), 'fixtures', 'pages')
+FETCHED_PAGES = os.path.join(os.path.dirname(__file__), '..', 'data', 'pages')
+
+
+def legacy_extract(html: str) -> dict:
+    """scrape_section's extraction before the fast path."""
+    soup = BeautifulSoup(html, 'html.parser')
+    content_div = soup.find('div', class_='statuteText') or soup.find('body')
+    return {
+        "raw_text": content_div.get_text(separator='\n', strip=True),
+        "raw_html": str(content_div),
+        "scraped_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def fetch_pages(pages_dir: Path):
+    pages_dir.mkdir(parents=True, exist_ok=True)
+
+    def save(section):
+        response = fetcher.get(section_url(section))
+        response.raise_for_status()
+        (pages_dir / f"{section}.htm").write_bytes(response.content)
+
+    with Fetcher() as fetcher:
+        fetcher.map(save, PRIORITY_SECTIONS, desc="fetching fixtures")
+
+
+def time_path(extract, pages: list, repeat: int) -> float:
+    """Mean milliseconds per page."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            extract(html)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(pages))
+
+
+def output_size(records: list) -> int:
+    return sum(len(json.dumps(r)) for r in records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark statute HTML extraction")
+    parser.add_argument("--pages", help="Directory of saved section pages (*.htm; default: fixtures/pages, "
+                                        "or ../data/pages with --fetch)")
+    parser.add_argument("--fetch", action="store_true", help="Download the priority sections into --pages first")
+    parser.add_argument("--repeat", type=int, default=10, help="Passes over the page set")
+    args = parser.parse_args()
+
+    pages_dir = Path(args.pages or (FETCHED_PAGES if args.fetch else DEFAULT_PAGES))
+    if args.fetch:
+        fetch_pages(pages_dir)
+
+    pages = [p.read_text(errors='replace') for p in sorted(pages_dir.glob("*.htm"))]
+    if not pages:
+        print(f"No *.htm pages in {pages_dir} (use --fetch to download fixtures)")
+        return 1
+
+    legacy = [legacy_extract(html) for html in pages]
+    current = [extract_section(html) for html in pages]
+    mismatched = sum(a["raw_text"] != b["raw_text"] for a, b in zip(legacy, current))
+
+    legacy_ms = time_path(legacy_extract, pages, args.repeat)
+    current_ms = time_path(extract_section, pages, args.repeat)
+
+    print(f"{len(pages)} pages, {args.repeat} passes, fast path parser: {HTML_PARSER}")
+    print(f"  legacy (html.parser, full tree): {legacy_ms:7.2f} ms/page")
+    print(f"  current (strainer, {HTML_PARSER}): {current_ms:7.2f} ms/page  ({legacy_ms / current_ms:.1f}x)")
+    print(f"  raw_text mismatches: {mismatched}")
+
+    print("\nOutput size (JSON bytes):")
+    print(f"  legacy raw_html:  {output_size(legacy):>10,}")
+    for mode in RAW_HTML_MODES:
+        size = output_size([store_raw_html(r, mode) for r in current])
+        print(f"  raw_html={mode:<6}  {size:>10,}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
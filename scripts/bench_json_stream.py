@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: chat/debrief reply parsing
+
+Runs the malformed-response corpus through the original json.loads + regex
+fallbacks and through the incremental decoder, reporting which fields each
+recovers and the parse time. Also times streamed decoding against
+rescanning the accumulated text on every chunk.
+
+    python bench_json_stream.py
+    python bench_json_stream.py --corpus fixtures/malformed_responses.json --repeat 2000
+"""
+
+import argparse
+import json
+import re
+import sys
+import os
+import time
+
+# Add the chat function to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions', 'chat'))
+
+from json_stream import JsonStreamDecoder, decode_json
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'fixtures', 'malformed_responses.json')
+
+
+def legacy_chat(text: str) -> dict:
+    """handle_chat's parsing before the incremental decoder."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            json_match = re.search(r'\{[\s\S]*\}', text)
+            if json_match:
+                return json.loads(json_match.group(0))
+            raise ValueError("No JSON found")
+        except (ValueError, json.JSONDecodeError):
+            return {}
+
+
+def legacy_debrief(text: str) -> dict:
+    """handle_debrief's parsing before the incremental decoder."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', text)
+    if json_match:
+        try:
+            return json.loads(json_match.group(1))
+        except json.JSONDecodeError:
+            pass
+
+    json_match = re.search(r'\{[\s\S]*\}', text)
+    if json_match:
+        try:
+            return json.loads(json_match.group(0))
+        except json.JSONDecodeError:
+            pass
+    return {}
+
+
+def rescan_partial(text: str, key: str):
+    """The first streaming path: re-find and re-decode the field on every chunk."""
+    match = re.search(r'"' + re.escape(key) + r'"\s*:\s*"', text)
+    if not match:
+        return None
+    end = match.end()
+    while end < len(text) and not (text[end] == '"' and text[end - 1] != '\\'):
+        end += 1
+    try:
+        return json.loads('"' + text[match.end():end].rstrip('\\') + '"')
+    except json.JSONDecodeError:
+        return None
+
+
+def time_call(fn, arg, repeat: int) -> float:
+    """Mean microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+
+def stream_decoder(text: str, chunk_size: int):
+    decoder = JsonStreamDecoder()
+    for i in range(0, len(text), chunk_size):
+        decoder.feed(text[i:i + chunk_size])
+        decoder.take_partial()
+    return decoder.close()
+
+
+def stream_rescan(text: str, chunk_size: int):
+    for i in range(chunk_size, len(text) + chunk_size, chunk_size):
+        rescan_partial(text[:i], 'subject_response')
+    return legacy_chat(text)
+
+
+def run_corpus(cases: list, repeat: int):
+    print(f"{'case':<38} {'legacy':>7} {'decoder':>8}   {'legacy us':>9} {'decoder us':>10}")
+    recovered = {"legacy": 0, "decoder": 0}
+
+    for case in cases:
+        legacy = legacy_chat if case["action"] == "chat" else legacy_debrief
+        old = legacy(case["text"])
+        new = decode_json(case["text"])
+
+        old_ok = all(k in old for k in case["expect"])
+        new_ok = all(k in new for k in case["expect"])
+        recovered["legacy"] += old_ok
+        recovered["decoder"] += new_ok
+
+        old_us = time_call(legacy, case["text"], repeat)
+        new_us = time_call(decode_json, case["text"], repeat)
+        print(f"{case['name']:<38} {'ok' if old_ok else 'LOST':>7} {'ok' if new_ok else 'LOST':>8}   "
+              f"{old_us:9.1f} {new_us:10.1f}")
+
+    print(f"\nExpected fields recovered: legacy {recovered['legacy']}/{len(cases)}, "
+          f"decoder {recovered['decoder']}/{len(cases)}")
+
+
+def run_streaming(sizes: list, chunk_size: int):
+    print(f"\nStreaming a reply in {chunk_size}-char chunks (ms per reply):")
+    print(f"{'reply chars':>12} {'rescan':>9} {'decoder':>9}")
+    for size in sizes:
+        spoken = ("Officer, I told you already, I was just driving home. " * (size // 54 + 1))[:size]
+        text = json.dumps({"subject_response": spoken, "subject_mood": "nervous",
+                           "evaluation": {"notes": spoken[:200]}, "scenario_complete": False})
+
+        start = time.perf_counter()
+        stream_rescan(text, chunk_size)
+        rescan_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        stream_decoder(text, chunk_size)
+        decoder_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{len(text):>12,} {rescan_ms:9.2f} {decoder_ms:9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat/debrief reply parsing")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Malformed response corpus (JSON)")
+    parser.add_argument("--repeat", type=int, default=500, help="Calls per case when timing")
+    parser.add_argument("--chunk-size", type=int, default=8, help="Characters per streamed chunk")
+    args = parser.parse_args()
+
+    with open(args.corpus, 'r') as f:
+        cases = json.load(f)
+
+    run_corpus(cases, args.repeat)
+    run_streaming([500, 2000, 8000, 32000], args.chunk_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
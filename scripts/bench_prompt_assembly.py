@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: chat system prompt assembly
+
+Per-request cost of building the chat system prompt three ways:
+  full f-string   - the whole instructions + scenario text formatted per call (original)
+  per-call block  - cached instructions, scenario block formatted per call
+  memoized        - precomputed (scenario, difficulty) block + small client suffix (current)
+
+    python bench_prompt_assembly.py --repeat 100000
+"""
+
+import argparse
+import itertools
+import sys
+import os
+import time
+
+# Add the chat function to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions', 'chat'))
+
+from main import (get_scenario_prompt, CHAT_INSTRUCTIONS, SCENARIO_PROMPTS,
+                  DIFFICULTY_BEHAVIORS, VALID_DIFFICULTIES)
+
+SCENARIO_CONFIG = {'title': 'Code 390D: Drunk Driver', 'location': 'State Route 87, 11:42 PM'}
+DIFFICULTY_MODIFIER = 'Subject is moderately cooperative but evasive about drinking.'
+
+
+def scenario_text(scenario_type, difficulty, scenario_config, difficulty_modifier):
+    scenario_info = SCENARIO_PROMPTS[scenario_type]
+    return f"""CURRENT SCENARIO:
+- Type: {scenario_config.get('title', 'Unknown')}
+- Location: {scenario_config.get('location', 'Unknown')}
+- Situation: {scenario_info['situation']}
+- Subject: {scenario_info['subject']}
+
+DIFFICULTY LEVEL: {difficulty.upper()}
+{difficulty_modifier}
+
+YOUR ROLE - Play the SUBJECT:
+- Base behavior: {scenario_info['behavior']}
+- Adjusted for difficulty: {DIFFICULTY_BEHAVIORS[difficulty]}
+- Respond realistically with short, natural dialogue
+- React to officer actions appropriately
+- Never break character or acknowledge you're an AI"""
+
+
+def full_fstring(scenario_type, difficulty, scenario_config, difficulty_modifier):
+    """One system string with everything formatted in, as before prompt caching."""
+    return f"{CHAT_INSTRUCTIONS}\n\n{scenario_text(scenario_type, difficulty, scenario_config, difficulty_modifier)}"
+
+
+def per_call_block(scenario_type, difficulty, scenario_config, difficulty_modifier):
+    """Cached instructions block, scenario block re-formatted every request."""
+    return [
+        {'type': 'text', 'text': CHAT_INSTRUCTIONS, 'cache_control': {'type': 'ephemeral'}},
+        {'type': 'text', 'text': scenario_text(scenario_type, difficulty, scenario_config, difficulty_modifier)},
+    ]
+
+
+def time_builder(build, keys: list, repeat: int) -> float:
+    """Mean microseconds per prompt."""
+    cycle = itertools.islice(itertools.cycle(keys), repeat)
+    start = time.perf_counter()
+    for scenario_type, difficulty in cycle:
+        build(scenario_type, difficulty, SCENARIO_CONFIG, DIFFICULTY_MODIFIER)
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat system prompt assembly")
+    parser.add_argument("--repeat", type=int, default=50000, help="Prompts built per variant")
+    args = parser.parse_args()
+
+    keys = list(itertools.product(SCENARIO_PROMPTS, sorted(VALID_DIFFICULTIES)))
+    print(f"{len(keys)} (scenario, difficulty) keys, {args.repeat:,} prompts per variant")
+
+    baseline = None
+    for name, build in [("full f-string", full_fstring),
+                        ("per-call block", per_call_block),
+                        ("memoized", get_scenario_prompt)]:
+        us = time_builder(build, keys, args.repeat)
+        baseline = baseline or us
+        print(f"  {name:<15} {us:8.3f} us/prompt  ({baseline / us:5.1f}x)")
+
+    # The cacheable prefix must not depend on client fields
+    a = get_scenario_prompt('dui', 'hard', SCENARIO_CONFIG, DIFFICULTY_MODIFIER)
+    b = get_scenario_prompt('dui', 'hard', {'title': 'Other', 'location': 'Elsewhere'}, '')
+    identical = a[:2] == b[:2]
+    prefix = sum(len(block['text']) for block in a[:2])
+    print(f"\nCacheable prefix: {prefix:,} chars, identical across client fields: {identical}")
+    print(f"Client suffix:    {len(a[2]['text']):,} chars")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
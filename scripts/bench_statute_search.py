@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: statute retrieval
+Builds the statute index from parsed statutes, shows what sample help
+questions retrieve, and times the per-question lookup the help handler makes.
+
+    python bench_statute_search.py                                  # sample fixture
+    python bench_statute_search.py --parsed ../data/parsed_statutes.json
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add src and the chat function to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions', 'chat'))
+
+from statute_index import build_statute_index
+from statute_search import StatuteIndex
+
+DEFAULT_PARSED = os.path.join(os.path.dirname(__file__), 'fixtures', 'parsed_statutes_sample.json')
+
+QUESTIONS = [
+    "Do I have probable cause to arrest yet?",
+    "She has a bruise on her arm - is this a mandatory arrest?",
+    "Can I use deadly force if he pulls a knife?",
+    "He won't leave the store after the manager asked him to, can I arrest him?",
+    "What does 13-3883 let me do here?",
+    "He's pulling his arm away while I cuff him, is that resisting?",
+]
+
+
+def time_queries(index: StatuteIndex, queries: list, k: int, repeat: int) -> float:
+    """Mean microseconds per search."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            index.search(query, k)
+    return (time.perf_counter() - start) * 1e6 / (repeat * len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark statute index lookups")
+    parser.add_argument("--parsed", default=DEFAULT_PARSED, help="Parsed statutes (JSON)")
+    parser.add_argument("--repeat", type=int, default=500, help="Passes over the query set")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_file = os.path.join(tmp, 'statute_index.db')
+        start = time.perf_counter()
+        build_statute_index(args.parsed, index_file)
+        print(f"  built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        index = StatuteIndex(index_file)
+        print(f"  opened in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        print("\nHelp questions (k=3):")
+        for question in QUESTIONS:
+            sections = [snippet.split(' - ', 1)[0] for snippet in index.search(question, 3)]
+            print(f"  {question[:60]:<60} {', '.join(sections) or '-'}")
+
+        us = time_queries(index, QUESTIONS, 3, args.repeat)
+        print(f"\n{us:.1f} us/search over {args.repeat * len(QUESTIONS):,} searches")
+        return 0 if us < 1000 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
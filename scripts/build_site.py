@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Build: static site bundles
+
+Copies docs/ to dist/, moving the inline <style> and <script> blocks of
+app.html and demo.html into content-hashed files under dist/assets/. Both
+pages carry the same style and script source (demo mode is switched by
+<body data-mode="demo">), so they share one CSS and one JS bundle that the
+browser caches across pages and visits. Bundles are minified conservatively
+(comments and whitespace only, line breaks kept in JS) and written with
+precompressed .gz siblings, plus .br when the brotli package is installed.
+
+    python build_site.py                 # docs/ -> dist/, with size and parse-time report
+    python build_site.py --no-minify
+    python build_site.py --output /tmp/site --repeat 50
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from html.parser import HTMLParser
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_DOCS = os.path.join(ROOT, 'docs')
+DEFAULT_OUTPUT = os.path.join(ROOT, 'dist')
+PAGES = ('app.html', 'demo.html')
+ASSET_DIR = 'assets'
+HASH_CHARS = 10
+# Written into every build; an existing output is only replaced when it has one
+BUILD_MARKER = '.build_site'
+PRECOMPRESS = ('.html', '.css', '.js', '.svg')
+
+# Plain inline blocks only; <script src=...> and typed scripts are left alone
+INLINE_BLOCK = re.compile(r"(?P<indent>[ \t]*)<(?P<tag>style|script)>(?P<body>.*?)</(?P=tag)>", re.S)
+
+# A "/" after one of these starts a regex literal rather than a division
+REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+REGEX_KEYWORDS = {"return", "typeof", "case", "in", "of", "delete", "void", "throw", "new", "else", "do"}
+
+
+def _collapse_css(code: str) -> str:
+    """Whitespace and punctuation collapsing for CSS outside strings and comments."""
+    code = re.sub(r"\s+", " ", code)
+    # Spaces around these never matter; ":" only loses the space after it,
+    # since "a :hover" and "a:hover" are different selectors
+    code = re.sub(r"\s*([{};,])\s*", r"\1", code)
+    code = re.sub(r":\s+", ":", code)
+    return code.replace(";}", "}")
+
+
+def minify_css(css: str) -> str:
+    """Drop comments and collapse whitespace; strings are copied untouched."""
+    out = []
+    code = []   # CSS since the last string, collapsed when a string or the end is reached
+    i, n = 0, len(css)
+    while i < n:
+        c = css[i]
+        if c in "\"'":
+            j = i + 1
+            while j < n and css[j] != c:
+                j += 2 if css[j] == "\\" else 1
+            out.append(_collapse_css("".join(code)))
+            out.append(css[i:j + 1])
+            code = []
+            i = j + 1
+        elif css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            code.append(" ")
+        else:
+            code.append(c)
+            i += 1
+    out.append(_collapse_css("".join(code)))
+
+    return "".join(out).strip()
+
+
+def _skip_quoted(js: str, i: int) -> int:
+    """Index just past the string or template literal starting at i."""
+    quote, n = js[i], len(js)
+    i += 1
+    while i < n and js[i] != quote:
+        i += 2 if js[i] == "\\" else 1
+    return i + 1
+
+
+def _skip_regex(js: str, i: int) -> int:
+    """Index just past the regex literal (and its flags) starting at i."""
+    n = len(js)
+    i += 1
+    in_class = False
+    while i < n:
+        c = js[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            break
+        i += 1
+    i += 1
+    while i < n and (js[i].isalnum() or js[i] == "_"):
+        i += 1
+    return i
+
+
+def _regex_allowed(out: list) -> bool:
+    text = "".join(out[-12:]).rstrip()
+    if not text:
+        return True
+    if text[-1] in REGEX_PRECEDERS:
+        return True
+    word = re.search(r"[A-Za-z_$][\w$]*$", text)
+    return bool(word) and word.group() in REGEX_KEYWORDS
+
+
+def minify_js(js: str) -> str:
+    """Drop comments, indentation and blank lines; every line break is kept
+    so automatic semicolon insertion behaves exactly as before. String,
+    template and regex literals are copied untouched (templates are treated
+    as opaque, so a template nested inside ${...} is not supported).
+    """
+    out = []
+    i, n = 0, len(js)
+    while i < n:
+        c = js[i]
+        if c in "\"'`":
+            j = _skip_quoted(js, i)
+            out.append(js[i:j])
+            i = j
+        elif js.startswith("//", i):
+            end = js.find("\n", i)
+            i = n if end < 0 else end
+        elif js.startswith("/*", i):
+            end = js.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            out.append("\n" if "\n" in js[i:end] else " ")
+            i = end
+        elif c == "/" and _regex_allowed(out):
+            j = _skip_regex(js, i)
+            out.append(js[i:j])
+            i = j
+        elif c.isspace():
+            j = i
+            while j < n and js[j].isspace():
+                j += 1
+            out.append("\n" if "\n" in js[i:j] else " ")
+            i = j
+        else:
+            out.append(c)
+            i += 1
+
+    lines = (line.strip() for line in "".join(out).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def check_js(path: str):
+    """Syntax-check a bundle with node when it is installed."""
+    if not shutil.which("node"):
+        return
+    result = subprocess.run(["node", "--check", path], capture_output=True, text=True)
+    if result.returncode:
+        raise SystemExit(f"{path} failed node --check:\n{result.stderr}")
+
+
+def precompress(path: str):
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, 9, mtime=0))
+    if brotli:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def transfer_size(data: bytes) -> int:
+    """Bytes on the wire with the best encoding this build produces."""
+    return len(brotli.compress(data, quality=11)) if brotli else len(gzip.compress(data, 9, mtime=0))
+
+
+def extract_bundles(pages: dict, minify: bool) -> tuple:
+    """Rewritten page HTML and the bundles it references ({filename: text})."""
+    uses = {}
+    for name, html in pages.items():
+        for m in INLINE_BLOCK.finditer(html):
+            ext = 'css' if m.group('tag') == 'style' else 'js'
+            body = m.group('body')
+            if minify:
+                body = minify_css(body) if ext == 'css' else minify_js(body)
+            uses.setdefault((ext, body), []).append(name)
+
+    filenames = {}
+    for (ext, body), used_by in uses.items():
+        digest = hashlib.sha256(body.encode()).hexdigest()[:HASH_CHARS]
+        stem = 'shared' if len(set(used_by)) > 1 else os.path.splitext(used_by[0])[0]
+        filenames[(ext, body)] = f"{stem}.{digest}.{ext}"
+
+    def replace(m):
+        ext = 'css' if m.group('tag') == 'style' else 'js'
+        body = m.group('body')
+        if minify:
+            body = minify_css(body) if ext == 'css' else minify_js(body)
+        href = f"{ASSET_DIR}/{filenames[(ext, body)]}"
+        if ext == 'css':
+            return f'{m.group("indent")}<link rel="stylesheet" href="{href}">'
+        return f'{m.group("indent")}<script src="{href}"></script>'
+
+    rewritten = {name: INLINE_BLOCK.sub(replace, html) for name, html in pages.items()}
+    bundles = {filenames[key]: key[1] for key in uses}
+    return rewritten, bundles
+
+
+def clear_output(docs: str, output: str):
+    """Remove a previous build at output, refusing anything that isn't one."""
+    out = os.path.realpath(output)
+    source = os.path.realpath(docs)
+    within = lambda path, parent: path == parent or path.startswith(parent.rstrip(os.sep) + os.sep)
+    # Not the source, the repo, or any directory holding them; not inside the source either
+    if within(source, out) or within(os.path.realpath(ROOT), out) or within(out, source):
+        raise SystemExit(f"Refusing to build into {output}: it overlaps {docs} or the repository root")
+    if not os.path.exists(output):
+        return
+    if not os.path.isdir(output):
+        raise SystemExit(f"Refusing to replace {output}: not a directory")
+    if os.listdir(output) and not os.path.exists(os.path.join(output, BUILD_MARKER)):
+        raise SystemExit(f"Refusing to replace {output}: not a previous build (no {BUILD_MARKER})")
+    shutil.rmtree(output)
+
+
+def build(docs: str, output: str, minify: bool = True) -> tuple:
+    """Write the site to output; returns (original pages, rewritten pages, bundles)."""
+    pages = {}
+    for name in PAGES:
+        with open(os.path.join(docs, name), 'r', encoding='utf-8') as f:
+            pages[name] = f.read()
+
+    rewritten, bundles = extract_bundles(pages, minify)
+
+    clear_output(docs, output)
+    shutil.copytree(docs, output, ignore=shutil.ignore_patterns('*.md'))
+    open(os.path.join(output, BUILD_MARKER), 'w').close()
+    os.makedirs(os.path.join(output, ASSET_DIR), exist_ok=True)
+
+    for filename, body in bundles.items():
+        path = os.path.join(output, ASSET_DIR, filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(body)
+        if filename.endswith('.js'):
+            check_js(path)
+
+    for name, html in rewritten.items():
+        with open(os.path.join(output, name), 'w', encoding='utf-8') as f:
+            f.write(html)
+
+    for dirpath, _, filenames in os.walk(output):
+        for filename in filenames:
+            if filename.endswith(PRECOMPRESS):
+                precompress(os.path.join(dirpath, filename))
+
+    return pages, rewritten, bundles
+
+
+def html_parse_ms(html: str, repeat: int) -> float:
+    """Mean html.parser time - a stand-in for the browser's main-thread HTML parse."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser = HTMLParser()
+        parser.feed(html)
+        parser.close()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+NODE_COMPILE = """
+const vm = require('vm');
+const sources = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const repeat = Number(process.argv[1]);
+const result = sources.map((src) => {
+    let total = 0n;
+    for (let i = 0; i < repeat; i++) {
+        const code = src + '\\n//' + i;   // unique source, so V8's compile cache can't answer
+        const start = process.hrtime.bigint();
+        new vm.Script(code);
+        total += process.hrtime.bigint() - start;
+    }
+    return Number(total) / 1e6 / repeat;
+});
+console.log(JSON.stringify(result));
+"""
+
+
+def js_compile_ms(sources: list, repeat: int):
+    """Mean V8 compile time per source via node, or None without node."""
+    if not shutil.which("node"):
+        return None
+    result = subprocess.run(["node", "-e", NODE_COMPILE, str(repeat)], input=json.dumps(sources),
+                            capture_output=True, text=True)
+    if result.returncode:
+        return None
+    return json.loads(result.stdout)
+
+
+def report(pages: dict, rewritten: dict, bundles: dict, repeat: int):
+    encoding = "brotli" if brotli else "gzip"
+    kb = lambda size: f"{size / 1024:7.1f} KB"
+    asset_sizes = {name: transfer_size(body.encode()) for name, body in bundles.items()}
+
+    print(f"\nTransfer size ({encoding})")
+    for name, body in bundles.items():
+        print(f"  {ASSET_DIR}/{name:<28} {kb(len(body.encode()))} raw  {kb(asset_sizes[name])}")
+
+    print(f"\n  {'page':<12} {'before':>10} {'first visit':>12} {'cached assets':>14}")
+    for name, html in pages.items():
+        refs = [a for a in bundles if a in rewritten[name]]
+        before = transfer_size(html.encode())
+        page_only = transfer_size(rewritten[name].encode())
+        first = page_only + sum(asset_sizes[a] for a in refs)
+        print(f"  {name:<12} {kb(before):>10} {kb(first):>12} {kb(page_only):>14}")
+
+    print(f"\nParse time (mean of {repeat})")
+    print(f"  {'page':<12} {'html before':>12} {'html after':>11}")
+    for name, html in pages.items():
+        print(f"  {name:<12} {html_parse_ms(html, repeat):9.2f} ms {html_parse_ms(rewritten[name], repeat):8.2f} ms")
+
+    originals = [m.group('body') for html in pages.values() for m in INLINE_BLOCK.finditer(html)
+                 if m.group('tag') == 'script']
+    scripts = [body for name, body in bundles.items() if name.endswith('.js')]
+    compiled = js_compile_ms(originals[:1] + scripts[:1], repeat)
+    if compiled:
+        print(f"  JS compile (V8): {compiled[0]:.2f} ms inline -> {compiled[1]:.2f} ms bundle")
+    else:
+        print("  JS compile: skipped (node not installed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build hashed, minified, precompressed site bundles")
+    parser.add_argument("--docs", default=DEFAULT_DOCS, help="Site source directory")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"Build output directory (a previous build there, marked by {BUILD_MARKER}, is replaced)")
+    parser.add_argument("--no-minify", action="store_true", help="Extract and hash bundles without minifying")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per parse-time measurement")
+    args = parser.parse_args()
+
+    pages, rewritten, bundles = build(args.docs, args.output, minify=not args.no_minify)
+    print(f"Built {len(pages)} pages, {len(bundles)} bundles -> {os.path.abspath(args.output)}")
+    if not brotli:
+        print("  (pip install brotli for .br files; only .gz written)")
+
+    report(pages, rewritten, bundles, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
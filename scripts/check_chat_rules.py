@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Check: chat function rules
+Runs the rule-based parts of the chat function against known phrasings and
+reports any that are misread
+
+    python check_chat_rules.py
+    python check_chat_rules.py --verbose     # print every case, not only failures
+
+Exits non-zero when a case fails.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+
+# Add the chat function to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions', 'chat'))
+
+from dispatch import radio_codes, radio_reply
+from help_cache import HelpCache
+from scenario_state import ScenarioState, advises_miranda, officer_parts
+
+ARREST = "[DOES] handcuffs him"
+
+# (officer message, interrogation expected in custody)
+INTERROGATION_CASES = [
+    ("[SAYS] Okay, so why did you hit her?", True),
+    ("[SAYS] Why did you hurt her?", True),
+    ("[SAYS] Where did you hide the weapon?", True),
+    ("[SAYS] Ok. Where's the address you were coming from?", True),
+    ("[SAYS] Tell me what happened tonight.", True),
+    ("[SAYS] What's your date of birth?", False),
+    ("[SAYS] Okay, what is your full name?", False),
+    ("[SAYS] Do you have any weapons on you?", False),
+    ("[SAYS] Is there anything sharp in your pockets that could poke me?", False),
+    ("[SAYS] Are you hurt?", False),
+    ("[SAYS] Do you need medical attention?", False),
+    ("[SAYS] Do you understand these rights?", False),
+    ("[SAYS] Martinez, did you check the car?", False),
+    ("[SAYS] Watch your head getting in.", False),
+]
+
+# (officer message, Miranda read expected)
+MIRANDA_CASES = [
+    ("[SAYS] You have the right to remain silent. Anything you say can and will be used against you.", True),
+    ("[DOES] reads him his Miranda rights from the card", True),
+    ("[DOES] Mirandizes the suspect", True),
+    ("[SAYS] I haven't read you Miranda yet.", False),
+    ("[SAYS] Forget Miranda, just tell me what happened.", False),
+    ("[SAYS] Do you want me to read you your rights?", False),
+    ("[SAYS] You don't have the right to remain silent with me.", False),
+    ("[DOES] questions him without reading his rights", False),
+]
+
+# (radio traffic, phrase expected in dispatch's reply or None, phrase that must not appear)
+DISPATCH_CASES = [
+    ("Code 4, no backup needed", "Code 4", "second unit enroute"),
+    ("Unit 23, cancel fire", "cancelling fire", "enroute"),
+    ("Requesting a second unit code 3", "second unit enroute code 3", None),
+    ("Disregard the backup, 10-22", "disregard", "second unit enroute"),
+    ("Start fire and medical for a 901", "fire and medical enroute", None),
+    ("Subject is cooperative, don't need a tow", None, "tow requested"),
+    ("10-23 at 415 E Main", "on scene", None),
+]
+
+# (radio traffic, call type, whether it is read as one - not when the number is an address)
+CALL_TYPE_CASES = [
+    ("10-23 at 415 E Main", '415', False),
+    ("Unit 23, 211 West Roosevelt", '211', False),
+    ("Arrived at 901 7th Street", '901', False),
+    ("Unit 23 on a 415F, one subject detained", '415F', True),
+    ("999! 999! Shots fired", '999', True),
+    ("Requesting 907 to my location", '907', True),
+    ("Copy a 390D eastbound", '390D', True),
+]
+
+# (cached question, new question, whether the cached answer may be reused)
+HELP_CACHE_CASES = [
+    ("Can I search the car with consent?", "Can I search the car without consent?", False),
+    ("Can I search the car without consent?", "Can I search the vehicle without his consent?", True),
+    ("Can I arrest him before the warrant comes back?", "Can I arrest him after the warrant comes back?", False),
+    ("Can I cuff him?", "Can't I cuff him?", False),
+    ("do I need miranda here", "Do I need to Mirandize him?", True),
+]
+
+
+def check_help_cache():
+    results = []
+    for cached, asked, expected in HELP_CACHE_CASES:
+        cache = HelpCache()
+        with contextlib.redirect_stdout(io.StringIO()):  # lookup log lines
+            cache.put(cached, 'dui', '', 'answer')
+            reused = cache.get(asked, 'dui', '') is not None
+        results.append(('help cache reuse', f"{asked} <- {cached}", expected, reused))
+    return results
+
+
+def check_dispatch():
+    results = []
+    for radio, expected, forbidden in DISPATCH_CASES:
+        reply = radio_reply(radio) or ''
+        ok = (expected is None or expected in reply) and not (forbidden and forbidden in reply)
+        results.append(('dispatch reply', f"{radio} -> {reply or None}", True, ok))
+    for radio, code, expected in CALL_TYPE_CASES:
+        results.append(('call type ' + code, radio, expected, code in radio_codes(radio)))
+    return results
+
+
+def check_interrogation():
+    results = []
+    for message, expected in INTERROGATION_CASES:
+        state = ScenarioState()
+        state.officer_turn(ARREST)
+        state.officer_turn(message)
+        results.append(('interrogation', message, expected, state.interrogation_occurred))
+        if expected:
+            # Never advised, so the same question is a Miranda violation
+            results.append(('miranda violation', message, True, state.violation is not None))
+    return results
+
+
+def check_miranda():
+    return [('miranda read', message, expected, advises_miranda(officer_parts(message)))
+            for message, expected in MIRANDA_CASES]
+
+
+CHECKS = [check_interrogation, check_miranda, check_dispatch, check_help_cache]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the chat function's rule-based parsing")
+    parser.add_argument('--verbose', action='store_true', help='Print passing cases too')
+    args = parser.parse_args()
+
+    failures = 0
+    total = 0
+    for check in CHECKS:
+        for rule, message, expected, actual in check():
+            total += 1
+            ok = expected == actual
+            failures += not ok
+            if args.verbose or not ok:
+                print(f"{'PASS' if ok else 'FAIL'}  {rule:<20} expected {expected!s:<5} got {actual!s:<5} {message}")
+
+    print(f"{total - failures}/{total} cases pass")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
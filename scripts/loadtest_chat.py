@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Load test: chat function
+Replays recorded scenarios against one local instance of functions/chat/main.py
+
+Starts the stub Anthropic API (stub_anthropic.py) and the chat function under
+functions-framework as a separate process, then runs virtual trainees at the
+target concurrency. Each trainee plays one recorded scenario turn by turn
+(continuing its server-side session), asks one help question midway and
+requests a debrief at the end.
+
+Reports p50/p95/p99 latency per action (and time to first subject_response
+event with --stream), throughput, and the instance's resident memory (idle,
+peak). With --baseline the run is compared to a saved result and exits 1 on a
+regression beyond --tolerance. Baselines are machine-specific: record one from
+the base branch, then gate the change on the same machine.
+
+    python loadtest_chat.py --concurrency 16 --trainees 48
+    python loadtest_chat.py --target chat_async --stream
+    python loadtest_chat.py --profile instant --write-baseline baseline.json
+    python loadtest_chat.py --profile instant --baseline baseline.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_anthropic import DEFAULT_SCENARIOS, PROFILES, StubState, load_chat_replies, start_stub
+
+CHAT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions', 'chat')
+
+HELP_QUESTIONS = [
+    "Do I have probable cause to arrest yet?",
+    "Do I need to read him Miranda before I ask anything else?",
+    "Can I search the car?",
+    "When should I call for backup?",
+]
+
+# Regression gate: metric -> True if higher is better
+GATED_METRICS = {'p50': False, 'p95': False, 'throughput_rps': True, 'peak_rss_mb': False}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of unsorted values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def process_tree_rss(pid: int) -> int:
+    """Resident bytes of a process and all its descendants (Linux /proc)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+class MemorySampler(threading.Thread):
+    """Polls the instance's RSS and keeps the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.peak = max(self.peak, process_tree_rss(self.pid))
+
+
+def start_function(target: str, port: int, stub_url: str, threads: int, log=None) -> subprocess.Popen:
+    """Run the chat function under functions-framework, pointed at the stub."""
+    env = {
+        **os.environ,
+        'ANTHROPIC_BASE_URL': stub_url,
+        'ANTHROPIC_API_KEY': os.environ.get('ANTHROPIC_API_KEY', 'stub'),
+        'THREADS': str(threads),
+        'PYTHONUNBUFFERED': '1',
+    }
+    command = [sys.executable, '-m', 'functions_framework', '--target', target,
+               '--source', 'main.py', '--port', str(port), '--host', '127.0.0.1']
+    if target == 'chat_async':
+        command.append('--asgi')
+    return subprocess.Popen(command, cwd=CHAT_DIR, env=env,
+                            stdout=log or subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def wait_ready(port: int, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"chat function exited:\n{process.stderr.read().decode()}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('OPTIONS', '/')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"chat function not ready on port {port} after {timeout:.0f}s")
+
+
+class Trainee:
+    """One virtual trainee replaying a recorded scenario over a keep-alive connection."""
+
+    def __init__(self, port: int, scenario: dict, index: int, stream: bool):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        self.scenario = scenario
+        self.index = index
+        self.stream = stream
+        self.samples = []    # (action, seconds, time to first subject_response or None, ok)
+
+    def post(self, action: str, body: dict) -> dict:
+        start = time.perf_counter()
+        first_event = None
+        result, ok = {}, False
+        try:
+            self.conn.request('POST', '/', body=json.dumps(body), headers={'Content-Type': 'application/json'})
+            response = self.conn.getresponse()
+
+            if response.getheader('Content-Type', '').startswith('text/event-stream'):
+                event = None
+                for raw in iter(response.readline, b''):
+                    line = raw.decode().rstrip('\n')
+                    if line.startswith('event: '):
+                        event = line[7:]
+                        if event == 'subject_response' and first_event is None:
+                            first_event = time.perf_counter() - start
+                    elif line.startswith('data: ') and event in ('result', 'error'):
+                        result = json.loads(line[6:])
+                ok = response.status == 200 and 'error' not in result
+            else:
+                result = json.loads(response.read())
+                ok = response.status == 200
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            result = {'error': str(e)}
+            self.conn.close()
+
+        self.samples.append((action, time.perf_counter() - start, first_event, ok))
+        return result
+
+    def run(self) -> list:
+        scenario = self.scenario
+        transcript = [{'role': 'system', 'content': scenario['scenario_config'].get('title', '')}]
+        session_id = None
+        help_turn = len(scenario['turns']) // 2
+
+        for t, turn in enumerate(scenario['turns']):
+            if session_id:
+                body = {'session_id': session_id, 'message': turn['officer']}
+            else:
+                body = {
+                    'message': turn['officer'],
+                    'messages': [],
+                    'training_mode': True,
+                    'scenario': scenario['scenario'],
+                    'difficulty': scenario['difficulty'],
+                    'scenario_config': scenario['scenario_config'],
+                }
+            if self.stream:
+                body['stream'] = True
+
+            result = self.post('chat', body)
+            session_id = result.get('session_id', session_id)
+            transcript.append({'role': 'officer', 'content': turn['officer']})
+            transcript.append({'role': 'subject', 'content': result.get('subject_response', '')})
+
+            if t == help_turn:
+                self.post('help', {
+                    'action': 'help',
+                    'question': HELP_QUESTIONS[self.index % len(HELP_QUESTIONS)],
+                    'scenario': scenario['scenario'],
+                    'scenario_title': scenario['scenario_config'].get('title', ''),
+                    'legal_context': 'Reasonable suspicion for the stop; probable cause to arrest',
+                    'safety_context': 'Keep a position of advantage',
+                    'conversation_history': transcript[-6:],
+                })
+
+        self.post('debrief', {'action': 'debrief', 'messages': transcript})
+        self.conn.close()
+        return self.samples
+
+
+def summarize(samples: list, elapsed: float, idle_rss: int, peak_rss: int) -> dict:
+    actions = {}
+    for action in ('chat', 'help', 'debrief'):
+        latencies = [s[1] for s in samples if s[0] == action]
+        if not latencies:
+            continue
+        actions[action] = {
+            'requests': len(latencies),
+            'errors': sum(1 for s in samples if s[0] == action and not s[3]),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+        }
+
+    first_events = [s[2] for s in samples if s[2] is not None]
+    if first_events:
+        actions['chat']['first_event_p50'] = percentile(first_events, 50)
+        actions['chat']['first_event_p95'] = percentile(first_events, 95)
+
+    return {
+        'actions': actions,
+        'requests': len(samples),
+        'errors': sum(1 for s in samples if not s[3]),
+        'elapsed_s': elapsed,
+        'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+        'idle_rss_mb': idle_rss / 2 ** 20,
+        'peak_rss_mb': peak_rss / 2 ** 20,
+    }
+
+
+def print_report(summary: dict, trainees: int):
+    print(f"\n  {'action':<8} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for action, stats in summary['actions'].items():
+        print(f"  {action:<8} {stats['requests']:>8} {stats['errors']:>6} "
+              f"{stats['p50'] * 1000:>8.0f} {stats['p95'] * 1000:>8.0f} {stats['p99'] * 1000:>8.0f}")
+
+    chat = summary['actions'].get('chat', {})
+    if 'first_event_p50' in chat:
+        print(f"\n  First subject_response event: p50 {chat['first_event_p50'] * 1000:.0f} ms, "
+              f"p95 {chat['first_event_p95'] * 1000:.0f} ms")
+
+    print(f"\n  Throughput: {summary['throughput_rps']:.1f} req/s "
+          f"({trainees} scenarios in {summary['elapsed_s']:.1f}s)")
+    print(f"  Memory:     {summary['idle_rss_mb']:.1f} MB idle, {summary['peak_rss_mb']:.1f} MB peak "
+          f"(+{summary['peak_rss_mb'] - summary['idle_rss_mb']:.1f} MB under load)")
+
+
+def compare_to_baseline(summary: dict, baseline: dict, tolerance: float, min_delta: float) -> list:
+    """Names of metrics that regressed beyond tolerance (latencies also by more than min_delta seconds)."""
+    if baseline.get('config') != summary.get('config'):
+        print(f"\n  Warning: baseline was recorded with {baseline.get('config')}")
+
+    checks = [('throughput_rps', summary['throughput_rps'], baseline['throughput_rps']),
+              ('peak_rss_mb', summary['peak_rss_mb'], baseline['peak_rss_mb'])]
+    for action, stats in baseline['actions'].items():
+        current = summary['actions'].get(action)
+        if current:
+            checks += [(f"{action} {metric}", current[metric], stats[metric]) for metric in ('p50', 'p95')]
+
+    print(f"\n  {'metric':<16} {'baseline':>10} {'current':>10} {'change':>8}")
+    regressions = []
+    for name, current, base in checks:
+        higher_is_better = GATED_METRICS[name.split()[-1]]
+        change = (current - base) / base if base else 0.0
+        worse = -change if higher_is_better else change
+        noise = name.endswith(('p50', 'p95')) and abs(current - base) < min_delta
+        flag = '  REGRESSION' if worse > tolerance and not noise else ''
+        print(f"  {name:<16} {base:>10.3f} {current:>10.3f} {change:>+7.0%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chat function against a stub Anthropic API")
+    parser.add_argument("--target", choices=["chat", "chat_async"], default="chat", help="Entry point to serve")
+    parser.add_argument("--concurrency", type=int, default=16, help="Trainees running at once")
+    parser.add_argument("--trainees", type=int, default=48, help="Scenario replays in total")
+    parser.add_argument("--stream", action="store_true", help="Use SSE streaming for chat turns")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic", help="Stub latency profile")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply stub delays (0.1 = 10x faster)")
+    parser.add_argument("--threads", type=int, default=32, help="Worker threads for the sync target (THREADS)")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help="Recorded scenarios (JSON)")
+    parser.add_argument("--log", help="Save the function's log lines (for report_routes.py)")
+    parser.add_argument("--baseline", help="Compare against a saved result; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression (fraction)")
+    parser.add_argument("--min-delta-ms", type=float, default=25.0,
+                        help="Ignore latency changes smaller than this, however large in percent")
+    parser.add_argument("--write-baseline", help="Save this run's result as a baseline")
+    args = parser.parse_args()
+
+    with open(args.scenarios, 'r') as f:
+        scenarios = json.load(f)
+
+    stub = start_stub(StubState(load_chat_replies(args.scenarios), args.profile, args.time_scale, seed=0))
+    port = free_port()
+    log = open(args.log, 'w') if args.log else None
+    process = start_function(args.target, port, f"http://127.0.0.1:{stub.server_port}", args.threads, log)
+
+    try:
+        wait_ready(port, process)
+        idle_rss = process_tree_rss(process.pid)
+        print(f"{args.target} on :{port}, stub on :{stub.server_port} ({args.profile} profile, "
+              f"x{args.time_scale} delays)")
+        print(f"{args.trainees} scenario replays at concurrency {args.concurrency}"
+              f"{', streaming' if args.stream else ''}")
+
+        sampler = MemorySampler(process.pid)
+        sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            trainees = [Trainee(port, scenarios[i % len(scenarios)], i, args.stream)
+                        for i in range(args.trainees)]
+            samples = [s for result in pool.map(Trainee.run, trainees) for s in result]
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        stub.shutdown()
+        if log:
+            log.close()
+
+    summary = summarize(samples, elapsed, idle_rss, sampler.peak)
+    summary['config'] = {key: getattr(args, key) for key in
+                         ('target', 'concurrency', 'trainees', 'stream', 'profile', 'time_scale', 'threads')}
+    print_report(summary, args.trainees)
+    print(f"  Stub:       {stub.state.requests} model calls, peak {stub.state.peak_in_flight} in flight")
+
+    if args.write_baseline:
+        with open(args.write_baseline, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nBaseline written to {args.write_baseline}")
+
+    if summary['errors']:
+        print(f"\n{summary['errors']} requests failed")
+        return 1
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(summary, baseline, args.tolerance, args.min_delta_ms / 1000)
+        if regressions:
+            print(f"\nFAIL: {', '.join(regressions)} regressed more than {args.tolerance:.0%}")
+            return 1
+        print(f"\nOK: within {args.tolerance:.0%} of baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
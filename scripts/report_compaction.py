@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Report: chat history compaction
+
+Replays recorded scenarios turn by turn and compares the conversation
+sent to Claude with full raw_response replay against the compacted
+history (rolling scenario state + last few verbatim exchanges).
+
+    python report_compaction.py                    # ~4 chars/token estimate, offline
+    python report_compaction.py --count-tokens     # exact counts via the token counting API
+    python report_compaction.py --keep 2
+"""
+
+import argparse
+import json
+import sys
+import os
+
+# Add the chat function to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions', 'chat'))
+
+from compaction import compact_history, KEEP_EXCHANGES
+
+DEFAULT_SCENARIOS = os.path.join(os.path.dirname(__file__), 'fixtures', 'recorded_scenarios.json')
+CHAT_MODEL = 'claude-3-5-haiku-20241022'
+
+
+def history_for(turns: list) -> list:
+    """Claude messages for recorded turns, as the chat function stores them."""
+    messages = []
+    for turn in turns:
+        messages.append({'role': 'user', 'content': f"OFFICER: {turn['officer']}"})
+        messages.append({'role': 'assistant', 'content': turn['raw_response']})
+    return messages
+
+
+def estimate_tokens(messages: list) -> int:
+    return sum(len(m['content']) for m in messages) // 4
+
+
+def make_counter(count_tokens: bool):
+    if not count_tokens:
+        return estimate_tokens
+
+    from anthropic import Anthropic
+    client = Anthropic()
+
+    def count(messages):
+        return client.messages.count_tokens(model=CHAT_MODEL, messages=messages).input_tokens
+
+    return count
+
+
+def report_scenario(scenario: dict, keep: int, count) -> tuple:
+    print(f"\n{scenario['name']} ({scenario['scenario']}, {scenario['difficulty']})")
+    print(f"  {'turn':>4} {'full':>8} {'compacted':>10} {'saved':>7}")
+
+    full_total = compact_total = 0
+    for t, turn in enumerate(scenario['turns'], 1):
+        history = history_for(scenario['turns'][:t - 1])
+        current = [
+            {'role': 'user', 'content': f"OFFICER: {turn['officer']}"},
+            {'role': 'assistant', 'content': '{'},
+        ]
+
+        full = count(history + current)
+        compacted = count(compact_history(history, keep) + current)
+        full_total += full
+        compact_total += compacted
+
+        saved = 1 - compacted / full if full else 0.0
+        print(f"  {t:>4} {full:>8,} {compacted:>10,} {saved:>6.0%}")
+
+    return full_total, compact_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report token savings from chat history compaction")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help="Recorded scenarios (JSON)")
+    parser.add_argument("--keep", type=int, default=KEEP_EXCHANGES, help="Verbatim exchanges to keep")
+    parser.add_argument("--count-tokens", action="store_true",
+                        help="Use the token counting API instead of a 4 chars/token estimate")
+    args = parser.parse_args()
+
+    with open(args.scenarios, 'r') as f:
+        scenarios = json.load(f)
+
+    count = make_counter(args.count_tokens)
+    unit = "tokens" if args.count_tokens else "est. tokens"
+    print(f"Conversation {unit} per turn (system prompt excluded - it is constant and cached), keep={args.keep}")
+
+    full_total = compact_total = 0
+    for scenario in scenarios:
+        full, compacted = report_scenario(scenario, args.keep, count)
+        full_total += full
+        compact_total += compacted
+
+    print(f"\nAll scenarios: {full_total:,} -> {compact_total:,} {unit} "
+          f"({1 - compact_total / full_total:.0%} less)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
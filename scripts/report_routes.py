@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Report: model routes
+Per-route cost, latency and truncation from the chat function's logs
+
+Reads the "model_route" JSON lines the chat function prints for every Claude
+call (other lines are skipped), e.g. from an exported Cloud Logging file or a
+load-test run, and summarizes each route so the budgets in routing.py can be
+tuned: a route that truncates often needs more max_tokens, one whose p95
+output sits far below its budget can give some back.
+
+    python report_routes.py chat.log
+    gcloud logging read ... --format='value(textPayload)' | python report_routes.py
+"""
+
+import argparse
+import fileinput
+import json
+import sys
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of unsorted values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def read_route_events(paths: list) -> list:
+    events = []
+    for line in fileinput.input(paths or ['-']):
+        start = line.find('{"event": "model_route"')
+        if start < 0:
+            continue
+        try:
+            events.append(json.loads(line[start:]))
+        except ValueError:
+            continue
+    return events
+
+
+def summarize(events: list) -> dict:
+    routes = {}
+    for event in events:
+        routes.setdefault(event['route'], []).append(event)
+
+    summary = {}
+    for name, calls in sorted(routes.items()):
+        first = [c for c in calls if c['attempt'] == 1]
+        latencies = [c['latency_ms'] for c in calls]
+        outputs = [c['output_tokens'] for c in first]
+        summary[name] = {
+            'calls': len(first),
+            'truncated': sum(1 for c in first if c['stop_reason'] == 'max_tokens') / len(first) if first else 0.0,
+            'retries': len(calls) - len(first),
+            'retry_truncated': sum(1 for c in calls if c['attempt'] > 1 and c['stop_reason'] == 'max_tokens'),
+            'max_tokens': max(c['max_tokens'] for c in first) if first else 0,
+            'output_p95': percentile(outputs, 95),
+            'latency_p50': percentile(latencies, 50),
+            'latency_p95': percentile(latencies, 95),
+            'cost_per_call': sum(c['cost_usd'] for c in calls) / len(first) if first else 0.0,
+            'cost_total': sum(c['cost_usd'] for c in calls),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize model_route log lines per route")
+    parser.add_argument("logs", nargs="*", help="Log files (default: stdin)")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = summarize(read_route_events(args.logs))
+    if not summary:
+        print("No model_route events found")
+        return 1
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    print(f"{'route':<24} {'calls':>6} {'trunc':>6} {'retry':>6} {'budget':>7} {'out p95':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'$/call':>9} {'$ total':>9}")
+    for name, s in summary.items():
+        print(f"{name:<24} {s['calls']:>6} {s['truncated']:>6.1%} {s['retries']:>6} {s['max_tokens']:>7} "
+              f"{s['output_p95']:>8} {s['latency_p50']:>8.0f} {s['latency_p95']:>8.0f} "
+              f"{s['cost_per_call']:>9.5f} {s['cost_total']:>9.4f}")
+
+    total = sum(s['cost_total'] for s in summary.values())
+    calls = sum(s['calls'] for s in summary.values())
+    print(f"\n{calls} calls, ${total:.4f} estimated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
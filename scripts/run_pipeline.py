@@ -1,42 +1,91 @@
 #!/usr/bin/env python3
 """
-Full pipeline: Scrape -> Parse -> Output
+Full pipeline: Scrape -> Parse -> Index -> Output
+
+By default the stages overlap: each statute is handed to the parser
+workers as soon as it is scraped (see src/pipeline.py). --sequential runs
+the scrape to completion first, as before. The parsed statutes are then
+indexed for the chat function (functions/chat/statute_index.db).
 """
 
+import argparse
 import sys
 import os
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from scraper import scrape_priority_statutes
-from parser import parse_all_statutes
-
+from fetcher import DEFAULT_WORKERS, DEFAULT_RATE
+from scraper import scrape_priority_statutes, PRIORITY_SECTIONS, RAW_HTML_MODES, DEFAULT_RAW_HTML
+from parser import parse_all_statutes, DEFAULT_CONCURRENCY
+from pipeline import run_streaming_pipeline, DEFAULT_QUEUE_SIZE
+from statute_index import build_statute_index
 
-def main():
-    print("=" * 60)
-    print("ARS STATUTE PIPELINE")
-    print("=" * 60)
 
+def run_sequential(args):
     # Step 1: Scrape
     print("\n[1/2] SCRAPING PRIORITY STATUTES...")
     print("-" * 40)
-    scrape_priority_statutes(output_dir="../data")
+    scrape_priority_statutes(output_dir="../data", workers=args.workers, rate=args.rate,
+                             raw_html=args.raw_html)
 
     # Step 2: Parse
     print("\n[2/2] PARSING WITH CLAUDE...")
     print("-" * 40)
     parse_all_statutes(
         input_file="../data/raw_statutes.json",
-        output_file="../data/parsed_statutes.json"
+        output_file="../data/parsed_statutes.json",
+        force=args.force,
+        concurrency=args.concurrency
     )
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape -> Parse pipeline")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent fetches")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Max requests per second to azleg.gov")
+    parser.add_argument("--force", action="store_true", help="Re-parse every statute, ignoring earlier results")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel Claude requests")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="Max scraped statutes waiting for a parser")
+    parser.add_argument("--sequential", action="store_true", help="Finish scraping before parsing starts")
+    parser.add_argument("--raw-html", choices=RAW_HTML_MODES, default=DEFAULT_RAW_HTML,
+                        help="Store section HTML gzipped (default), plain, or not at all")
+    parser.add_argument("--index", default="../functions/chat/statute_index.db",
+                        help="Statute retrieval index for the chat function")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ARS STATUTE PIPELINE")
+    print("=" * 60)
+
+    if args.sequential:
+        run_sequential(args)
+    else:
+        print("\nSCRAPING + PARSING PRIORITY STATUTES (overlapped)...")
+        print("-" * 40)
+        run_streaming_pipeline(
+            PRIORITY_SECTIONS,
+            raw_file="../data/raw_statutes.json",
+            parsed_file="../data/parsed_statutes.json",
+            workers=args.workers,
+            rate=args.rate,
+            concurrency=args.concurrency,
+            queue_size=args.queue_size,
+            force=args.force,
+            raw_html=args.raw_html
+        )
+
+    print("\nINDEXING PARSED STATUTES...")
+    print("-" * 40)
+    build_statute_index("../data/parsed_statutes.json", args.index)
+
     print("\n" + "=" * 60)
     print("PIPELINE COMPLETE")
     print("=" * 60)
     print("\nOutput files:")
     print("  - data/raw_statutes.json (scraped HTML/text)")
     print("  - data/parsed_statutes.json (structured for training)")
+    print(f"  - {args.index} (statute search index for the chat function)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Stub Anthropic API
+Local stand-in for POST /v1/messages with configurable latency, for load tests
+
+Replies are replayed, not generated:
+  chat     - the recorded raw_response for the officer line (assistant prefill '{')
+  debrief  - a canned debrief (assistant prefill '{"overall_score":')
+  help     - a canned answer
+
+Latency follows a profile: time to first token plus output tokens at a fixed
+rate, per model family, with optional jitter. Point the chat function at it with
+ANTHROPIC_BASE_URL=http://127.0.0.1:<port>.
+
+    python stub_anthropic.py --port 8089 --profile realistic
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_SCENARIOS = os.path.join(os.path.dirname(__file__), 'fixtures', 'recorded_scenarios.json')
+
+# Seconds to first token and output tokens per second, by model family
+PROFILES = {
+    'instant': {
+        'haiku': {'ttft': 0.0, 'tokens_per_sec': 0},
+        'sonnet': {'ttft': 0.0, 'tokens_per_sec': 0},
+    },
+    'realistic': {
+        'haiku': {'ttft': 0.45, 'tokens_per_sec': 150},
+        'sonnet': {'ttft': 1.2, 'tokens_per_sec': 60},
+    },
+    'slow': {
+        'haiku': {'ttft': 1.5, 'tokens_per_sec': 50},
+        'sonnet': {'ttft': 3.0, 'tokens_per_sec': 25},
+    },
+}
+
+CHARS_PER_TOKEN = 4
+STREAM_CHUNK_CHARS = 16
+
+DEBRIEF_REPLY = ''' 78,
+  "scenario_score": 78,
+  "scenario_summary": "Officer conducted a lawful contact and built probable cause before arresting.",
+  "legal_issues": [],
+  "legal_concerns": [],
+  "tactical_observations": ["Maintained a safe position during the contact"],
+  "communication_notes": ["Clear, professional introduction"],
+  "strengths": ["Articulated reasonable suspicion for the stop"],
+  "improvements": ["Advise Miranda before post-arrest questioning"],
+  "recommendations": ["Review ARS 28-1381 impairment elements"],
+  "critical_failures": [],
+  "learning_points": ["Custody plus interrogation triggers Miranda"],
+  "statutes_referenced": ["28-1381"],
+  "case_law_referenced": ["Miranda v. Arizona"],
+  "scenario_outcome": "Subject arrested for DUI"
+}'''
+
+HELP_REPLY = ("You have reasonable suspicion for the stop. Build probable cause from what you observe "
+              "and document it. Keep your cover position and don't question him about the offense once "
+              "he is in custody until Miranda is read.")
+
+
+def load_chat_replies(path):
+    """Officer line -> recorded reply text after the '{' prefill."""
+    with open(path, 'r') as f:
+        scenarios = json.load(f)
+
+    replies = {}
+    for scenario in scenarios:
+        for turn in scenario['turns']:
+            replies[turn['officer']] = turn['raw_response'].removeprefix('{')
+    return replies
+
+
+def model_family(model):
+    return 'haiku' if 'haiku' in model else 'sonnet'
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class StubState:
+    """Replies, latency settings and request counters shared by handler threads."""
+
+    def __init__(self, replies, profile='realistic', time_scale=1.0, jitter=0.1, seed=None):
+        self.replies = replies
+        self.profile = PROFILES[profile]
+        self.time_scale = time_scale
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def reply_for(self, body):
+        """Reply text for a Messages API request body."""
+        messages = body.get('messages', [])
+        prefill = messages[-1]['content'] if messages and messages[-1]['role'] == 'assistant' else None
+
+        if prefill == '{':
+            officer = messages[-2]['content'] if len(messages) > 1 else ''
+            officer = officer.rsplit('OFFICER: ', 1)[-1]
+            return self.replies.get(officer, '"subject_response": "What?", "subject_mood": "confused", '
+                                              '"scenario_complete": false}')
+        if prefill and prefill.startswith('{"overall_score"'):
+            return DEBRIEF_REPLY
+        return HELP_REPLY
+
+    def delays(self, model):
+        """(seconds to first token, seconds per output token) for one request."""
+        latency = self.profile[model_family(model)]
+        with self.lock:
+            factor = self.time_scale * (1 + self.random.uniform(-self.jitter, self.jitter))
+        per_token = 1 / latency['tokens_per_sec'] if latency['tokens_per_sec'] else 0.0
+        return latency['ttft'] * factor, per_token * factor
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.startswith('/v1/messages'):
+            self.send_error(404)
+            return
+
+        state = self.server.state
+        state.enter()
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            text = state.reply_for(body)
+            usage = {
+                'input_tokens': estimate_tokens(json.dumps(body.get('messages', []))),
+                'output_tokens': estimate_tokens(text),
+                'cache_read_input_tokens': estimate_tokens(json.dumps(body.get('system', ''))),
+                'cache_creation_input_tokens': 0,
+            }
+            message = {
+                'id': f"msg_stub_{state.requests}",
+                'type': 'message',
+                'role': 'assistant',
+                'model': body['model'],
+                'content': [],
+                'stop_reason': None,
+                'stop_sequence': None,
+                'usage': usage,
+            }
+            ttft, per_token = state.delays(body['model'])
+
+            if body.get('stream'):
+                self.stream_reply(message, text, ttft, per_token)
+            else:
+                time.sleep(ttft + per_token * usage['output_tokens'])
+                message['content'] = [{'type': 'text', 'text': text}]
+                message['stop_reason'] = 'end_turn'
+                payload = json.dumps(message).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+        finally:
+            state.leave()
+
+    def stream_reply(self, message, text, ttft, per_token):
+        """Messages API SSE events, one text delta per STREAM_CHUNK_CHARS."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send(event, data):
+            frame = f"event: {event}\ndata: {json.dumps({'type': event, **data})}\n\n".encode()
+            self.wfile.write(f"{len(frame):x}\r\n".encode() + frame + b"\r\n")
+            self.wfile.flush()
+
+        time.sleep(ttft)
+        send('message_start', {'message': message})
+        send('content_block_start', {'index': 0, 'content_block': {'type': 'text', 'text': ''}})
+        for i in range(0, len(text), STREAM_CHUNK_CHARS):
+            chunk = text[i:i + STREAM_CHUNK_CHARS]
+            time.sleep(per_token * estimate_tokens(chunk))
+            send('content_block_delta', {'index': 0, 'delta': {'type': 'text_delta', 'text': chunk}})
+        send('content_block_stop', {'index': 0})
+        send('message_delta', {'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                               'usage': {'output_tokens': message['usage']['output_tokens']}})
+        send('message_stop', {})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_stub(state, host='127.0.0.1', port=0):
+    """Serve the stub on a background thread; returns the server (server.server_port)."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Anthropic Messages API for load tests")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply all delays (0.1 = 10x faster)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- fraction applied to each delay")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help="Recorded scenarios (JSON)")
+    args = parser.parse_args()
+
+    state = StubState(load_chat_replies(args.scenarios), args.profile, args.time_scale, args.jitter)
+    server = start_stub(state, port=args.port)
+    print(f"Stub Anthropic API on http://127.0.0.1:{server.server_port} ({args.profile} profile)")
+    print(f"  ANTHROPIC_BASE_URL=http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(f"\n{state.requests} requests, peak {state.peak_in_flight} in flight")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
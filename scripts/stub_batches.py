@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Stub Message Batches API
+Local stand-in for /v1/messages/batches, and a check that runs the parser's
+--batch path against it
+
+The stub accepts a batch, reports it in_progress for a few polls, then ends
+it. Sections listed with --errored / --expired get that result the first time
+they are submitted and succeed after that, the way a transient batch failure
+behaves. Succeeded requests get a small parse reply built from the section
+number.
+
+    python stub_batches.py                    # run the checks below and exit
+    python stub_batches.py --serve --port 8090 --errored 13-1203 --expired 13-2904
+
+The check parses the fixture pages (fixtures/pages) with parse_all_statutes(batch=True):
+  1. submit + poll: one batch, polled until it ends; errored and expired
+     requests are recorded as errors, the rest succeed
+  2. re-queue: a second run submits only the failed sections and reuses the rest
+  3. resume: a run that dies while polling leaves its batch id behind; the
+     next run polls that batch instead of submitting a new one
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+DEFAULT_PAGES = os.path.join(os.path.dirname(__file__), 'fixtures', 'pages')
+SECTION = re.compile(r"STATUTE SECTION: (\S+)")
+
+
+def parse_reply(section):
+    """A minimal successful parse for one section."""
+    return json.dumps({
+        "section": section,
+        "title": f"Stub title for {section}",
+        "summary": "Stub summary.",
+        "classification": "varies",
+        "elements": [{"element": "Stub element", "explanation": "Stub explanation"}],
+    })
+
+
+class BatchStubState:
+    """Batches, scripted failures and request counters shared by handler threads."""
+
+    def __init__(self, errored=(), expired=(), polls=2, fail_retrieves=0):
+        self.fail_once = {**{s: 'errored' for s in errored}, **{s: 'expired' for s in expired}}
+        self.polls = polls
+        self.fail_retrieves = fail_retrieves
+
+        self.lock = threading.Lock()
+        self.batches = {}
+        self.submitted = []     # sections per create call, in order
+        self.retrieves = 0
+
+    def create(self, requests):
+        with self.lock:
+            batch_id = f"msgbatch_stub_{len(self.batches) + 1}"
+            results = []
+            sections = []
+            for request in requests:
+                section = SECTION.search(request['params']['messages'][-1]['content']).group(1)
+                sections.append(section)
+                outcome = self.fail_once.pop(section, 'succeeded')
+                results.append((request['custom_id'], section, request['params']['model'], outcome))
+            self.submitted.append(sections)
+            self.batches[batch_id] = {'results': results, 'polls_left': self.polls,
+                                      'created_at': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+            return batch_id
+
+    def retrieve(self, batch_id):
+        """Batch status; counts down the polls left before it ends. None when the poll should fail."""
+        with self.lock:
+            self.retrieves += 1
+            if self.fail_retrieves:
+                self.fail_retrieves -= 1
+                return None
+            batch = self.batches[batch_id]
+            ended = batch['polls_left'] <= 0
+            batch['polls_left'] -= 1
+            return batch, ended
+
+    def result_lines(self, batch_id):
+        for custom_id, section, model, outcome in self.batches[batch_id]['results']:
+            if outcome == 'succeeded':
+                text = parse_reply(section)
+                result = {'type': 'succeeded', 'message': {
+                    'id': f"msg_stub_{custom_id}", 'type': 'message', 'role': 'assistant', 'model': model,
+                    'content': [{'type': 'text', 'text': text}], 'stop_reason': 'end_turn', 'stop_sequence': None,
+                    'usage': {'input_tokens': 1000, 'output_tokens': len(text) // 4,
+                              'cache_read_input_tokens': 0, 'cache_creation_input_tokens': 0},
+                }}
+            elif outcome == 'errored':
+                result = {'type': 'errored', 'error': {'type': 'error', 'error': {
+                    'type': 'overloaded_error', 'message': 'Overloaded'}}}
+            else:
+                result = {'type': 'expired'}
+            yield json.dumps({'custom_id': custom_id, 'result': result})
+
+
+class BatchStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, content_type='application/json'):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def batch_json(self, batch_id, batch, ended):
+        results = batch['results']
+        count = lambda outcome: sum(1 for r in results if r[3] == outcome) if ended else 0
+        host, port = self.server.server_address[:2]
+        return {
+            'id': batch_id,
+            'type': 'message_batch',
+            'processing_status': 'ended' if ended else 'in_progress',
+            'request_counts': {'processing': 0 if ended else len(results), 'succeeded': count('succeeded'),
+                               'errored': count('errored'), 'canceled': 0, 'expired': count('expired')},
+            'created_at': batch['created_at'],
+            'expires_at': batch['created_at'],
+            'ended_at': batch['created_at'] if ended else None,
+            'archived_at': None,
+            'cancel_initiated_at': None,
+            'results_url': f"http://{host}:{port}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def do_POST(self):
+        if self.path.split('?')[0] != '/v1/messages/batches':
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        state = self.server.state
+        batch_id = state.create(body['requests'])
+        self.send_json(200, self.batch_json(batch_id, state.batches[batch_id], False))
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        state = self.server.state
+        if parts[:3] != ['v1', 'messages', 'batches'] or len(parts) < 4 or parts[3] not in state.batches:
+            self.send_error(404)
+            return
+
+        if len(parts) == 5 and parts[4] == 'results':
+            lines = '\n'.join(state.result_lines(parts[3])) + '\n'
+            self.send_json(200, lines.encode(), 'application/binary')
+            return
+
+        status = state.retrieve(parts[3])
+        if status is None:
+            self.send_json(500, {'type': 'error', 'error': {'type': 'api_error', 'message': 'Stub poll failure'}})
+            return
+        self.send_json(200, self.batch_json(parts[3], *status))
+
+
+def start_stub(state, host='127.0.0.1', port=0):
+    """Serve the stub on a background thread; returns the server (server.server_port)."""
+    server = ThreadingHTTPServer((host, port), BatchStubHandler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def raw_statutes(pages_dir, raw_file):
+    """Scraper-shaped input built from saved section pages; returns the sections."""
+    from scraper import extract_section
+
+    records = []
+    for page in sorted(Path(pages_dir).glob("*.htm")):
+        result = extract_section(page.read_text(), page.name)
+        records.append({"section": page.stem, "url": page.name, **result})
+    with open(raw_file, 'w') as f:
+        json.dump(records, f)
+    return [r['section'] for r in records]
+
+
+def statuses(output_file):
+    with open(output_file, 'r') as f:
+        return {r['section']: (r['_parse_status'], r.get('_error')) for r in json.load(f)}
+
+
+def run_checks(pages_dir):
+    """Drive parse_all_statutes(batch=True) against the stub; returns the failed checks."""
+    state = BatchStubState()
+    server = start_stub(state)
+    os.environ['ANTHROPIC_BASE_URL'] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'stub')
+
+    import parser as statute_parser
+
+    failures = []
+
+    def check(name, ok, detail=''):
+        print(f"  {'PASS' if ok else 'FAIL'}  {name}" + (f"  ({detail})" if detail and not ok else ''))
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_file = os.path.join(tmp, 'raw_statutes.json')
+        output = os.path.join(tmp, 'parsed_statutes.json')
+        sections = raw_statutes(pages_dir, raw_file)
+        errored, expired = sections[0], sections[1]
+
+        print(f"\n1. Submit and poll ({len(sections)} statutes, {errored} errored, {expired} expired)")
+        state.fail_once = {errored: 'errored', expired: 'expired'}
+        state.retrieves = 0
+        statute_parser.parse_all_statutes(raw_file, output, batch=True, poll_interval=0)
+        result = statuses(output)
+        check("one batch with every statute", state.submitted == [sections], state.submitted)
+        check("polled until ended", state.retrieves >= state.polls + 1, f"{state.retrieves} retrieves")
+        check("errored request recorded as error",
+              result[errored][0] == 'error' and 'errored' in (result[errored][1] or ''), result[errored])
+        check("expired request recorded as error",
+              result[expired][0] == 'error' and 'expired' in (result[expired][1] or ''), result[expired])
+        check("other requests succeeded",
+              all(result[s][0] == 'success' for s in sections[2:]), result)
+        check("batch state file removed", not Path(f"{output}.batch.json").exists())
+
+        print("\n2. Re-queue failed requests")
+        statute_parser.parse_all_statutes(raw_file, output, batch=True, poll_interval=0)
+        result = statuses(output)
+        check("only failed sections resubmitted", state.submitted[-1] == [errored, expired], state.submitted[-1])
+        check("every statute succeeded", all(s == 'success' for s, _ in result.values()), result)
+
+        print("\n3. Resume a batch after the run dies while polling")
+        resumed = os.path.join(tmp, 'resumed.json')
+        state.fail_retrieves = 1
+        try:
+            statute_parser.parse_all_statutes(raw_file, resumed, batch=True, poll_interval=0)
+            died = False
+        except Exception:
+            died = True
+        submits = len(state.submitted)
+        check("first run died while polling", died)
+        check("batch id kept for the next run", Path(f"{resumed}.batch.json").exists())
+        statute_parser.parse_all_statutes(raw_file, resumed, batch=True, poll_interval=0)
+        check("no second batch submitted", len(state.submitted) == submits, state.submitted)
+        check("resumed batch results saved",
+              all(s == 'success' for s, _ in statuses(resumed).values()), statuses(resumed))
+
+    server.shutdown()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Message Batches API and batch parse check")
+    parser.add_argument("--serve", action="store_true", help="Only serve the stub (default: run the checks)")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--errored", nargs="*", default=[], help="Sections whose first submission errors")
+    parser.add_argument("--expired", nargs="*", default=[], help="Sections whose first submission expires")
+    parser.add_argument("--polls", type=int, default=2, help="Polls a batch stays in_progress")
+    parser.add_argument("--pages", default=DEFAULT_PAGES, help="Section pages for the checks (*.htm)")
+    args = parser.parse_args()
+
+    if args.serve:
+        state = BatchStubState(args.errored, args.expired, args.polls)
+        server = start_stub(state, port=args.port)
+        print(f"Stub Message Batches API on http://127.0.0.1:{server.server_port}")
+        print(f"  ANTHROPIC_BASE_URL=http://127.0.0.1:{server.server_port}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            print(f"\n{len(state.submitted)} batches, {state.retrieves} polls")
+        return 0
+
+    failures = run_checks(args.pages)
+    print(f"\n{'All checks pass' if not failures else f'{len(failures)} checks failed'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
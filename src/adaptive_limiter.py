@@ -0,0 +1,68 @@
+"""
+Adaptive API Concurrency
+AIMD concurrency gate shared by parser workers: halves on 429/529,
+grows back one slot at a time as calls succeed
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Statuses that mean "slow down" rather than "this request is bad"
+RETRYABLE_STATUS = {429, 529}
+
+
+class AdaptiveLimiter:
+    """Caps in-flight API calls and backs off when the API pushes back."""
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1, grow_after: int = 5):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = self.max_concurrency
+        self.grow_after = grow_after
+
+        self.in_flight = 0
+        self.successes = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the currently allowed concurrent slots."""
+        with self.cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < self.limit:
+                    break
+                self.cond.wait(timeout=wait if wait > 0 else None)
+            self.in_flight += 1
+
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.in_flight -= 1
+                self.cond.notify_all()
+
+    def success(self):
+        """Additive increase: one more slot after a run of successes."""
+        with self.cond:
+            self.successes += 1
+            if self.successes >= self.grow_after and self.limit < self.max_concurrency:
+                self.limit += 1
+                self.successes = 0
+                self.cond.notify_all()
+
+    def throttle(self, attempt: int, retry_after: float = None) -> float:
+        """Multiplicative decrease plus a shared pause; returns the pause in seconds."""
+        delay = retry_after if retry_after else min(60.0, 2 ** attempt) + random.uniform(0, 1)
+
+        with self.cond:
+            self.throttled += 1
+            self.successes = 0
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+        return delay
@@ -0,0 +1,153 @@
+"""
+Concurrent Fetch Engine
+Pooled keep-alive HTTP session with a global token-bucket rate limiter
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from urllib3.util.retry import Retry
+
+# Polite defaults for azleg.gov - a handful of connections, ~2 requests/sec overall
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 2
+DEFAULT_TIMEOUT = 30
+
+USER_AGENT = "BlueShieldAI-StatuteScraper/1.0 (+https://blueshield-ai.com)"
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker.
+
+    Tokens refill at `rate` per second up to `capacity`; each request takes one.
+    """
+
+    def __init__(self, rate: float, capacity: int = DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class BucketRetry(Retry):
+    """Retry that takes a bucket token before each re-sent request.
+
+    urllib3 re-sends inside the adapter, below Fetcher.get(), so without this
+    a burst of 429/5xx retries would bypass the rate limit.
+    """
+
+    limiter = None
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.limiter = self.limiter
+        return retry
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.limiter:
+            self.limiter.acquire()
+
+
+class Fetcher:
+    """Shared session + rate limiter + worker pool used by every scrape."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, rate: float = DEFAULT_RATE,
+                 timeout: int = DEFAULT_TIMEOUT):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.limiter = TokenBucket(rate, capacity=max(1, min(self.workers, DEFAULT_BURST)))
+
+        # One keep-alive pool sized to the worker count; retries honour Retry-After
+        # and wait for a token like any other request
+        retry = BucketRetry(
+            total=3,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "HEAD"],
+        )
+        retry.limiter = self.limiter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Rate-limited GET over the pooled session."""
+        self.limiter.acquire()
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def iter_completed(self, fn, items, desc: str = None, progress: bool = True):
+        """Run fn(item) on the worker pool, yielding (item, result) as each finishes."""
+        items = list(items)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(fn, item): item for item in items}
+            completed = as_completed(futures)
+            if progress:
+                completed = tqdm(completed, total=len(futures), desc=desc)
+            for future in completed:
+                yield futures[future], future.result()
+
+    def map(self, fn, items, desc: str = None, progress: bool = True) -> list:
+        """Run fn(item) on the worker pool and return results in input order."""
+        items = list(items)
+        results = [None] * len(items)
+
+        def run(pair):
+            return fn(pair[1])
+
+        for (i, _), result in self.iter_completed(run, enumerate(items), desc=desc, progress=progress):
+            results[i] = result
+
+        return results
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def default_fetcher() -> Fetcher:
+    """Process-wide Fetcher for callers that don't manage their own."""
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = Fetcher()
+        return _default_fetcher
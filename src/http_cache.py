@@ -0,0 +1,75 @@
+"""
+Conditional-GET HTTP Cache
+On-disk cache of scraped sections keyed by URL, revalidated with
+ETag / Last-Modified or, when the server sends neither, a content hash
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+FRESH = "fresh"              # Within max_age, no request made
+REVALIDATED = "revalidated"  # Server confirmed unchanged (304 or identical content hash)
+CHANGED = "changed"          # New or modified content, downloaded and parsed
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class HttpCache:
+    """One JSON file per URL holding validators plus the extracted section."""
+
+    def __init__(self, cache_dir, max_age: int = 0):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age
+        self.stats = {FRESH: 0, REVALIDATED: 0, CHANGED: 0}
+        self.lock = threading.Lock()
+
+    def _path(self, url: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(url.encode()).hexdigest()}.json"
+
+    def get(self, url: str):
+        """Return the cached entry for url, or None."""
+        try:
+            with open(self._path(url), 'r') as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        return entry if entry.get("url") == url else None
+
+    def put(self, url: str, entry: dict):
+        """Atomically write an entry (safe with concurrent workers)."""
+        entry = {**entry, "url": url, "checked_at": time.time()}
+        path = self._path(url)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+    def is_fresh(self, entry: dict) -> bool:
+        return self.max_age > 0 and time.time() - entry.get("checked_at", 0) < self.max_age
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> dict:
+        """If-None-Match / If-Modified-Since headers from stored validators."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record(self, status: str):
+        with self.lock:
+            self.stats[status] += 1
+
+    def summary(self) -> str:
+        return (f"{self.stats[FRESH]} fresh, {self.stats[REVALIDATED]} revalidated, "
+                f"{self.stats[CHANGED]} changed")
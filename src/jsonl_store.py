@@ -0,0 +1,133 @@
+"""
+Streaming JSONL Output
+Append-only record journal flushed per record, with resume and compaction
+into the indent=2 JSON files consumers read
+"""
+
+import json
+import os
+import textwrap
+import threading
+from pathlib import Path
+
+
+def journal_path(output_file) -> Path:
+    """data/raw_statutes.json -> data/raw_statutes.jsonl"""
+    return Path(output_file).with_suffix(".jsonl")
+
+
+class JsonlWriter:
+    """Thread-safe append-only writer; every record is flushed as it's written."""
+
+    def __init__(self, path, truncate: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'w' if truncate else 'a')
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def write(self, record: dict):
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_jsonl(path):
+    """Yield records from a journal, skipping a torn last line left by a crash."""
+    try:
+        f = open(path, 'r')
+    except FileNotFoundError:
+        return
+
+    with f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def load_jsonl(path, key: str = "section") -> dict:
+    """Journal records keyed by `key`; later records win."""
+    return {r[key]: r for r in iter_jsonl(path) if r.get(key)}
+
+
+def completed_keys(path, key: str = "section") -> set:
+    """Keys already in the journal without an error, for resuming a run."""
+    return {r[key] for r in iter_jsonl(path) if r.get(key) and "error" not in r}
+
+
+def iter_latest(jsonl_file, key: str = "section", order: list = None):
+    """Yield the latest record per key from a journal.
+
+    Records come in `order` (keys not in the journal are skipped), or in
+    first-seen order when no order is given. Only byte offsets are held in
+    memory; records are read back from the journal one at a time.
+    """
+    # Latest offset per key; dict order stays first-seen
+    latest = {}
+    with open(jsonl_file, 'rb') as f:
+        while True:
+            pos = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            try:
+                record_key = json.loads(line).get(key)
+            except json.JSONDecodeError:
+                continue
+            if record_key is not None:
+                latest[record_key] = pos
+
+        keys = [k for k in order if k in latest] if order is not None else list(latest)
+        for record_key in keys:
+            f.seek(latest[record_key])
+            yield json.loads(f.readline())
+
+
+def write_json_array(records, json_file) -> int:
+    """Stream records into an indent=2 JSON array, renamed into place when done."""
+    json_file = Path(json_file)
+    tmp = json_file.with_suffix(".json.tmp")
+    count = 0
+    with open(tmp, 'w') as out:
+        out.write("[")
+        for record in records:
+            # Same layout json.dump(records, indent=2) produces
+            out.write(",\n" if count else "\n")
+            out.write(textwrap.indent(json.dumps(record, indent=2), "  "))
+            count += 1
+        out.write("\n]" if count else "]")
+
+    os.replace(tmp, json_file)
+    return count
+
+
+def compact(jsonl_file, json_file, key: str = "section", order: list = None) -> int:
+    """Write the latest record per key from a journal as an indent=2 JSON array."""
+    return write_json_array(iter_latest(jsonl_file, key, order), json_file)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compact a JSONL journal into a JSON array")
+    parser.add_argument("journal", help="Input .jsonl file")
+    parser.add_argument("output", nargs="?", help="Output .json file (default: same name, .json)")
+
+    args = parser.parse_args()
+
+    output = args.output or Path(args.journal).with_suffix(".json")
+    count = compact(args.journal, output)
+    print(f"Compacted {count} records into {output}")
@@ -3,38 +3,55 @@ ARS Statute Parser
 Uses Claude to extract structured data from raw statute text
 """
 
+import hashlib
 import json
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from anthropic import Anthropic
+from anthropic import Anthropic, APIConnectionError, APIStatusError
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+from adaptive_limiter import AdaptiveLimiter, RETRYABLE_STATUS
+from jsonl_store import JsonlWriter, journal_path, load_jsonl, compact
+from statute_store import compact_store, store_path, iter_statutes, find_statute
+from segmenter import segment_statute, condense_for_model, rule_fields, SEGMENTER_VERSION
+
 load_dotenv()
 
-client = Anthropic()
+# Retries are handled by create_message so 429/529 feed the adaptive limiter
+client = Anthropic(max_retries=0)
 
-PARSE_PROMPT = """You are a legal expert parsing Arizona Revised Statutes for a law enforcement training application.
+PARSE_MODEL = "claude-sonnet-4-20250514"
+DEFAULT_CONCURRENCY = 4
+MAX_ATTEMPTS = 6
+# Retried with plain backoff (as the SDK did); 429/529 go through the limiter instead
+TRANSIENT_STATUS = {408, 409}
+BATCH_POLL_INTERVAL = 30
 
-Given the following statute text, extract structured information in JSON format.
+# Static instructions, sent as a cache_control system block so every statute
+# after the first reads them from the prompt cache. (Caching only engages once
+# the block reaches the model's minimum cacheable length.)
+PARSE_INSTRUCTIONS = """You are a legal expert parsing Arizona Revised Statutes for a law enforcement training application.
 
-STATUTE SECTION: {section}
-STATUTE TEXT:
-{text}
+Given the statute text in the user message, extract structured information in JSON format.
 
 Extract the following structure (respond ONLY with valid JSON, no other text):
 
-{{
-  "section": "{section}",
+{
+  "section": "The statute section number, e.g. 13-3883",
   "title": "Short descriptive title of the statute",
   "summary": "1-2 sentence plain English summary for patrol officers",
   "classification": "felony/misdemeanor/petty offense/varies (explain)",
 
   "elements": [
-    {{
+    {
       "element": "Description of required element",
       "explanation": "Plain English explanation for officers"
-    }}
+    }
   ],
 
   "mental_state": "Required mental state (intentionally, knowingly, recklessly, negligently, strict liability)",
@@ -47,17 +64,17 @@ Extract the following structure (respond ONLY with valid JSON, no other text):
     "List any MANDATORY actions officers must take (mandatory arrest, required notifications, etc.)"
   ],
 
-  "penalty": {{
+  "penalty": {
     "base": "Base classification",
     "enhancements": ["List any factors that enhance penalty"],
     "notes": "Any special sentencing notes"
-  }},
+  },
 
   "key_definitions": [
-    {{
+    {
       "term": "Defined term",
       "definition": "Legal definition from statute"
-    }}
+    }
   ],
 
   "common_mistakes": [
@@ -75,30 +92,123 @@ Extract the following structure (respond ONLY with valid JSON, no other text):
   "fourth_amendment_notes": "Any search/seizure considerations specific to this offense",
 
   "miranda_notes": "Any Miranda/custody considerations specific to this offense"
-}}
+}
 
 Be thorough but practical. Focus on what a patrol officer needs to know in the field.
 If a field doesn't apply to this statute, use null or empty array as appropriate.
 """
 
+# Per-statute user message - the only part that varies between requests
+PARSE_PROMPT = """STATUTE SECTION: {section}
+STATUTE TEXT:
+{text}"""
 
-def parse_statute(section: str, raw_text: str) -> dict:
-    """Use Claude to parse a statute into structured format."""
+# Changes whenever the prompt template changes, invalidating earlier parses
+PROMPT_VERSION = hashlib.sha256((PARSE_INSTRUCTIONS + PARSE_PROMPT).encode()).hexdigest()[:12]
+
+
+def statute_fingerprint(raw_text: str, model: str = PARSE_MODEL) -> str:
+    """Fingerprint of everything that determines a parse: text, prompt, segmenter and model.
+
+    Whitespace is normalized so re-scrapes that only reflow the page don't count as changes.
+    """
+    normalized = re.sub(r'\s+', ' ', raw_text).strip()
+    key = f"{PROMPT_VERSION}\n{SEGMENTER_VERSION}\n{model}\n{normalized}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+# Token usage across the current run, including prompt-cache reads/writes
+usage_totals = {
+    "input_tokens": 0,
+    "cache_read_input_tokens": 0,
+    "cache_creation_input_tokens": 0,
+    "output_tokens": 0,
+}
+_usage_lock = threading.Lock()
+
+
+def record_usage(usage):
+    """Add one response's usage metadata to usage_totals."""
+    if usage is None:
+        return
+    with _usage_lock:
+        for key in usage_totals:
+            usage_totals[key] += getattr(usage, key, 0) or 0
+
+
+def load_previous_results(output_file: str) -> dict:
+    """Load an earlier parsed_statutes.json keyed by section (empty if missing)."""
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            messages=[
-                {
-                    "role": "user",
-                    "content": PARSE_PROMPT.format(section=section, text=raw_text)
-                }
-            ]
-        )
+        with open(output_file, 'r') as f:
+            return {r['section']: r for r in json.load(f) if r.get('section')}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _retry_after(error: APIStatusError):
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError, AttributeError):
+        return None
 
-        # Extract JSON from response
-        content = response.content[0].text
 
+def create_message(limiter: AdaptiveLimiter = None, **params):
+    """Call the Messages API through the limiter, backing off on 429/529.
+
+    Timeouts, connection errors, 408/409 and other 5xx are retried with
+    exponential backoff, like the SDK's own retries, without throttling.
+    """
+    limiter = limiter or AdaptiveLimiter(1)
+
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with limiter.slot():
+                response = client.messages.create(**params)
+            limiter.success()
+            return response
+
+        except APIStatusError as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            if e.status_code in RETRYABLE_STATUS:
+                limiter.throttle(attempt, _retry_after(e))
+            elif e.status_code in TRANSIENT_STATUS or e.status_code >= 500:
+                # Server hiccup, not back-pressure: retry without cutting concurrency
+                time.sleep(min(30, 2 ** attempt))
+            else:
+                raise
+
+        except APIConnectionError:     # includes APITimeoutError
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(min(30, 2 ** attempt))
+
+
+def build_parse_request(section: str, raw_text: str) -> dict:
+    """Messages API parameters for parsing one statute (shared by sync and batch modes).
+
+    Long definition-heavy statutes are condensed first; their definitions come
+    from the segmenter instead (see merge_rule_fields).
+    """
+    text = condense_for_model(raw_text, segment_statute(raw_text))
+    return {
+        "model": PARSE_MODEL,
+        "max_tokens": 4096,
+        "system": [
+            {"type": "text", "text": PARSE_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}}
+        ],
+        "messages": [
+            {
+                "role": "user",
+                "content": PARSE_PROMPT.format(section=section, text=text)
+            }
+        ]
+    }
+
+
+def extract_parsed(section: str, content: str) -> dict:
+    """Turn Claude's reply text into a parsed record with _parse_status."""
+    try:
         # Try to parse as JSON
         # Handle case where Claude might wrap in ```json blocks
         if "```json" in content:
@@ -107,6 +217,7 @@ def parse_statute(section: str, raw_text: str) -> dict:
             content = content.split("```")[1].split("```")[0]
 
         parsed = json.loads(content.strip())
+        parsed["section"] = section  # Keep the key stable for incremental runs
         parsed["_parse_status"] = "success"
         return parsed
 
@@ -115,8 +226,49 @@ def parse_statute(section: str, raw_text: str) -> dict:
             "section": section,
             "_parse_status": "json_error",
             "_error": str(e),
-            "_raw_response": content if 'content' in dir() else None
+            "_raw_response": content
         }
+
+
+def merge_rule_fields(parsed: dict, raw_text: str) -> dict:
+    """Fill a successful parse with the fields the segmenter extracts deterministically.
+
+    - related_statutes: model list plus every 13-xxxx section cited in the text
+    - key_definitions: rule definitions when the model was sent condensed text
+      (it never saw the bodies) or returned none
+    - classification: first penalty class found, when the model left it empty
+    """
+    if parsed.get("_parse_status") != "success":
+        return parsed
+
+    segments = segment_statute(raw_text)
+    rules = rule_fields(segments)
+
+    related = list(parsed.get("related_statutes") or [])
+    cited = {str(r).split()[0] for r in related if r}
+    related.extend(ref for ref in rules["related_statutes"] if ref not in cited)
+    parsed["related_statutes"] = related
+
+    condensed = condense_for_model(raw_text, segments) != raw_text
+    if rules["key_definitions"] and (condensed or not parsed.get("key_definitions")):
+        parsed["key_definitions"] = rules["key_definitions"]
+
+    if not parsed.get("classification") and rules["classifications"]:
+        parsed["classification"] = rules["classifications"][0]
+
+    return parsed
+
+
+def parse_statute(section: str, raw_text: str, limiter: AdaptiveLimiter = None) -> dict:
+    """Use Claude to parse a statute into structured format."""
+    try:
+        response = create_message(limiter, **build_parse_request(section, raw_text))
+        record_usage(response.usage)
+
+        # Extract JSON from response
+        parsed = extract_parsed(section, response.content[0].text)
+        return merge_rule_fields(parsed, raw_text)
+
     except Exception as e:
         return {
             "section": section,
@@ -125,52 +277,206 @@ def parse_statute(section: str, raw_text: str) -> dict:
         }
 
 
-def parse_all_statutes(input_file: str, output_file: str):
-    """Parse all scraped statutes."""
-    with open(input_file, 'r') as f:
-        raw_statutes = json.load(f)
-
-    parsed_results = []
+def parse_batch(pending: list, state_file: Path, poll_interval: int = BATCH_POLL_INTERVAL) -> dict:
+    """Parse statutes through the Message Batches API.
 
-    print(f"Parsing {len(raw_statutes)} statutes with Claude...")
+    `pending` is a list of (section, raw_text, fingerprint). Returns parsed
+    records keyed by section. The batch id is saved to `state_file` so a run
+    killed while polling resumes the same batch instead of resubmitting.
+    """
+    wanted = {section: fingerprint for section, _, fingerprint in pending}
+    texts = {section: raw_text for section, raw_text, _ in pending}
 
-    for statute in tqdm(raw_statutes):
-        if "error" in statute:
-            print(f"  Skipping {statute['section']} (scrape error)")
-            continue
-
-        if "raw_text" not in statute:
-            print(f"  Skipping {statute['section']} (no text)")
+    state = None
+    if state_file.exists():
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+        print(f"  Resuming batch {state['batch_id']}")
+    else:
+        # custom_id only allows [a-zA-Z0-9_-], so map positional ids back to sections
+        requests = {f"s{i}": (section, raw_text, fingerprint)
+                    for i, (section, raw_text, fingerprint) in enumerate(pending)}
+        batch = client.messages.batches.create(requests=[
+            {"custom_id": custom_id, "params": build_parse_request(section, raw_text)}
+            for custom_id, (section, raw_text, _) in requests.items()
+        ])
+        state = {
+            "batch_id": batch.id,
+            "requests": {custom_id: [section, fp] for custom_id, (section, _, fp) in requests.items()}
+        }
+        with open(state_file, 'w') as f:
+            json.dump(state, f)
+        print(f"  Submitted batch {batch.id} ({len(requests)} requests)")
+
+    batch = client.messages.batches.retrieve(state['batch_id'])
+    while batch.processing_status != "ended":
+        counts = batch.request_counts
+        print(f"  Batch {batch.id}: {counts.processing} processing, {counts.succeeded} succeeded, "
+              f"{counts.errored} errored")
+        time.sleep(poll_interval)
+        batch = client.messages.batches.retrieve(batch.id)
+
+    results = {}
+    for entry in client.messages.batches.results(batch.id):
+        section, fingerprint = state['requests'].get(entry.custom_id, (None, None))
+
+        # Ignore results for statutes that changed since a resumed batch was submitted
+        if section is None or wanted.get(section) != fingerprint:
             continue
 
-        parsed = parse_statute(statute['section'], statute['raw_text'])
+        if entry.result.type == "succeeded":
+            record_usage(entry.result.message.usage)
+            parsed = extract_parsed(section, entry.result.message.content[0].text)
+            parsed = merge_rule_fields(parsed, texts[section])
+        else:
+            error = getattr(entry.result, "error", None)
+            parsed = {
+                "section": section,
+                "_parse_status": "error",
+                "_error": f"batch request {entry.result.type}" + (f": {error}" if error else "")
+            }
+
+        results[section] = parsed
+
+    state_file.unlink(missing_ok=True)
+    return results
+
+
+def parse_all_statutes(input_file: str, output_file: str, force: bool = False,
+                       concurrency: int = DEFAULT_CONCURRENCY, batch: bool = False,
+                       poll_interval: int = BATCH_POLL_INTERVAL) -> Path:
+    """Parse all scraped statutes. Returns the output file.
+
+    Sections whose fingerprint matches a successful record in the existing
+    output (or the journal of an interrupted run) are carried forward; only
+    new or changed sections go to Claude, on up to `concurrency` workers or,
+    with `batch`, as one Message Batch. Every record is appended to
+    <output>.jsonl as it finishes and the journal is compacted into the
+    output JSON and its .db store at the end. The input is streamed from its
+    store when one is present.
+    """
+
+    journal = journal_path(output_file)
+    if force:
+        previous = {}
+    else:
+        previous = load_previous_results(output_file)
+        previous.update(load_jsonl(journal))
+
+    pending = []
+    order = []
+    statuses = {}
+    for key in usage_totals:
+        usage_totals[key] = 0
+
+    print(f"Parsing statutes from {input_file} with Claude...")
+
+    # Previous records are in memory now; the fresh journal for this run is
+    # written beside the old one and only replaces it once carry-forward is done,
+    # so a failure here leaves the previous journal as it was
+    fresh = journal.with_suffix(".jsonl.new")
+
+    def save(parsed):
+        writer.write(parsed)
+        statuses[parsed['section']] = parsed.get('_parse_status')
+
+    with JsonlWriter(fresh, truncate=True) as writer:
+        for statute in iter_statutes(input_file):
+            if "error" in statute:
+                print(f"  Skipping {statute['section']} (scrape error)")
+                continue
+
+            if "raw_text" not in statute:
+                print(f"  Skipping {statute['section']} (no text)")
+                continue
+
+            order.append(statute['section'])
+            fingerprint = statute_fingerprint(statute['raw_text'])
+            prior = previous.get(statute['section'])
+
+            if prior and prior.get('_fingerprint') == fingerprint and prior.get('_parse_status') == 'success':
+                parsed = dict(prior)
+                parsed['url'] = statute.get('url')
+                parsed['scraped_at'] = statute.get('scraped_at')
+                save(parsed)
+            else:
+                pending.append((statute, fingerprint))
+
+    os.replace(fresh, journal)
+
+    previous.clear()
+    reused = len(statuses)
+    limiter = AdaptiveLimiter(concurrency)
+
+    def finish(parsed, statute, fingerprint):
+        parsed['_fingerprint'] = fingerprint
         parsed['url'] = statute.get('url')
         parsed['scraped_at'] = statute.get('scraped_at')
+        return parsed
+
+    with JsonlWriter(journal) as writer:
+        if pending and batch:
+            print(f"  {reused} unchanged, {len(pending)} to parse (Message Batches API)")
+
+            batch_results = parse_batch(
+                [(statute['section'], statute['raw_text'], fp) for statute, fp in pending],
+                Path(f"{output_file}.batch.json"),
+                poll_interval
+            )
+
+            for statute, fingerprint in pending:
+                parsed = batch_results.get(statute['section'], {
+                    "section": statute['section'],
+                    "_parse_status": "error",
+                    "_error": "missing from batch results"
+                })
+                save(finish(parsed, statute, fingerprint))
+
+        elif pending:
+            print(f"  {reused} unchanged, {len(pending)} to parse ({concurrency} workers)")
+
+            def parse(statute, fingerprint):
+                parsed = parse_statute(statute['section'], statute['raw_text'], limiter)
+                return finish(parsed, statute, fingerprint)
+
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                futures = [pool.submit(parse, statute, fp) for statute, fp in pending]
 
-        parsed_results.append(parsed)
+                # Stream each result so progress survives a crash
+                for future in tqdm(as_completed(futures), total=len(futures)):
+                    save(future.result())
 
     # Save parsed results
-    with open(output_file, 'w') as f:
-        json.dump(parsed_results, f, indent=2)
+    compact(journal, output_file, order=order)
+    compact_store(journal, store_path(output_file), order=order)
 
     # Summary
-    success = len([r for r in parsed_results if r.get('_parse_status') == 'success'])
-    errors = len([r for r in parsed_results if r.get('_parse_status') != 'success'])
+    success = len([s for s in statuses.values() if s == 'success'])
+    errors = len(statuses) - success
 
     print(f"\nParsing complete:")
     print(f"  Success: {success}")
     print(f"  Errors: {errors}")
+    print(f"  Unchanged (reused): {reused}")
+    print(f"  Sent to Claude: {len(pending)}")
+    print(f"  Tokens: {usage_totals['input_tokens']} input, "
+          f"{usage_totals['cache_read_input_tokens']} cache read, "
+          f"{usage_totals['cache_creation_input_tokens']} cache write, "
+          f"{usage_totals['output_tokens']} output")
+    if limiter.throttled:
+        print(f"  Rate-limited retries: {limiter.throttled} (settled at {limiter.limit} workers)")
     print(f"  Output: {output_file}")
 
-    return parsed_results
+    return Path(output_file)
 
 
 def parse_single_statute(section: str, input_file: str = "data/raw_statutes.json"):
-    """Parse a single statute for testing."""
-    with open(input_file, 'r') as f:
-        raw_statutes = json.load(f)
+    """Parse a single statute for testing.
 
-    statute = next((s for s in raw_statutes if s['section'] == section), None)
+    Looked up by key in the input's .db store when there is one, so the
+    cost doesn't grow with the corpus; otherwise the JSON file is scanned.
+    """
+    statute = find_statute(section, input_file)
 
     if not statute:
         print(f"Section {section} not found in {input_file}")
@@ -194,10 +500,15 @@ if __name__ == "__main__":
     parser.add_argument("--input", default="data/raw_statutes.json", help="Input file from scraper")
     parser.add_argument("--output", default="data/parsed_statutes.json", help="Output file")
     parser.add_argument("--single", help="Parse single section (e.g., 13-3883)")
+    parser.add_argument("--force", action="store_true", help="Re-parse every statute, ignoring earlier results")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel Claude requests")
+    parser.add_argument("--batch", action="store_true", help="Submit pending statutes via the Message Batches API (cheaper, slower)")
+    parser.add_argument("--poll-interval", type=int, default=BATCH_POLL_INTERVAL, help="Seconds between batch status checks")
 
     args = parser.parse_args()
 
     if args.single:
         parse_single_statute(args.single, args.input)
     else:
-        parse_all_statutes(args.input, args.output)
+        parse_all_statutes(args.input, args.output, force=args.force, concurrency=args.concurrency,
+                           batch=args.batch, poll_interval=args.poll_interval)
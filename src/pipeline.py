@@ -0,0 +1,189 @@
+"""
+Streaming Scrape -> Parse Pipeline
+Fetch workers push each scraped statute into a bounded queue that parser
+workers drain immediately, so network time and API time overlap
+"""
+
+import queue
+import threading
+import time
+from pathlib import Path
+
+from tqdm import tqdm
+
+from adaptive_limiter import AdaptiveLimiter
+from fetcher import Fetcher, DEFAULT_WORKERS, DEFAULT_RATE
+from jsonl_store import JsonlWriter, journal_path, load_jsonl, compact
+from statute_store import compact_store, store_path
+from parser import (parse_statute, statute_fingerprint, load_previous_results,
+                    usage_totals, DEFAULT_CONCURRENCY)
+from scraper import scrape_section, section_url, open_cache, DEFAULT_RAW_HTML
+
+DEFAULT_QUEUE_SIZE = 8
+
+_DONE = object()
+
+
+class StageMetrics:
+    """Per-stage counters; `blocked` is time spent waiting on the queue."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.started = None
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def record(self, busy: float, blocked: float = 0.0, error: bool = False):
+        now = time.monotonic()
+        with self.lock:
+            self.count += 1
+            self.errors += int(error)
+            self.busy += busy
+            self.blocked += blocked
+            if self.started is None:
+                self.started = now - busy
+            self.finished = now
+
+    def add_blocked(self, seconds: float):
+        with self.lock:
+            self.blocked += seconds
+
+    @property
+    def active(self) -> float:
+        """Wall time between the stage's first and last item."""
+        if self.started is None:
+            return 0.0
+        return self.finished - self.started
+
+    def summary(self) -> str:
+        rate = self.count / self.active if self.active else 0.0
+        return (f"{self.name:<7} {self.count:>4} items  {self.errors:>3} errors  "
+                f"active {self.active:6.1f}s  busy {self.busy:7.1f}s  "
+                f"blocked {self.blocked:6.1f}s  {rate:5.2f}/s")
+
+
+def run_streaming_pipeline(sections: list, raw_file, parsed_file,
+                           workers: int = DEFAULT_WORKERS, rate: float = DEFAULT_RATE,
+                           concurrency: int = DEFAULT_CONCURRENCY,
+                           queue_size: int = DEFAULT_QUEUE_SIZE,
+                           use_cache: bool = True, force: bool = False,
+                           raw_html: str = DEFAULT_RAW_HTML) -> dict:
+    """Scrape and parse `sections` as one overlapped stage graph.
+
+    fetch workers --(bounded queue)--> parser workers
+
+    A full queue blocks the fetch workers (backpressure), so scraping never
+    runs more than `queue_size` statutes ahead of parsing. Unchanged
+    statutes are carried forward without entering the queue. Both stages
+    stream to their JSONL journals, which are compacted into raw_file and
+    parsed_file (and their section-keyed .db stores) at the end. Returns the
+    stage metrics.
+    """
+    raw_file, parsed_file = Path(raw_file), Path(parsed_file)
+    raw_file.parent.mkdir(parents=True, exist_ok=True)
+    cache = open_cache(raw_file.parent, use_cache, max_age=0)
+
+    previous = {}
+    if not force:
+        previous = load_previous_results(parsed_file)
+        previous.update(load_jsonl(journal_path(parsed_file)))
+
+    work = queue.Queue(maxsize=max(1, queue_size))
+    limiter = AdaptiveLimiter(concurrency)
+    scrape_stage = StageMetrics("scrape")
+    parse_stage = StageMetrics("parse")
+    reused = []
+    progress = tqdm(total=len(sections), desc="pipeline")
+
+    def finish(parsed, statute, fingerprint):
+        parsed['_fingerprint'] = fingerprint
+        parsed['url'] = statute.get('url')
+        parsed['scraped_at'] = statute.get('scraped_at')
+        parsed_writer.write(parsed)
+        progress.update()
+
+    def scrape(section):
+        start = time.monotonic()
+        url = section_url(section)
+        statute = {"section": section, "url": url, **scrape_section(url, fetcher, cache, raw_html)}
+        raw_writer.write(statute)
+        busy = time.monotonic() - start
+
+        if "error" in statute or "raw_text" not in statute:
+            scrape_stage.record(busy, error=True)
+            progress.update()
+            return
+
+        fingerprint = statute_fingerprint(statute['raw_text'])
+        prior = previous.get(section)
+        if prior and prior.get('_fingerprint') == fingerprint and prior.get('_parse_status') == 'success':
+            scrape_stage.record(busy)
+            reused.append(section)
+            finish(dict(prior), statute, fingerprint)
+            return
+
+        # Blocks while parsers are behind - this is the backpressure
+        wait = time.monotonic()
+        work.put((statute, fingerprint))
+        scrape_stage.record(busy, blocked=time.monotonic() - wait)
+
+    def parse_worker():
+        while True:
+            wait = time.monotonic()
+            item = work.get()
+            parse_stage.add_blocked(time.monotonic() - wait)
+            if item is _DONE:
+                return
+
+            statute, fingerprint = item
+            start = time.monotonic()
+            parsed = parse_statute(statute['section'], statute['raw_text'], limiter)
+            parse_stage.record(time.monotonic() - start, error=parsed.get('_parse_status') != 'success')
+            finish(parsed, statute, fingerprint)
+
+    for key in usage_totals:
+        usage_totals[key] = 0
+
+    started = time.monotonic()
+    with JsonlWriter(journal_path(raw_file), truncate=True) as raw_writer, \
+            JsonlWriter(journal_path(parsed_file), truncate=True) as parsed_writer:
+        parsers = [threading.Thread(target=parse_worker, daemon=True) for _ in range(max(1, concurrency))]
+        for t in parsers:
+            t.start()
+
+        # Parsers are always stopped, even when the fetch stage raises
+        # (Ctrl-C included), so the journals are closed after their last write
+        try:
+            with Fetcher(workers=workers, rate=rate) as fetcher:
+                fetcher.map(scrape, sections, progress=False)
+        finally:
+            for _ in parsers:
+                work.put(_DONE)
+            for t in parsers:
+                t.join()
+
+    progress.close()
+    wall = time.monotonic() - started
+
+    # Final merged output
+    for output_file in (raw_file, parsed_file):
+        compact(journal_path(output_file), output_file, order=sections)
+        compact_store(journal_path(output_file), store_path(output_file), order=sections)
+
+    print(f"\nPipeline finished in {wall:.1f}s")
+    print(f"  {scrape_stage.summary()}")
+    print(f"  {parse_stage.summary()}")
+    print(f"  Unchanged (reused): {len(reused)}")
+    if cache:
+        print(f"  Cache: {cache.summary()}")
+    print(f"  Tokens: {usage_totals['input_tokens']} input, "
+          f"{usage_totals['cache_read_input_tokens']} cache read, "
+          f"{usage_totals['cache_creation_input_tokens']} cache write, "
+          f"{usage_totals['output_tokens']} output")
+    print(f"  Output: {raw_file}, {parsed_file}")
+
+    return {"wall": wall, "scrape": scrape_stage, "parse": parse_stage}
@@ -3,17 +3,38 @@ ARS Title 13 Web Scraper
 Scrapes Arizona Revised Statutes from azleg.gov
 """
 
-import requests
-from bs4 import BeautifulSoup
-import json
+from bs4 import BeautifulSoup, SoupStrainer
+import base64
+import gzip
+import importlib.util
 import time
 import re
 from pathlib import Path
-from tqdm import tqdm
+
+from fetcher import Fetcher, default_fetcher, DEFAULT_WORKERS, DEFAULT_RATE
+from http_cache import HttpCache, content_hash, FRESH, REVALIDATED, CHANGED
+from jsonl_store import JsonlWriter, journal_path, completed_keys, compact
+from statute_store import compact_store, store_path
+
+# lxml is optional: C-backed and several times faster than html.parser
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
 
 BASE_URL = "https://www.azleg.gov"
 TITLE_13_INDEX = f"{BASE_URL}/arsDetail/?title=13"
 
+
+def is_statute_class(value) -> bool:
+    """Whether a class attribute includes statuteText, alone or with other classes."""
+    return bool(value) and 'statuteText' in value.split()
+
+
+# Only the statute body is parsed into a tree
+STATUTE_STRAINER = SoupStrainer('div', class_=is_statute_class)
+
+# How section HTML is stored in the output: gzip (base64 raw_html_gz), plain (raw_html), none
+RAW_HTML_MODES = ("gzip", "plain", "none")
+DEFAULT_RAW_HTML = "gzip"
+
 # Priority statutes for MVP (patrol-focused)
 PRIORITY_SECTIONS = [
     # Critical - Arrest & Procedure
@@ -81,10 +102,22 @@ PRIORITY_SECTIONS = [
 ]
 
 
-def get_title_index():
+def section_url(section: str) -> str:
+    """Convert a section number to its azleg.gov URL.
+
+    13-3883 -> /ars/13/03883.htm, 13-401 -> /ars/13/00401.htm
+    """
+    section_num = section.split("-")[1]
+    padded_num = section_num.zfill(5)
+    return f"{BASE_URL}/ars/13/{padded_num}.htm"
+
+
+def get_title_index(fetcher: Fetcher = None):
     """Fetch the Title 13 index page and extract all section links."""
+    fetcher = fetcher or default_fetcher()
+
     print("Fetching Title 13 index...")
-    response = requests.get(TITLE_13_INDEX)
+    response = fetcher.get(TITLE_13_INDEX)
     response.raise_for_status()
 
     soup = BeautifulSoup(response.text, 'html.parser')
@@ -114,111 +147,227 @@ def get_title_index():
     return sections
 
 
-def scrape_section(url: str) -> dict:
-    """Scrape a single statute section."""
+def extract_section(html: str, source: str = "") -> dict:
+    """Extract statute text from a section page, or None if no content.
+
+    Only the statuteText container is built into a tree (SoupStrainer), using
+    lxml when it's installed; pages without that container fall back to a
+    full parse of <body>, which is logged since it takes in navigation and
+    footer text.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=STATUTE_STRAINER)
+
+    # Extract the main content
+    content_div = soup.find('div', class_=is_statute_class)
+    if content_div is None:
+        print(f"Warning: no statuteText container in {source or 'page'}, using <body>")
+        content_div = BeautifulSoup(html, HTML_PARSER).find('body')
+
+    if content_div:
+        # Get raw text
+        raw_text = content_div.get_text(separator='\n', strip=True)
+
+        # Get HTML for structure preservation (kept gzipped, see store_raw_html)
+        return {
+            "raw_text": raw_text,
+            "raw_html_gz": compress_html(str(content_div)),
+            "scraped_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    return None
+
+
+def compress_html(html: str) -> str:
+    return base64.b64encode(gzip.compress(html.encode(), mtime=0)).decode()
+
+
+def decode_raw_html(record: dict):
+    """The section's HTML from either storage form, or None if it wasn't kept."""
+    if record.get("raw_html") is not None:
+        return record["raw_html"]
+    if record.get("raw_html_gz"):
+        return gzip.decompress(base64.b64decode(record["raw_html_gz"])).decode()
+    return None
+
+
+def store_raw_html(result: dict, mode: str = DEFAULT_RAW_HTML) -> dict:
+    """Return result with its HTML as `raw_html_gz` (gzip), `raw_html` (plain) or dropped (none)."""
+    if mode == "gzip" and "raw_html" not in result:
+        return result
+
+    result = dict(result)
+    html = decode_raw_html(result) if mode != "none" else None
+    result.pop("raw_html", None)
+    result.pop("raw_html_gz", None)
+
+    if html is not None:
+        if mode == "plain":
+            result["raw_html"] = html
+        elif mode == "gzip":
+            result["raw_html_gz"] = compress_html(html)
+
+    return result
+
+
+def scrape_section(url: str, fetcher: Fetcher = None, cache: HttpCache = None,
+                   raw_html: str = DEFAULT_RAW_HTML) -> dict:
+    """Scrape a single statute section.
+
+    With a cache, sends a conditional GET and reuses the stored extraction
+    when the server answers 304 or the body hashes the same as last time.
+    `raw_html` picks how the section HTML is kept: gzip, plain or none.
+    """
+    fetcher = fetcher or default_fetcher()
+    entry = cache.get(url) if cache else None
+
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
+        if entry and cache.is_fresh(entry):
+            cache.record(FRESH)
+            return store_raw_html(entry["result"], raw_html)
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        headers = HttpCache.conditional_headers(entry) if entry else {}
+        response = fetcher.get(url, headers=headers)
 
-        # Extract the main content
-        content_div = soup.find('div', class_='statuteText') or soup.find('body')
+        validators = {
+            "etag": response.headers.get("ETag") or (entry or {}).get("etag"),
+            "last_modified": response.headers.get("Last-Modified") or (entry or {}).get("last_modified"),
+        }
 
-        if content_div:
-            # Get raw text
-            raw_text = content_div.get_text(separator='\n', strip=True)
+        if entry and response.status_code == 304:
+            cache.put(url, {**entry, **validators})
+            cache.record(REVALIDATED)
+            return store_raw_html(entry["result"], raw_html)
 
-            # Get HTML for structure preservation
-            raw_html = str(content_div)
+        response.raise_for_status()
 
-            return {
-                "raw_text": raw_text,
-                "raw_html": raw_html,
-                "scraped_at": time.strftime("%Y-%m-%d %H:%M:%S")
-            }
+        # No validators (or server ignored them) - fall back to comparing bodies
+        body_hash = content_hash(response.content)
+        if entry and entry.get("content_hash") == body_hash:
+            cache.put(url, {**entry, **validators})
+            cache.record(REVALIDATED)
+            return store_raw_html(entry["result"], raw_html)
+
+        result = extract_section(response.text, url)
+        if result is None:
+            return {"error": "No content found", "url": url}
+
+        if cache:
+            cache.put(url, {**validators, "content_hash": body_hash, "result": result})
+            cache.record(CHANGED)
 
-        return {"error": "No content found", "url": url}
+        return store_raw_html(result, raw_html)
 
     except Exception as e:
         return {"error": str(e), "url": url}
 
 
-def scrape_priority_statutes(output_dir: str = "data"):
-    """Scrape only the priority statutes for MVP."""
-    output_path = Path(output_dir)
-    output_path.mkdir(exist_ok=True)
+def open_cache(output_path: Path, use_cache: bool, max_age: int):
+    """HTTP cache stored alongside the scraper output, or None if disabled."""
+    return HttpCache(output_path / "http_cache", max_age=max_age) if use_cache else None
 
-    results = []
 
-    print(f"Scraping {len(PRIORITY_SECTIONS)} priority statutes...")
+def scrape_to_file(fetcher: Fetcher, scrape, items: list, keys: list, output_file: Path,
+                   resume: bool = False) -> list:
+    """Scrape items concurrently, streaming each record to a JSONL journal.
 
-    for section in tqdm(PRIORITY_SECTIONS):
-        # Convert section number to URL format
-        # 13-3883 -> 03883, 13-401 -> 00401
-        section_num = section.split("-")[1]
-        padded_num = section_num.zfill(5)
-        url = f"{BASE_URL}/ars/13/{padded_num}.htm"
+    Records are flushed to <output>.jsonl as they finish, so a crash loses
+    nothing already scraped; with `resume`, sections already in the journal
+    are skipped. The journal is then compacted into output_file in `keys`
+    order, and into the section-keyed store beside it. Returns the records
+    that had errors.
+    """
+    journal = journal_path(output_file)
+    done = completed_keys(journal) if resume else set()
+    todo = [item for item, key in zip(items, keys) if key not in done]
 
-        content = scrape_section(url)
+    if done:
+        print(f"Resuming: {len(done)} already scraped, {len(todo)} remaining")
 
-        result = {
-            "section": section,
-            "url": url,
-            **content
-        }
-        results.append(result)
+    errors = []
+    with JsonlWriter(journal, truncate=not resume) as writer:
+        for _, record in fetcher.iter_completed(scrape, todo):
+            writer.write(record)
+            if "error" in record:
+                errors.append({"section": record["section"], "error": record["error"]})
 
-        # Rate limiting
-        time.sleep(0.5)
+    count = compact(journal, output_file, order=keys)
+    compact_store(journal, store_path(output_file), order=keys)
+    print(f"Saved {count} statutes to {output_file} and {store_path(output_file).name}")
 
-    # Save raw scraped data
-    output_file = output_path / "raw_statutes.json"
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    return errors
 
-    print(f"Saved {len(results)} statutes to {output_file}")
 
-    # Report any errors
-    errors = [r for r in results if "error" in r]
+def report_errors(errors: list):
     if errors:
         print(f"\nWarning: {len(errors)} sections had errors:")
         for e in errors:
             print(f"  - {e['section']}: {e['error']}")
 
-    return results
 
-
-def scrape_all_title_13(output_dir: str = "data"):
-    """Scrape all of Title 13 (comprehensive)."""
+def scrape_priority_statutes(output_dir: str = "data", workers: int = DEFAULT_WORKERS,
+                             rate: float = DEFAULT_RATE, use_cache: bool = True, max_age: int = 0,
+                             resume: bool = False, raw_html: str = DEFAULT_RAW_HTML) -> Path:
+    """Scrape only the priority statutes for MVP. Returns the output file."""
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
+    cache = open_cache(output_path, use_cache, max_age)
+
+    print(f"Scraping {len(PRIORITY_SECTIONS)} priority statutes "
+          f"({workers} workers, {rate} req/s)...")
+
+    def scrape(section):
+        url = section_url(section)
+        return {
+            "section": section,
+            "url": url,
+            **scrape_section(url, fetcher, cache, raw_html)
+        }
+
+    # Save raw scraped data
+    output_file = output_path / "raw_statutes.json"
+    with Fetcher(workers=workers, rate=rate) as fetcher:
+        errors = scrape_to_file(fetcher, scrape, PRIORITY_SECTIONS, PRIORITY_SECTIONS,
+                                output_file, resume)
 
-    # Get index of all sections
-    sections = get_title_index()
-    print(f"Found {len(sections)} sections in Title 13")
+    if cache:
+        print(f"Cache: {cache.summary()}")
 
-    results = []
+    # Report any errors
+    report_errors(errors)
 
-    for section_info in tqdm(sections):
-        content = scrape_section(section_info['url'])
+    return output_file
 
-        result = {
-            **section_info,
-            **content
-        }
-        results.append(result)
 
-        # Rate limiting
-        time.sleep(0.5)
+def scrape_all_title_13(output_dir: str = "data", workers: int = DEFAULT_WORKERS,
+                        rate: float = DEFAULT_RATE, use_cache: bool = True, max_age: int = 0,
+                        resume: bool = False, raw_html: str = DEFAULT_RAW_HTML) -> Path:
+    """Scrape all of Title 13 (comprehensive). Returns the output file."""
+    output_path = Path(output_dir)
+    output_path.mkdir(exist_ok=True)
+    cache = open_cache(output_path, use_cache, max_age)
 
-    # Save
     output_file = output_path / "all_title_13.json"
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    with Fetcher(workers=workers, rate=rate) as fetcher:
+        # Get index of all sections
+        sections = get_title_index(fetcher)
+        print(f"Found {len(sections)} sections in Title 13 "
+              f"({workers} workers, {rate} req/s)")
+
+        def scrape(section_info):
+            return {
+                **section_info,
+                **scrape_section(section_info['url'], fetcher, cache, raw_html)
+            }
 
-    print(f"Saved {len(results)} statutes to {output_file}")
-    return results
+        errors = scrape_to_file(fetcher, scrape, sections, [s['section'] for s in sections],
+                                output_file, resume)
+
+    if cache:
+        print(f"Cache: {cache.summary()}")
+
+    report_errors(errors)
+
+    return output_file
 
 
 if __name__ == "__main__":
@@ -227,10 +376,20 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Scrape ARS Title 13")
     parser.add_argument("--all", action="store_true", help="Scrape all of Title 13 (not just priority)")
     parser.add_argument("--output", default="data", help="Output directory")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent fetches")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Max requests per second to azleg.gov")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the HTTP cache and re-download everything")
+    parser.add_argument("--max-age", type=int, default=0, help="Seconds a cached section is trusted without revalidating")
+    parser.add_argument("--resume", action="store_true", help="Skip sections already in the .jsonl journal from an interrupted run")
+    parser.add_argument("--raw-html", choices=RAW_HTML_MODES, default=DEFAULT_RAW_HTML,
+                        help="Store section HTML gzipped (default), plain, or not at all")
 
     args = parser.parse_args()
 
+    options = dict(workers=args.workers, rate=args.rate, use_cache=not args.no_cache,
+                   max_age=args.max_age, resume=args.resume, raw_html=args.raw_html)
+
     if args.all:
-        scrape_all_title_13(args.output)
+        scrape_all_title_13(args.output, **options)
     else:
-        scrape_priority_statutes(args.output)
+        scrape_priority_statutes(args.output, **options)
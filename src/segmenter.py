@@ -0,0 +1,228 @@
+"""
+ARS Statute Segmenter
+Deterministic, local split of raw statute text into its A. / 1. / (a)
+hierarchy, definition lists, penalty clauses and cross-references
+"""
+
+import re
+
+# Bump when segmentation or condensing changes what the model is sent
+SEGMENTER_VERSION = "1"
+
+# Above this many characters, definition bodies are replaced by a term list
+MAX_MODEL_CHARS = 12000
+
+# Rule-extracted definitions (with their nested items) are capped at this length
+MAX_DEFINITION_CHARS = 1500
+
+# Subsection markers at the start of a line, outermost first
+MARKERS = [
+    (1, re.compile(r'^([A-Z])\.\s+')),
+    (2, re.compile(r'^(\d{1,3})\.\s+')),
+    (3, re.compile(r'^\(([a-z])\)\s+')),
+    (4, re.compile(r'^\(([ivx]+)\)\s+')),
+]
+
+DEFINITION_RE = re.compile(
+    r'^["“]([^"”]{1,120})["”]'
+    r'(?:\s*,\s*["“][^"”]{1,120}["”])*'   # "A", "B" and "C" mean ...
+    r'(?:\s*(?:,|or|and)\s*["“][^"”]{1,120}["”])*'
+    r'\s+(means|includes|does not include|has the same meaning)\b\s*(.*)',
+    re.S
+)
+
+PENALTY_RE = re.compile(
+    r'\b(?:is|are|commits|guilty of)\s+(?:guilty of\s+)?an?\s+'
+    r'(class\s+[1-6]\s+(?:felony|misdemeanor)|petty offense)',
+    re.I
+)
+
+CROSS_REF_RE = re.compile(r'\b13-\d{3,4}(?:\.\d{1,2})?\b')
+
+HEADING_RE = re.compile(r'^(13-\d{3,4}(?:\.\d{1,2})?)\.\s*(.*)')
+
+
+def _match_marker(line: str, current_letter: str = None):
+    """Return (level, label, marker, rest) for a line starting with a subsection marker.
+
+    "(i)", "(v)" and "(x)" are roman numerals under an open (a)-level item
+    unless they are simply the next letter in sequence.
+    """
+    for level, pattern in MARKERS:
+        m = pattern.match(line)
+        if not m:
+            continue
+
+        label = m.group(1)
+        if (level == 3 and label in "ivx" and current_letter is not None
+                and current_letter != chr(ord(label) - 1)):
+            level = 4
+
+        return level, label, m.group(0).strip(), line[m.end():]
+
+    return None
+
+
+def _path(stack: list) -> str:
+    """["A", "1", "a"] -> "A.1(a)"; definition lists start at "1"."""
+    path = ""
+    for i, label in enumerate(stack):
+        if label is None:
+            continue
+        if i <= 1:
+            path += f".{label}" if path else label
+        else:
+            path += f"({label})"
+    return path
+
+
+def segment_statute(raw_text: str) -> dict:
+    """Split statute text into structured pieces without calling a model.
+
+    Returns a dict with:
+      heading            - "13-3601. Domestic violence; definition; ..." line, if present
+      subsections        - [{"path": "A.1(a)", "level": 3, "marker": "(a)", "text": "..."}] in order
+      definitions        - [{"term", "definition", "path"}]
+      penalties          - [{"classification": "class 1 misdemeanor", "path", "text"}]
+      cross_references   - other 13-xxxx sections cited, in first-seen order
+    """
+    lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
+
+    heading = None
+    section = None
+    if lines:
+        m = HEADING_RE.match(lines[0])
+        if m:
+            heading = lines.pop(0)
+            section = m.group(1)
+
+    subsections = []
+    stack = []  # labels of currently open levels, index = level - 1
+    preamble = []
+
+    for line in lines:
+        current_letter = stack[2] if len(stack) >= 3 else None
+        marker = _match_marker(line, current_letter)
+
+        if marker is None:
+            # Continuation of the previous segment (or text before the first marker)
+            if subsections:
+                subsections[-1]["text"] += "\n" + line
+            else:
+                preamble.append(line)
+            continue
+
+        level, label, marker_text, rest = marker
+        del stack[level - 1:]
+        stack.extend([None] * (level - 1 - len(stack)))
+        stack.append(label)
+
+        subsections.append({"path": _path(stack), "level": level, "marker": marker_text, "text": rest})
+
+    if preamble:
+        subsections.insert(0, {"path": "", "level": 0, "marker": "", "text": "\n".join(preamble)})
+
+    definitions = []
+    penalties = []
+    for i, seg in enumerate(subsections):
+        m = DEFINITION_RE.match(seg["text"])
+        if m:
+            # A definition's nested items ("means the following: (a) ... (b) ...") belong to it
+            body = [seg["text"]] + [child["text"] for child in _descendants(subsections, i)]
+            definition = " ".join(body)
+            if len(definition) > MAX_DEFINITION_CHARS:
+                definition = definition[:MAX_DEFINITION_CHARS].rsplit(" ", 1)[0] + " ..."
+
+            definitions.append({
+                "term": m.group(1).strip(),
+                "definition": definition,
+                "path": seg["path"],
+            })
+
+        for p in PENALTY_RE.finditer(seg["text"]):
+            penalties.append({
+                "classification": re.sub(r'\s+', ' ', p.group(1).lower()),
+                "path": seg["path"],
+                "text": _sentence_around(seg["text"], p.start()),
+            })
+
+    cross_references = []
+    for ref in CROSS_REF_RE.findall(raw_text):
+        if ref != section and ref not in cross_references:
+            cross_references.append(ref)
+
+    return {
+        "heading": heading,
+        "subsections": subsections,
+        "definitions": definitions,
+        "penalties": penalties,
+        "cross_references": cross_references,
+    }
+
+
+def _is_child(path: str, parent: str) -> bool:
+    return path.startswith(parent + ".") or path.startswith(parent + "(")
+
+
+def _descendants(subsections: list, index: int):
+    """Segments nested under subsections[index]."""
+    parent = subsections[index]["path"]
+    for seg in subsections[index + 1:]:
+        if not _is_child(seg["path"], parent):
+            break
+        yield seg
+
+
+def _sentence_around(text: str, pos: int) -> str:
+    """The sentence containing position `pos`."""
+    start = text.rfind(". ", 0, pos)
+    start = start + 2 if start != -1 else 0
+    end = text.find(". ", pos)
+    end = end + 1 if end != -1 else len(text)
+    return text[start:end].strip()
+
+
+def condense_for_model(raw_text: str, segments: dict, max_chars: int = MAX_MODEL_CHARS) -> str:
+    """Text to send to the model.
+
+    Short statutes go as-is. Long ones (e.g. 13-3401's drug definitions) have
+    each definition body - including its nested items - replaced by a one-line
+    marker, since definitions are extracted locally by rule_fields().
+    """
+    if len(raw_text) <= max_chars or not segments["definitions"]:
+        return raw_text
+
+    defined_paths = {d["path"] for d in segments["definitions"]}
+    parts = [segments["heading"]] if segments["heading"] else []
+    skip_under = None
+
+    for seg in segments["subsections"]:
+        if skip_under is not None and _is_child(seg["path"], skip_under):
+            continue
+        skip_under = None
+
+        prefix = f'{seg["marker"]} ' if seg["marker"] else ""
+        if seg["path"] in defined_paths:
+            term = DEFINITION_RE.match(seg["text"]).group(1)
+            parts.append(f'{prefix}"{term}" [definition extracted separately]')
+            skip_under = seg["path"]
+        else:
+            parts.append(f"{prefix}{seg['text']}")
+
+    return "\n".join(parts)
+
+
+def rule_fields(segments: dict) -> dict:
+    """Parsed-record fields derivable without a model."""
+    classes = []
+    for p in segments["penalties"]:
+        if p["classification"] not in classes:
+            classes.append(p["classification"])
+
+    return {
+        "key_definitions": [
+            {"term": d["term"], "definition": d["definition"]} for d in segments["definitions"]
+        ],
+        "related_statutes": segments["cross_references"],
+        "classifications": classes,
+    }
@@ -0,0 +1,130 @@
+"""
+Statute Retrieval Index
+Builds a read-only SQLite FTS5 (BM25) index over parsed_statutes.json for
+the chat function
+
+One row per successfully parsed statute. The searchable columns are the
+fields an officer's question is likely to hit - title, summary, elements,
+key definitions, officer authority, mandatory actions and related statutes.
+A display snippet is precomputed per row so the serving path only runs one
+MATCH query and returns stored text.
+
+The file is written to a temporary path, vacuumed and renamed into place,
+so a reader never sees a half-built index. functions/chat/statute_search.py
+opens it read-only and memory-mapped.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+INDEX_VERSION = "1"
+SNIPPET_CHARS = 700
+MAX_LIST_ITEMS = 4
+
+# Column order matters: statute_search.py passes BM25 weights positionally
+COLUMNS = ("section", "title", "summary", "elements", "definitions",
+           "authority", "mandatory", "related", "snippet")
+
+
+def _items(values, key=None) -> list:
+    """Non-empty strings from a parsed list field (strings or dicts)."""
+    items = []
+    for value in values or []:
+        if isinstance(value, dict):
+            value = " - ".join(str(value[k]) for k in (key or value) if value.get(k))
+        if value:
+            items.append(str(value).strip())
+    return items
+
+
+def build_snippet(parsed: dict) -> str:
+    """Short plain-text summary of one statute, as handed to Claude."""
+    lines = [f"ARS {parsed['section']} - {parsed.get('title') or 'Untitled'}"]
+    if parsed.get("summary"):
+        lines.append(parsed["summary"])
+
+    for label, values in (
+        ("Elements", _items(parsed.get("elements"), ("element",))),
+        ("Officer authority", _items(parsed.get("officer_authority"))),
+        ("Mandatory", _items(parsed.get("mandatory_actions"))),
+    ):
+        if values:
+            lines.append(f"{label}: " + "; ".join(values[:MAX_LIST_ITEMS]))
+
+    related = _items(parsed.get("related_statutes"))
+    if related:
+        lines.append("Related: " + ", ".join(related[:MAX_LIST_ITEMS * 2]))
+
+    snippet = "\n".join(lines)
+    if len(snippet) > SNIPPET_CHARS:
+        snippet = snippet[:SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+    return snippet
+
+
+def index_row(parsed: dict) -> tuple:
+    return (
+        parsed["section"],
+        parsed.get("title") or "",
+        parsed.get("summary") or "",
+        "\n".join(_items(parsed.get("elements"), ("element", "explanation"))),
+        "\n".join(_items(parsed.get("key_definitions"), ("term", "definition"))),
+        "\n".join(_items(parsed.get("officer_authority"))),
+        "\n".join(_items(parsed.get("mandatory_actions"))),
+        " ".join(_items(parsed.get("related_statutes"))),
+        build_snippet(parsed),
+    )
+
+
+def build_statute_index(parsed_file: str = "data/parsed_statutes.json",
+                        index_file: str = "functions/chat/statute_index.db") -> Path:
+    """Write the FTS5 index for every successfully parsed statute; returns its path."""
+    with open(parsed_file, 'r') as f:
+        parsed_statutes = json.load(f)
+
+    rows = [index_row(p) for p in parsed_statutes
+            if p.get("_parse_status", "success") == "success" and p.get("section")]
+
+    index_path = Path(index_file)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute(
+            f"CREATE VIRTUAL TABLE statutes USING fts5("
+            f"{', '.join(COLUMNS[:-1])}, snippet UNINDEXED, tokenize = 'porter unicode61')"
+        )
+        conn.executemany(f"INSERT INTO statutes VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+        conn.execute("INSERT INTO statutes (statutes) VALUES ('optimize')")
+
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", INDEX_VERSION),
+            ("built_at", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())),
+            ("source", os.path.basename(parsed_file)),
+            ("statutes", str(len(rows))),
+        ])
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, index_path)
+    print(f"Statute index: {len(rows)} statutes -> {index_path} ({index_path.stat().st_size / 1024:.0f} KB)")
+    return index_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the statute retrieval index for the chat function")
+    parser.add_argument("--input", default="data/parsed_statutes.json", help="Parsed statutes")
+    parser.add_argument("--output", default="functions/chat/statute_index.db", help="Index file")
+    args = parser.parse_args()
+
+    build_statute_index(args.input, args.output)
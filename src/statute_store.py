@@ -0,0 +1,233 @@
+"""
+Statute Store
+SQLite file keyed by section number, one compressed JSON record per row,
+written beside each JSON output (raw_statutes.json -> raw_statutes.db)
+
+The JSON files hold the whole corpus in one array, so finding one section
+means loading all of it. The store keeps `section` as the primary key, so a
+lookup is one B-tree probe whatever the corpus size, and iteration streams
+rows in scrape order from a cursor. Each record is compressed with zstd when
+the `zstandard` package is installed, gzip otherwise; the codec is recorded
+in the file's meta table. The JSON files are still written for compatibility,
+and `export_json` rebuilds one from a store.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from jsonl_store import iter_latest, write_json_array
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+STORE_VERSION = "1"
+DEFAULT_CODEC = "zstd" if zstandard else "gzip"
+ZSTD_LEVEL = 9
+
+
+def store_path(json_file) -> Path:
+    """data/raw_statutes.json -> data/raw_statutes.db"""
+    return Path(json_file).with_suffix(".db")
+
+
+def _compressor(codec: str):
+    if codec == "gzip":
+        return lambda data: gzip.compress(data, mtime=0)
+    if codec == "zstd" and zstandard:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+    raise ValueError(f"Unsupported statute store codec: {codec}")
+
+
+def _decompressor(codec: str):
+    if codec == "gzip":
+        return gzip.decompress
+    if codec == "zstd" and zstandard:
+        return zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Unsupported statute store codec: {codec} (pip install zstandard)")
+
+
+class StatuteStore:
+    """Read-only view of a statute store."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        self.meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        self.decompress = _decompressor(self.meta.get("codec", "gzip"))
+
+    def _decode(self, blob) -> dict:
+        return json.loads(self.decompress(blob))
+
+    def get(self, section: str):
+        """The record for one section, or None."""
+        row = self.conn.execute("SELECT record FROM statutes WHERE section = ?", (section,)).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def __contains__(self, section):
+        return self.conn.execute("SELECT 1 FROM statutes WHERE section = ?", (section,)).fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM statutes").fetchone()[0]
+
+    def sections(self) -> list:
+        return [row[0] for row in self.conn.execute("SELECT section FROM statutes ORDER BY position")]
+
+    def __iter__(self):
+        """Stream records in their original order, one row decoded at a time."""
+        for (blob,) in self.conn.execute("SELECT record FROM statutes ORDER BY position"):
+            yield self._decode(blob)
+
+    def export_json(self, json_file) -> int:
+        """Write the store as the indent=2 JSON array the other tools read."""
+        return write_json_array(iter(self), json_file)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_store(records, db_file, codec: str = DEFAULT_CODEC, source: str = "") -> int:
+    """Write records to a new store, renamed into place when complete; returns the count.
+
+    A section seen twice keeps its last record at its first position.
+    """
+    db_path = Path(db_file)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = db_path.with_suffix(".db.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    compress = _compressor(codec)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE statutes (section TEXT PRIMARY KEY, position INTEGER NOT NULL, "
+                     "status TEXT, record BLOB NOT NULL)")
+        conn.execute("CREATE INDEX statutes_position ON statutes (position)")
+
+        rows = (
+            (r["section"], position, r.get("_parse_status") or ("error" if "error" in r else None),
+             compress(json.dumps(r).encode()))
+            for position, r in enumerate(records) if r.get("section")
+        )
+        conn.executemany("INSERT INTO statutes VALUES (?, ?, ?, ?) ON CONFLICT (section) DO UPDATE "
+                         "SET status = excluded.status, record = excluded.record", rows)
+        count = conn.execute("SELECT COUNT(*) FROM statutes").fetchone()[0]
+
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", STORE_VERSION),
+            ("codec", codec),
+            ("built_at", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())),
+            ("source", source),
+            ("statutes", str(count)),
+        ])
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return count
+
+
+def compact_store(jsonl_file, db_file, key: str = "section", order: list = None) -> int:
+    """Write the latest record per key from a journal to a store (see jsonl_store.compact)."""
+    return write_store(iter_latest(jsonl_file, key, order), db_file,
+                       source=os.path.basename(jsonl_file))
+
+
+def import_json(json_file, db_file=None) -> int:
+    """Build the store for an existing JSON output file."""
+    with open(json_file, 'r') as f:
+        records = json.load(f)
+    return write_store(records, db_file or store_path(json_file), source=os.path.basename(json_file))
+
+
+def open_store(json_file):
+    """The store beside json_file, or None when missing or older than the JSON.
+
+    A JSON file edited or regenerated after the store was written wins, so
+    callers fall back to reading it.
+    """
+    db_path = store_path(json_file)
+    try:
+        db_mtime = db_path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    try:
+        if os.path.getmtime(json_file) > db_mtime:
+            return None
+    except FileNotFoundError:
+        pass
+    return StatuteStore(db_path)
+
+
+def iter_statutes(json_file):
+    """Stream records from the store beside json_file, or from the JSON file itself."""
+    store = open_store(json_file)
+    if store:
+        with store:
+            yield from store
+        return
+
+    with open(json_file, 'r') as f:
+        yield from json.load(f)
+
+
+def find_statute(section: str, json_file):
+    """One section's record, by key lookup in the store when there is one."""
+    store = open_store(json_file)
+    if store:
+        with store:
+            return store.get(section)
+
+    with open(json_file, 'r') as f:
+        return next((s for s in json.load(f) if s.get('section') == section), None)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build, query or export a statute store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("import", help="Build the store for a JSON output file")
+    build.add_argument("json_file", help="e.g. data/raw_statutes.json")
+    build.add_argument("--output", help="Store file (default: same name, .db)")
+
+    get = commands.add_parser("get", help="Print one section's record")
+    get.add_argument("store", help="Store file")
+    get.add_argument("section", help="e.g. 13-3883")
+
+    export = commands.add_parser("export", help="Write a store back out as a JSON array")
+    export.add_argument("store", help="Store file")
+    export.add_argument("output", nargs="?", help="Output .json file (default: same name, .json)")
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        output = args.output or store_path(args.json_file)
+        count = import_json(args.json_file, output)
+        print(f"Stored {count} statutes in {output} ({Path(output).stat().st_size / 1024:.0f} KB)")
+    elif args.command == "get":
+        with StatuteStore(args.store) as store:
+            record = store.get(args.section)
+        if record is None:
+            raise SystemExit(f"Section {args.section} not found in {args.store}")
+        print(json.dumps(record, indent=2))
+    else:
+        output = args.output or Path(args.store).with_suffix(".json")
+        with StatuteStore(args.store) as store:
+            count = store.export_json(output)
+        print(f"Exported {count} statutes to {output}")